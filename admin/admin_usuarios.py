@@ -1,18 +1,33 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
 from flask_login import login_required, current_user
 from werkzeug.security import generate_password_hash
-from datetime import date
 import sys
 import os
 
 # Add parent directory to path to import db if relative import fails, 
 # but try relative import first if running as package
 try:
-    from ..db import get_db
+    from ..db import get_db, get_pool_stats
+    from ..cache import invalidate_user
+    from .. import estadisticas
+    from .. import cache_respuestas
+    from .. import catalogo
+    from .. import instrumentacion
+    from .. import marcar_completadas
+    from ..paginacion import pagina_reservas, por_pagina, POR_PAGINA_DEFECTO
+    from ..disponibilidad import ahora_local
 except ImportError:
     # Fallback for some execution contexts
     sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-    from db import get_db
+    from db import get_db, get_pool_stats
+    from cache import invalidate_user
+    import estadisticas
+    import cache_respuestas
+    import catalogo
+    import instrumentacion
+    import marcar_completadas
+    from paginacion import pagina_reservas, por_pagina, POR_PAGINA_DEFECTO
+    from disponibilidad import ahora_local
 
 admin_usuarios = Blueprint('admin_usuarios', __name__, url_prefix='/admin', template_folder='../templates/admin')
 
@@ -27,35 +42,45 @@ def dashboard():
     cur = db.cursor()
     
     # Stats
-    cur.execute("SELECT COUNT(*) FROM usuarios")
-    total_usuarios = cur.fetchone()[0]
-    
-    cur.execute("SELECT COUNT(*) FROM usuarios WHERE rol='dueño'")
-    total_duenos = cur.fetchone()[0]
-    
-    cur.execute("SELECT COUNT(*) FROM canchas")
-    total_canchas = cur.fetchone()[0]
-    
-    cur.execute("SELECT COUNT(*) FROM reservas")
-    total_reservas = cur.fetchone()[0]
+    totales = _totales(cur)
     
     # Recent activity (optional, e.g., last 5 reservations)
     cur.execute("""
         SELECT r.id_reserva, u.nombre, c.nombre, r.fecha, r.horario 
         FROM reservas r
         JOIN usuarios u ON r.id_usuario = u.id
-        JOIN canchas c ON r.cancha = c.nombre
+        JOIN canchas c ON r.id_cancha = c.id_cancha
         ORDER BY r.fecha DESC, r.horario DESC LIMIT 5
     """)
     recent_reservas = cur.fetchall()
     
     return render_template('dashboard_admin.html', 
-                           total_usuarios=total_usuarios,
-                           total_duenos=total_duenos,
-                           total_canchas=total_canchas,
-                           total_reservas=total_reservas,
+                           total_usuarios=totales['usuarios'],
+                           total_duenos=totales['duenos'],
+                           total_canchas=totales['canchas'],
+                           total_reservas=totales['reservas'],
                            recent_reservas=recent_reservas)
 
+def _totales(cur):
+    """Totales del dashboard en una sola consulta (antes eran cuatro COUNT seguidos)"""
+    cur.execute("""
+        SELECT (SELECT COUNT(*) FROM usuarios),
+               (SELECT COUNT(*) FROM usuarios WHERE rol = 'dueño'),
+               (SELECT COUNT(*) FROM canchas),
+               (SELECT COUNT(*) FROM reservas)
+    """)
+    fila = cur.fetchone()
+    return {'usuarios': fila[0], 'duenos': fila[1], 'canchas': fila[2], 'reservas': fila[3]}
+
+@admin_usuarios.route('/api/totales')
+@login_required
+def api_totales():
+    """Los mismos totales del dashboard en JSON (p. ej. para carga_reservas.py)"""
+    if not current_user.is_admin():
+        return jsonify({'success': False, 'message': 'Acceso denegado'}), 403
+
+    return jsonify({'success': True, 'totales': _totales(get_db().cursor())})
+
 @admin_usuarios.route('/usuarios')
 @login_required
 def listar_usuarios():
@@ -112,6 +137,7 @@ def editar_usuario(id):
             """, (nombre, correo, edad, rol, id))
             
         db.commit()
+        invalidate_user(id)
         flash('Usuario actualizado exitosamente', 'success')
         return redirect(url_for('admin_usuarios.listar_usuarios'))
     
@@ -141,11 +167,15 @@ def eliminar_usuario(id):
     db = get_db()
     cur = db.cursor()
     # Primero eliminar registros relacionados
+    estadisticas.descontar_reservas_usuario(cur, id)
     cur.execute("DELETE FROM reservas WHERE id_usuario=?", (id,))
     cur.execute("DELETE FROM favoritos WHERE id_usuario=?", (id,))
     # Finalmente eliminar el usuario
     cur.execute("DELETE FROM usuarios WHERE id=?", (id,))
     db.commit()
+    invalidate_user(id)
+    # Sus canchas se borran en cascada
+    catalogo.invalidar(db)
     
     flash('Usuario eliminado exitosamente', 'success')
     return redirect(url_for('admin_usuarios.listar_usuarios'))
@@ -190,10 +220,12 @@ def eliminar_cancha(id):
     
     db = get_db()
     cur = db.cursor()
-    cur.execute("DELETE FROM reservas WHERE cancha = (SELECT nombre FROM canchas WHERE id_cancha=?)", (id,))
-    cur.execute("DELETE FROM favoritos WHERE cancha = (SELECT nombre FROM canchas WHERE id_cancha=?)", (id,))
+    cur.execute("DELETE FROM reservas WHERE id_cancha=?", (id,))
+    cur.execute("DELETE FROM favoritos WHERE id_cancha=?", (id,))
     cur.execute("DELETE FROM canchas WHERE id_cancha=?", (id,))
+    estadisticas.eliminar_cancha(cur, id)
     db.commit()
+    catalogo.invalidar(db)
     
     flash('Cancha eliminada exitosamente', 'success')
     return redirect(url_for('admin_usuarios.listar_canchas'))
@@ -208,27 +240,78 @@ def listar_reservas():
     
     db = get_db()
     cur = db.cursor()
+    tamano = por_pagina(request.args.get('por_pagina'))
+
+    # Totales en SQL: la tabla solo trae la primera página
+    hoy = ahora_local().date().isoformat()
     cur.execute("""
-        SELECT r.id_reserva, r.cancha, r.fecha, r.horario, u.nombre as usuario
+        SELECT COUNT(*),
+               COALESCE(SUM(CASE WHEN fecha >= ? THEN 1 ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN fecha < ? THEN 1 ELSE 0 END), 0)
+        FROM reservas
+    """, (hoy, hoy))
+    total, activas, completadas = cur.fetchone()
+    resumen = {
+        'total': total,
+        'activas': activas,
+        'completadas': completadas,
+        'canceladas': 0  # Las reservas canceladas se eliminan, no hay estado "cancelada"
+    }
+
+    reservas, siguiente = _pagina_reservas(cur, tamano=tamano)
+
+    return render_template('admin_reservas.html', reservas=reservas, resumen=resumen,
+                           siguiente=siguiente, por_pagina=tamano)
+
+@admin_usuarios.route('/api/reservas')
+@login_required
+def api_reservas():
+    """Siguiente página de todas las reservas (botón Cargar más)"""
+    if not current_user.is_admin():
+        return jsonify({'success': False, 'message': 'Acceso denegado'}), 403
+
+    cur = get_db().cursor()
+    reservas, siguiente = _pagina_reservas(cur, cursor=request.args.get('cursor'),
+                                           tamano=por_pagina(request.args.get('por_pagina')))
+
+    return jsonify({
+        'success': True,
+        'html': {'filas': render_template('partials/admin_reservas_filas.html', reservas=reservas)},
+        'siguiente': siguiente
+    })
+
+@admin_usuarios.route('/api/metricas')
+@login_required
+def api_metricas():
+    """Consultas SQL por ruta, sentencias más costosas, pool, caché de páginas y tarea de completadas"""
+    if not current_user.is_admin():
+        return jsonify({'success': False, 'message': 'Acceso denegado'}), 403
+
+    return jsonify({
+        'success': True,
+        'sql': instrumentacion.metricas(top=por_pagina(request.args.get('top'))),
+        'pool': get_pool_stats(),
+        'paginas': cache_respuestas.estadisticas(),
+        'completadas': dict(marcar_completadas.metricas)
+    })
+
+def _pagina_reservas(cur, cursor=None, tamano=POR_PAGINA_DEFECTO):
+    """Página de reservas (todas) convertidas a diccionarios para el template"""
+    filas, siguiente = pagina_reservas(cur, """
+        SELECT r.id_reserva, COALESCE(c.nombre, r.cancha) as cancha, r.fecha, r.horario, u.nombre as usuario
         FROM reservas r
         JOIN usuarios u ON r.id_usuario = u.id
-        ORDER BY r.fecha DESC, r.horario DESC
-    """)
-    reservas = cur.fetchall()
-    
-    # Convertir las reservas a diccionarios para facilitar el acceso en el template
-    reservas_procesadas = []
-    for reserva in reservas:
-        reservas_procesadas.append({
-            'id_reserva': reserva[0],
-            'cancha': reserva[1],
-            'fecha': reserva[2],  # Mantener como viene de la BD (puede ser string o date)
-            'horario': reserva[3],
-            'usuario': reserva[4],
-            'estado': 'activa'  # Por defecto todas son activas ya que no hay columna estado en la BD
-        })
-    
-    # Pasar today como objeto date para comparación
-    today = date.today()
-    
-    return render_template('admin_reservas.html', reservas=reservas_procesadas, today=today)
\ No newline at end of file
+        LEFT JOIN canchas c ON r.id_cancha = c.id_cancha
+    """, [], (), cursor, tamano)
+
+    # La fecha llega como string (SQLite) o date (PostgreSQL): se compara como texto ISO
+    hoy = ahora_local().date().isoformat()
+    reservas = [{
+        'id_reserva': fila[0],
+        'cancha': fila[1],
+        'fecha': fila[2],
+        'horario': fila[3],
+        'usuario': fila[4],
+        'estado': 'completada' if str(fila[2]) < hoy else 'activa'
+    } for fila in filas]
+    return reservas, siguiente
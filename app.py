@@ -1,17 +1,29 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, g
+from flask import Flask, Response, render_template, request, redirect, url_for, flash, jsonify, g
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
 from db import get_db, close_connection
+from cache import user_cache, invalidate_user
+from disponibilidad import ahora_local, slot_de_horario, horario_de_slot, slots_de_apertura
+import estadisticas
+import busqueda
+import cache_respuestas
+import catalogo
+import geocodificacion
+import imagenes
+import marcador
+import marcar_completadas
+from paginacion import pagina_reservas, por_pagina, POR_PAGINA_DEFECTO, POR_PAGINA_MAXIMO
 from admin.admin_usuarios import admin_usuarios
+from estaticos import estaticos, static_url
+from instrumentacion import instrumentacion
 from config import SECRET_KEY, DEBUG
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = SECRET_KEY
 app.config['DEBUG'] = DEBUG
-app.config['UPLOAD_FOLDER'] = os.path.join('static', 'canchas_uploads')
+app.config['UPLOAD_FOLDER'] = os.path.join(imagenes.STATIC_DIR, imagenes.CARPETA_ORIGINALES)
 app.config['ALLOWED_EXTENSIONS'] = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 
 # Asegurar que el directorio de uploads existe
@@ -26,6 +38,9 @@ login_manager.login_message_category = 'info'
 
 # Registrar Blueprint de administrador
 app.register_blueprint(admin_usuarios)
+app.register_blueprint(estaticos)
+# Consultas por petición, log de consultas lentas y cabecera Server-Timing
+app.register_blueprint(instrumentacion)
 
 # Cerrar la conexión a la base de datos al finalizar cada petición
 @app.teardown_appcontext
@@ -51,13 +66,20 @@ class Usuario(UserMixin):
 
 @login_manager.user_loader
 def load_user(user_id):
-    db = get_db()
-    cur = db.cursor()
-    cur.execute("SELECT id, nombre, correo, edad, contraseña, direccion, rol FROM usuarios WHERE id = ?", (user_id,))
-    user = cur.fetchone()
-    if user:
-        return Usuario(user[0], user[1], user[2], user[3], user[4], user[5], user[6])
-    return None
+    # Registro ligero (sin hash de contraseña) cacheado para no consultar la BD en cada petición
+    record = user_cache.get(str(user_id))
+    if record is None:
+        db = get_db()
+        cur = db.cursor()
+        cur.execute("SELECT id, nombre, correo, edad, direccion, rol FROM usuarios WHERE id = ?", (user_id,))
+        user = cur.fetchone()
+        if not user:
+            return None
+        record = (user[0], user[1], user[2], user[3], user[4], user[5])
+        user_cache.set(str(user_id), record)
+    
+    id, nombre, correo, edad, direccion, rol = record
+    return Usuario(id, nombre, correo, edad, None, direccion, rol)
 
 def allowed_file(filename):
     return '.' in filename and \
@@ -163,46 +185,17 @@ def login():
 # ---------------------- RUTAS PÚBLICAS ----------------------
 
 @app.route('/')
+@cache_respuestas.cacheada()
 def index():
     db = get_db()
     cur = db.cursor()
-    favoritas = []
+    canchas = catalogo.canchas(cur)
+    favoritos = set()
     if current_user.is_authenticated:
-        cur.execute("""
-            SELECT c.id_cancha, c.nombre, c.descripcion, c.imagen_url, h.hora_inicio, h.hora_fin
-            FROM favoritos f
-            JOIN canchas c ON f.cancha = c.nombre
-            LEFT JOIN horarios_canchas h ON c.id_cancha = h.id_cancha
-            WHERE f.id_usuario = ?
-        """, (current_user.id,))
-        favoritas_db = cur.fetchall()
-        for c in favoritas_db:
-            favoritas.append({
-                'id_cancha': c[0],
-                'nombre': c[1],
-                'descripcion': c[2],
-                'imagen': c[3].split(',')[0] if c[3] else None,
-                'hora_inicio': c[4],
-                'hora_fin': c[5]
-            })
-    
-    # Obtener canchas con sus horarios
-    cur.execute("""
-        SELECT c.id_cancha, c.nombre, c.descripcion, c.imagen_url, c.precio, c.direccion,
-               h.hora_inicio, h.hora_fin
-        FROM canchas c
-        LEFT JOIN horarios_canchas h ON c.id_cancha = h.id_cancha
-        WHERE c.usuario_id IS NOT NULL
-    """)
-    canchas_db = cur.fetchall()
-    canchas = []
-    for c in canchas_db:
-        img_path = c[3].split(',')[0] if c[3] else 'imagenes/cancha1.png'
-        if img_path.startswith('static/'):
-            img_path = img_path.replace('static/', '', 1)
-        # Formato: (id, nombre, descripcion, imagen, precio, direccion, hora_inicio, hora_fin)
-        canchas.append((c[0], c[1], c[2], img_path, c[4], c[5], c[6], c[7]))
-    return render_template('home.html', canchas=canchas, favoritas=favoritas)
+        favoritos = catalogo.favoritos_de(cur, current_user.id)
+    favoritas = [c for c in canchas if c['id_cancha'] in favoritos]
+    return render_template('home.html', canchas=canchas, favoritas=favoritas, favoritos=favoritos,
+                           radio_cercania=geocodificacion.RADIO_MAXIMO_KM)
 
 @app.route('/nosotros')
 def nosotros():
@@ -234,53 +227,28 @@ def dashboard_dueño():
     # Obtener canchas recientes (últimas 5)
     canchas_recientes = canchas[:5] if canchas else []
     
-    # Contar reservas totales
-    cur.execute("""
-        SELECT COUNT(*) 
-        FROM reservas r
-        JOIN canchas c ON r.cancha = c.nombre
-        WHERE c.usuario_id = ?
-    """, (current_user.id,))
-    total_reservas = cur.fetchone()[0]
-    
-    # Obtener todas las reservas del dueño para cálculo en Python (compatible con SQLite y Postgres)
-    cur.execute("""
-        SELECT r.fecha, c.precio
-        FROM reservas r
-        JOIN canchas c ON r.cancha = c.nombre
-        WHERE c.usuario_id = ?
-    """, (current_user.id,))
-    todas_reservas = cur.fetchall()
-    
-    # Filtrar por mes actual usando Python
-    mes_actual = datetime.now().strftime('%Y-%m')
-    
-    reservas_mes = 0
-    ingresos_mes = 0
-    
-    for reserva in todas_reservas:
-        # La fecha puede venir como string o como objeto date dependiendo del driver
-        fecha_str = str(reserva[0])
-        if fecha_str.startswith(mes_actual):
-            reservas_mes += 1
-            # Limpiar el precio de símbolos y convertir a float
-            try:
-                precio_limpio = str(reserva[1]).replace('$', '').replace(',', '')
-                ingresos_mes += float(precio_limpio)
-            except (ValueError, TypeError):
-                pass
-    
-    # Obtener reservas recientes
-    cur.execute("""
-        SELECT r.id_reserva, r.cancha, r.fecha, r.horario, r.numero, r.mensaje,
+    # Reservas totales, del mes e ingresos del mes desde las estadísticas precalculadas
+    mes_actual = ahora_local().strftime('%Y-%m')
+    total_reservas, reservas_mes, ingresos_mes = estadisticas.resumen_dueno(cur, current_user.id, mes_actual)
+    
+    # Reservas recientes: las 5 más nuevas de cada pestaña en el índice
+    # (id_dueno, estado, fecha, horario, id_reserva), sin ordenar todo el historial
+    recientes = " UNION ALL ".join(f"""
+            SELECT * FROM (
+                SELECT id_reserva FROM reservas WHERE id_dueno = ? AND estado = ?
+                ORDER BY fecha DESC, horario DESC, id_reserva DESC LIMIT 5
+            ) AS {estado}s""" for estado in ESTADOS_RESERVA)
+    cur.execute(f"""
+        SELECT r.id_reserva, c.nombre as cancha, r.fecha, r.horario, r.numero, r.mensaje,
                u.nombre as usuario_nombre, u.correo as usuario_correo
-        FROM reservas r
-        JOIN canchas c ON r.cancha = c.nombre
+        FROM ({recientes}
+        ) AS recientes
+        JOIN reservas r ON r.id_reserva = recientes.id_reserva
+        JOIN canchas c ON r.id_cancha = c.id_cancha
         JOIN usuarios u ON r.id_usuario = u.id
-        WHERE c.usuario_id = ?
-        ORDER BY r.fecha DESC, r.horario DESC
+        ORDER BY r.fecha DESC, r.horario DESC, r.id_reserva DESC
         LIMIT 5
-    """, (current_user.id,))
+    """, tuple(valor for estado in ESTADOS_RESERVA for valor in (current_user.id, estado)))
     reservas_recientes = cur.fetchall()
     
     return render_template('dashboard_dueño.html', 
@@ -315,37 +283,39 @@ def dueno_canchas():
 @app.route('/dueño/reserva/<int:id>/actualizar_stats', methods=['POST'])
 @login_required
 def actualizar_stats_reserva(id):
+    """
+    Guarda un lote de cambios del marcador: {"incrementos": {campo: n}, "valores": {campo: n}}.
+    También acepta el formato de un solo campo {"field": campo, "value": n}.
+    """
     if not current_user.is_owner():
         return jsonify({'success': False, 'error': 'No autorizado'}), 403
     
-    data = request.get_json()
-    field = data.get('field')
-    value = data.get('value')
+    data = request.get_json(silent=True) or {}
+    if 'field' in data:
+        incrementos, valores = {}, {data.get('field'): data.get('value')}
+    else:
+        incrementos, valores = data.get('incrementos', {}), data.get('valores', {})
     
-    allowed_fields = ['goles_equipo1', 'goles_equipo2', 'tarjetas_amarillas', 'tarjetas_rojas']
-    if field not in allowed_fields:
-        return jsonify({'success': False, 'error': 'Campo inválido'}), 400
+    try:
+        incrementos, valores = marcador.validar_lote(incrementos, valores)
+    except marcador.LoteInvalido as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
         
     db = get_db()
     cur = db.cursor()
     
     try:
-        # Verificar que la reserva pertenece a una cancha del dueño
-        cur.execute("""
-            SELECT r.id_reserva 
-            FROM reservas r
-            JOIN canchas c ON r.cancha = c.nombre
-            WHERE r.id_reserva = ? AND c.usuario_id = ?
-        """, (id, current_user.id))
-        
-        if not cur.fetchone():
+        # Un único UPDATE por lote; la pertenencia se verifica en él y se recuerda por partido
+        resultado = marcador.actualizar(cur, id, current_user.id, incrementos, valores)
+        if resultado is None:
+            db.rollback()
             return jsonify({'success': False, 'error': 'Reserva no encontrada o no autorizada'}), 404
-
-        query = f"UPDATE reservas SET {field} = ? WHERE id_reserva = ?"
-        cur.execute(query, (value, id))
         db.commit()
-        return jsonify({'success': True})
+        # Los jugadores que ven la reserva reciben el cambio por SSE
+        marcador.publicar(id, resultado)
+        return jsonify({'success': True, 'marcador': resultado})
     except Exception as e:
+        db.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/dueño/canchas/agregar', methods=['GET', 'POST'])
@@ -370,22 +340,30 @@ def dueno_agregar_cancha():
                     flash('La hora de cierre debe ser posterior a la hora de apertura', 'error')
                     return render_template('dueño_agregar_cancha.html')
             
+            # El precio se interpreta una sola vez al guardar (precio_num se usa en SQL)
+            precio_num = estadisticas.precio_numerico(precio)
+            if precio_num is None or precio_num < 0:
+                flash('El precio debe ser un número válido', 'error')
+                return render_template('dueño_agregar_cancha.html')
+            
             imagen_url = ''
             if 'imagen' in request.files:
                 file = request.files['imagen']
                 if file and file.filename != '' and allowed_file(file.filename):
-                    filename = secure_filename(file.filename)
-                    filename = f"{nombre.replace(' ', '_')}_{current_user.id}.{filename.rsplit('.', 1)[1].lower()}"
-                    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                    file.save(filepath)
-                    imagen_url = f"static/canchas_uploads/{filename}"
+                    # Nombre derivado del contenido; las versiones reducidas se generan tras el commit
+                    imagen_url = imagenes.guardar_original(file, file.filename.rsplit('.', 1)[1].lower())
             
             db = get_db()
             cur = db.cursor()
+            
+            # Coordenadas ya conocidas; si no, se resuelven tras el commit (ver geocodificacion.py)
+            ubicacion = geocodificacion.guardadas(cur, direccion)
+            lat, lng = ubicacion or (None, None)
+            
             cur.execute("""
-                INSERT INTO canchas (nombre, precio, descripcion, imagen_url, direccion, usuario_id)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (nombre, precio, descripcion, imagen_url, direccion, current_user.id))
+                INSERT INTO canchas (nombre, precio, precio_num, descripcion, imagen_url, direccion, lat, lng, usuario_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (nombre, precio, precio_num, descripcion, imagen_url, direccion, lat, lng, current_user.id))
             
             # Obtener el ID de la cancha recién creada
             id_cancha = cur.lastrowid
@@ -398,6 +376,10 @@ def dueno_agregar_cancha():
                 """, (id_cancha, hora_apertura, hora_cierre))
             
             db.commit()
+            catalogo.invalidar(db)
+            imagenes.programar(id_cancha, imagen_url)
+            if ubicacion is None:
+                geocodificacion.programar(id_cancha, direccion)
             
             flash(f'Cancha "{nombre}" agregada exitosamente', 'success')
             return redirect(url_for('dashboard_dueño'))
@@ -445,21 +427,30 @@ def dueno_editar_cancha(id):
                     flash('La hora de cierre debe ser posterior a la hora de apertura', 'error')
                     return render_template('dueño_editar_cancha.html', cancha=cancha, horario=horario)
             
+            precio_num = estadisticas.precio_numerico(precio)
+            if precio_num is None or precio_num < 0:
+                flash('El precio debe ser un número válido', 'error')
+                return render_template('dueño_editar_cancha.html', cancha=cancha, horario=horario)
+            
             imagen_url = cancha['imagen_url']
             if 'imagen' in request.files:
                 file = request.files['imagen']
                 if file and file.filename != '' and allowed_file(file.filename):
-                    filename = secure_filename(file.filename)
-                    filename = f"{nombre.replace(' ', '_')}_{current_user.id}.{filename.rsplit('.', 1)[1].lower()}"
-                    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                    file.save(filepath)
-                    imagen_url = f"static/canchas_uploads/{filename}"
+                    # Nombre derivado del contenido; las versiones reducidas se generan tras el commit
+                    imagen_url = imagenes.guardar_original(file, file.filename.rsplit('.', 1)[1].lower())
+            
+            # Solo se vuelve a geocodificar si cambió la dirección (tras el commit si es nueva)
+            ubicacion = (cancha['lat'], cancha['lng'])
+            if geocodificacion.normalizar(direccion) != geocodificacion.normalizar(cancha['direccion']):
+                ubicacion = geocodificacion.guardadas(cur, direccion)
+            lat, lng = ubicacion or (None, None)
             
             cur.execute("""
                 UPDATE canchas 
-                SET nombre = ?, precio = ?, descripcion = ?, imagen_url = ?, direccion = ?
+                SET nombre = ?, precio = ?, precio_num = ?, descripcion = ?, imagen_url = ?, direccion = ?, lat = ?, lng = ?,
+                    imagen_variantes = CASE WHEN imagen_url = ? THEN imagen_variantes ELSE NULL END
                 WHERE id_cancha = ? AND usuario_id = ?
-            """, (nombre, precio, descripcion, imagen_url, direccion, id, current_user.id))
+            """, (nombre, precio, precio_num, descripcion, imagen_url, direccion, lat, lng, imagen_url, id, current_user.id))
             
             # Actualizar o insertar horarios
             if hora_apertura and hora_cierre:
@@ -478,6 +469,11 @@ def dueno_editar_cancha(id):
                     """, (id, hora_apertura, hora_cierre))
             
             db.commit()
+            catalogo.invalidar(db)
+            if imagen_url != cancha['imagen_url']:
+                imagenes.programar(id, imagen_url)
+            if ubicacion is None:
+                geocodificacion.programar(id, direccion)
             
             flash(f'Cancha "{nombre}" actualizada exitosamente', 'success')
             return redirect(url_for('dashboard_dueño'))
@@ -508,7 +504,9 @@ def dueno_eliminar_cancha(id):
     
     try:
         cur.execute("DELETE FROM canchas WHERE id_cancha = ? AND usuario_id = ?", (id, current_user.id))
+        estadisticas.eliminar_cancha(cur, id)
         db.commit()
+        catalogo.invalidar(db)
         flash(f'Cancha "{cancha[0]}" eliminada exitosamente', 'success')
     except Exception as e:
         get_db().rollback()
@@ -517,6 +515,34 @@ def dueno_eliminar_cancha(id):
     
     return redirect(url_for('dashboard_dueño'))
 
+# Pestañas de los listados de reservas del dueño y del usuario
+ESTADOS_RESERVA = ('pendiente', 'completada')
+
+def _pagina_reservas_dueno(cur, estado, cursor=None, tamano=POR_PAGINA_DEFECTO):
+    """Página de reservas de las canchas del dueño actual en un estado"""
+    return pagina_reservas(cur, """
+        SELECT r.id_reserva, c.nombre as cancha, r.fecha, r.horario, r.numero, r.mensaje,
+               r.goles_equipo1, r.goles_equipo2, r.tarjetas_amarillas, r.tarjetas_rojas,
+               u.nombre as usuario_nombre, u.correo as usuario_correo, r.estado
+        FROM reservas r
+        JOIN canchas c ON r.id_cancha = c.id_cancha
+        JOIN usuarios u ON r.id_usuario = u.id
+    """, [
+        # Recorre en orden el índice (id_dueno, estado, fecha, horario, id_reserva)
+        "r.id_dueno = ?",
+        "r.estado = ?"
+    ], (current_user.id, estado), cursor, tamano)
+
+def _pagina_reservas_usuario(cur, estado, cursor=None, tamano=POR_PAGINA_DEFECTO):
+    """Página de reservas propias del usuario actual en un estado"""
+    return pagina_reservas(cur, """
+        SELECT r.id_reserva, c.nombre as cancha, r.fecha, r.horario, r.numero, r.mensaje,
+               c.precio, c.imagen_url, c.direccion, r.estado, c.id_cancha,
+               r.goles_equipo1, r.goles_equipo2, r.tarjetas_amarillas, r.tarjetas_rojas
+        FROM reservas r
+        JOIN canchas c ON r.id_cancha = c.id_cancha
+    """, ["r.id_usuario = ?", "r.estado = ?"], (current_user.id, estado), cursor, tamano)
+
 @app.route('/dueño/reservas')
 @login_required
 def dueno_reservas():
@@ -526,19 +552,42 @@ def dueno_reservas():
     
     db = get_db()
     cur = db.cursor()
-    cur.execute("""
-        SELECT r.id_reserva, r.cancha, r.fecha, r.horario, r.numero, r.mensaje,
-               r.goles_equipo1, r.goles_equipo2, r.tarjetas_amarillas, r.tarjetas_rojas,
-               u.nombre as usuario_nombre, u.correo as usuario_correo, r.estado
-        FROM reservas r
-        JOIN canchas c ON r.cancha = c.nombre
-        JOIN usuarios u ON r.id_usuario = u.id
-        WHERE c.usuario_id = ?
-        ORDER BY r.fecha DESC, r.horario DESC
-    """, (current_user.id,))
-    reservas = cur.fetchall()
-    
-    return render_template('dueño_reservas.html', reservas=reservas)
+    tamano = por_pagina(request.args.get('por_pagina'))
+
+    # Primera página de cada pestaña; el resto se pide con "Cargar más"
+    pendientes, siguiente_pendientes = _pagina_reservas_dueno(cur, 'pendiente', tamano=tamano)
+    completadas, siguiente_completadas = _pagina_reservas_dueno(cur, 'completada', tamano=tamano)
+
+    return render_template('dueño_reservas.html',
+                         pendientes=pendientes,
+                         completadas=completadas,
+                         siguiente={'pendiente': siguiente_pendientes, 'completada': siguiente_completadas},
+                         por_pagina=tamano)
+
+@app.route('/api/dueño/reservas')
+@login_required
+def api_dueno_reservas():
+    """Siguiente página de reservas del dueño (botón Cargar más)"""
+    if not current_user.is_owner():
+        return jsonify({'success': False, 'message': 'Acceso denegado'}), 403
+
+    estado = request.args.get('estado')
+    if estado not in ESTADOS_RESERVA:
+        return jsonify({'success': False, 'message': 'Estado no válido'}), 400
+
+    cur = get_db().cursor()
+    reservas, siguiente = _pagina_reservas_dueno(cur, estado,
+                                                 cursor=request.args.get('cursor'),
+                                                 tamano=por_pagina(request.args.get('por_pagina')))
+
+    return jsonify({
+        'success': True,
+        'html': {
+            'filas': render_template('partials/dueno_reservas_filas.html', reservas=reservas),
+            'tarjetas': render_template('partials/dueno_reservas_tarjetas.html', reservas=reservas)
+        },
+        'siguiente': siguiente
+    })
 
 @app.route('/dueño/partido/<int:id>')
 @login_required
@@ -552,11 +601,11 @@ def dueno_partido_live(id):
     
     # Obtener la reserva con todos los datos
     cur.execute("""
-        SELECT r.id_reserva, r.cancha, r.fecha, r.horario, r.numero, r.mensaje,
+        SELECT r.id_reserva, c.nombre as cancha, r.fecha, r.horario, r.numero, r.mensaje,
                r.goles_equipo1, r.goles_equipo2, r.tarjetas_amarillas, r.tarjetas_rojas,
                u.nombre as usuario_nombre, u.correo as usuario_correo
         FROM reservas r
-        JOIN canchas c ON r.cancha = c.nombre
+        JOIN canchas c ON r.id_cancha = c.id_cancha
         JOIN usuarios u ON r.id_usuario = u.id
         WHERE r.id_reserva = ? AND c.usuario_id = ?
     """, (id, current_user.id))
@@ -567,6 +616,11 @@ def dueno_partido_live(id):
         flash('Reserva no encontrada o no tienes permiso para verla', 'error')
         return redirect(url_for('dueno_reservas'))
     
+    # La pertenencia ya está verificada: los lotes del marcador no la vuelven a consultar
+    marcador.recordar_partido(current_user.id, id)
+    # Con la página del partido abierta los espectadores reciben el marcador en vivo
+    marcador.marcar_en_vivo(id)
+    
     # Convertir a diccionario para facilitar el acceso en el template
     reserva_dict = {
         'id_reserva': reserva[0],
@@ -585,6 +639,54 @@ def dueno_partido_live(id):
     
     return render_template('dueño_partido_live.html', reserva=reserva_dict)
 
+def _marcador_de(cur, id):
+    """Marcador de la reserva si el usuario es el jugador, el dueño de la cancha o un admin; si no, None"""
+    cur.execute("""
+        SELECT r.goles_equipo1, r.goles_equipo2, r.tarjetas_amarillas, r.tarjetas_rojas,
+               r.id_usuario, c.usuario_id
+        FROM reservas r
+        JOIN canchas c ON r.id_cancha = c.id_cancha
+        WHERE r.id_reserva = ?
+    """, (id,))
+    reserva = cur.fetchone()
+    if not reserva or (current_user.id not in (reserva[4], reserva[5]) and not current_user.is_admin()):
+        return None
+    return {campo: reserva[i] or 0 for i, campo in enumerate(marcador.CAMPOS)}
+
+# Marcador de una reserva y si está en vivo: la página abre el stream solo en ese caso
+@app.route('/reservas/<int:id>/marcador/estado')
+@login_required
+def marcador_estado(id):
+    actual = _marcador_de(get_db().cursor(), id)
+    if actual is None:
+        return jsonify({'success': False, 'error': 'Reserva no encontrada o no autorizada'}), 404
+    return jsonify({'success': True, 'en_vivo': marcador.en_vivo(id), 'marcador': actual})
+
+# Marcador en vivo de una reserva (Server-Sent Events) para el jugador, el dueño y el admin
+@app.route('/reservas/<int:id>/marcador')
+@login_required
+def marcador_en_vivo(id):
+    # 204: EventSource no se reconecta y la página vuelve a consultar /estado
+    if not marcador.en_vivo(id) or not marcador.hay_lugar():
+        return '', 204
+    # Suscribirse antes de leer el marcador para no perder un cambio entre ambos pasos
+    suscripcion = marcador.suscribir(id)
+    try:
+        inicial = _marcador_de(get_db().cursor(), id)
+    except Exception:
+        marcador.cancelar(suscripcion)
+        raise
+    
+    if inicial is None:
+        marcador.cancelar(suscripcion)
+        return jsonify({'success': False, 'error': 'Reserva no encontrada o no autorizada'}), 404
+    
+    # La conexión a la BD se libera al terminar la vista; el stream no la usa
+    return Response(marcador.eventos(suscripcion, inicial), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @app.route('/perfil_dueño', methods=['GET', 'POST'])
 @login_required
 def perfil_dueño():
@@ -618,6 +720,7 @@ def perfil_dueño():
                 """, (nombre, correo, edad, direccion, current_user.id))
             
             db.commit()
+            invalidate_user(current_user.id)
             flash('Perfil actualizado exitosamente', 'success')
             return redirect(url_for('perfil_dueño'))
             
@@ -639,33 +742,28 @@ def dashboard_usuario():
     cur.execute("SELECT COUNT(*) FROM reservas WHERE id_usuario = ?", (current_user.id,))
     total_reservas = cur.fetchone()[0]
     
+    # "Hoy" en la hora local de las reservas (APP_TZ), no en UTC
+    hoy = ahora_local().date().isoformat()
     cur.execute("""
         SELECT COUNT(*) FROM reservas 
-        WHERE id_usuario = ? AND fecha >= date('now')
-    """, (current_user.id,))
+        WHERE id_usuario = ? AND fecha >= ?
+    """, (current_user.id, hoy))
     proximas_reservas = cur.fetchone()[0]
     
     cur.execute("SELECT COUNT(*) FROM favoritos WHERE id_usuario = ?", (current_user.id,))
     total_favoritos = cur.fetchone()[0]
     
     cur.execute("""
-        SELECT r.id_reserva, r.cancha, r.fecha, r.horario, c.precio, c.imagen_url
+        SELECT r.id_reserva, c.nombre as cancha, r.fecha, r.horario, c.precio, c.imagen_url
         FROM reservas r
-        JOIN canchas c ON r.cancha = c.nombre
-        WHERE r.id_usuario = ? AND r.fecha >= date('now')
+        JOIN canchas c ON r.id_cancha = c.id_cancha
+        WHERE r.id_usuario = ? AND r.fecha >= ?
         ORDER BY r.fecha ASC, r.horario ASC
         LIMIT 3
-    """, (current_user.id,))
+    """, (current_user.id, hoy))
     proximas_reservas_list = cur.fetchall()
     
-    cur.execute("""
-        SELECT DISTINCT c.id_cancha, c.nombre, c.precio, c.imagen_url, c.descripcion, c.direccion
-        FROM canchas c
-        WHERE c.usuario_id IS NOT NULL
-        ORDER BY c.id_cancha DESC
-        LIMIT 6
-    """)
-    canchas_recomendadas = cur.fetchall()
+    canchas_recomendadas = catalogo.canchas(cur)[:6]
     
     return render_template('dashboard_usuario.html',
                          total_reservas=total_reservas,
@@ -676,22 +774,30 @@ def dashboard_usuario():
 
 @app.route('/usuario/explorar')
 @login_required
+@cache_respuestas.cacheada(parametros=('q', 'precio_min', 'precio_max', 'hora', 'pagina'), sin_cache=('fecha',))
 def usuario_explorar():
     db = get_db()
     cur = db.cursor()
     
-    cur.execute("""
-        SELECT c.id_cancha, c.nombre, c.precio, c.descripcion, c.imagen_url, c.direccion,
-               EXISTS(SELECT 1 FROM favoritos f WHERE f.cancha = c.nombre AND f.id_usuario = ?) as es_favorito,
-               h.hora_inicio, h.hora_fin
-        FROM canchas c
-        LEFT JOIN horarios_canchas h ON c.id_cancha = h.id_cancha
-        WHERE c.usuario_id IS NOT NULL
-        ORDER BY c.id_cancha DESC
-    """, (current_user.id,))
-    canchas = cur.fetchall()
-    
-    return render_template('usuario_explorar.html', canchas=canchas)
+    try:
+        filtros = _filtros_busqueda(request.args)
+    except ValueError:
+        filtros = {}
+    pagina = filtros.pop('pagina', 1)
+    siguiente = None
+    if any(valor not in (None, '') for valor in filtros.values()):
+        # Con filtros se buscan en la base (índice de texto completo) y se muestran por páginas
+        ids, hay_mas, _ = busqueda.buscar(cur, db.db_type, pagina=pagina, tamano=POR_PAGINA_MAXIMO, **filtros)
+        por_id = catalogo.por_id(cur)
+        canchas = [por_id[i] for i in ids if i in por_id]
+        siguiente = pagina + 1 if hay_mas else None
+    else:
+        canchas = catalogo.canchas(cur)
+    
+    favoritos = catalogo.favoritos_de(cur, current_user.id)
+    canchas = [dict(c, es_favorito=c['id_cancha'] in favoritos) for c in canchas]
+    
+    return render_template('usuario_explorar.html', canchas=canchas, filtros=filtros, siguiente=siguiente)
 
 @app.route('/usuario/reservar/<int:id_cancha>', methods=['GET', 'POST'])
 @login_required
@@ -726,16 +832,38 @@ def usuario_reservar(id_cancha):
             mensaje = request.form.get('mensaje', '')
             
             fecha_reserva = datetime.strptime(fecha, '%Y-%m-%d').date()
-            if fecha_reserva < datetime.now().date():
+            if fecha_reserva < ahora_local().date():
                 flash('No puedes reservar en una fecha pasada', 'error')
                 return render_template('usuario_reservar.html', cancha=cancha, horario_funcionamiento=horario_funcionamiento)
             
+            slot = slot_de_horario(horario)
+            apertura = horario_funcionamiento if horario_funcionamiento else (None, None)
+            if slot is None or slot not in slots_de_apertura(apertura[0], apertura[1]):
+                flash('El horario seleccionado no es válido para esta cancha', 'error')
+                return render_template('usuario_reservar.html', cancha=cancha, horario_funcionamiento=horario_funcionamiento)
+            horario = horario_de_slot(slot)
+            
+            # Inserción atómica: el índice único (id_cancha, fecha, slot) decide quién gana
+            # si dos jugadores reservan la misma franja a la vez, sin leer antes de escribir
+            # El dueño y el precio se copian de la cancha en la misma sentencia
             cur.execute("""
-                INSERT INTO reservas (id_usuario, cancha, fecha, horario, numero, mensaje, estado)
-                VALUES (?, ?, ?, ?, ?, ?, 'pendiente')
-            """, (current_user.id, cancha['nombre'], fecha, horario, numero, mensaje))
+                INSERT INTO reservas (id_usuario, id_cancha, cancha, fecha, horario, slot, numero, mensaje, estado,
+                                      id_dueno, precio)
+                SELECT ?, id_cancha, ?, ?, ?, ?, ?, ?, 'pendiente', usuario_id, precio_num
+                FROM canchas WHERE id_cancha = ?
+                ON CONFLICT (id_cancha, fecha, slot) DO NOTHING
+                RETURNING precio
+            """, (current_user.id, cancha['nombre'], fecha, horario, slot, numero, mensaje, id_cancha))
+            insertada = cur.fetchall()
+            reservada = len(insertada) == 1
+            if reservada:
+                estadisticas.registrar_movimiento(cur, id_cancha, fecha, reservas=1, ingresos=insertada[0][0])
             db.commit()
             
+            if not reservada:
+                flash(f'El horario {horario} del {fecha} ya fue reservado. Por favor elige otro.', 'error')
+                return render_template('usuario_reservar.html', cancha=cancha, horario_funcionamiento=horario_funcionamiento)
+            
             flash(f'¡Reserva confirmada para {cancha["nombre"]} el {fecha} a las {horario}!', 'success')
             return redirect(url_for('usuario_mis_reservas'))
             
@@ -751,19 +879,37 @@ def usuario_reservar(id_cancha):
 def usuario_mis_reservas():
     db = get_db()
     cur = db.cursor()
-    
-    cur.execute("""
-        SELECT r.id_reserva, r.cancha, r.fecha, r.horario, r.numero, r.mensaje,
-               c.precio, c.imagen_url, c.direccion, r.estado, c.id_cancha,
-               r.goles_equipo1, r.goles_equipo2, r.tarjetas_amarillas, r.tarjetas_rojas
-        FROM reservas r
-        JOIN canchas c ON r.cancha = c.nombre
-        WHERE r.id_usuario = ?
-        ORDER BY r.fecha DESC, r.horario DESC
-    """, (current_user.id,))
-    reservas = cur.fetchall()
-    
-    return render_template('usuario_reservas.html', reservas=reservas)
+    tamano = por_pagina(request.args.get('por_pagina'))
+
+    pendientes, siguiente_pendientes = _pagina_reservas_usuario(cur, 'pendiente', tamano=tamano)
+    completadas, siguiente_completadas = _pagina_reservas_usuario(cur, 'completada', tamano=tamano)
+
+    return render_template('usuario_reservas.html',
+                         pendientes=pendientes,
+                         completadas=completadas,
+                         siguiente={'pendiente': siguiente_pendientes, 'completada': siguiente_completadas},
+                         por_pagina=tamano)
+
+@app.route('/api/usuario/reservas')
+@login_required
+def api_usuario_reservas():
+    """Siguiente página de reservas del usuario (botón Cargar más)"""
+    estado = request.args.get('estado')
+    if estado not in ESTADOS_RESERVA:
+        return jsonify({'success': False, 'message': 'Estado no válido'}), 400
+
+    cur = get_db().cursor()
+    reservas, siguiente = _pagina_reservas_usuario(cur, estado,
+                                                   cursor=request.args.get('cursor'),
+                                                   tamano=por_pagina(request.args.get('por_pagina')))
+
+    return jsonify({
+        'success': True,
+        'html': {
+            'tarjetas': render_template('partials/usuario_reservas_tarjetas.html', reservas=reservas)
+        },
+        'siguiente': siguiente
+    })
 
 @app.route('/usuario/cancelar-reserva/<int:id>', methods=['POST'])
 @login_required
@@ -772,10 +918,11 @@ def usuario_cancelar_reserva(id):
     cur = db.cursor()
     
     cur.execute("""
-        SELECT id_reserva, cancha, fecha 
-        FROM reservas 
-        WHERE id_reserva = ? AND id_usuario = ? AND fecha >= date('now')
-    """, (id, current_user.id))
+        SELECT r.id_reserva, c.nombre as cancha, r.fecha, r.id_cancha, r.precio
+        FROM reservas r
+        JOIN canchas c ON r.id_cancha = c.id_cancha
+        WHERE r.id_reserva = ? AND r.id_usuario = ? AND r.estado = 'pendiente' AND r.fecha >= ?
+    """, (id, current_user.id, ahora_local().date().isoformat()))
     reserva = cur.fetchone()
     
     if not reserva:
@@ -783,7 +930,16 @@ def usuario_cancelar_reserva(id):
         return redirect(url_for('usuario_mis_reservas'))
     
     try:
-        cur.execute("DELETE FROM reservas WHERE id_reserva = ? AND id_usuario = ?", (id, current_user.id))
+        # Solo las pendientes: si marcar_completadas la completó entre el SELECT y el DELETE,
+        # no se borra (sus estadísticas ya cuentan la completada)
+        cur.execute("DELETE FROM reservas WHERE id_reserva = ? AND id_usuario = ? AND estado = 'pendiente'",
+                    (id, current_user.id))
+        if cur.rowcount != 1:
+            db.rollback()
+            flash('Reserva no encontrada o no se puede cancelar', 'error')
+            return redirect(url_for('usuario_mis_reservas'))
+        estadisticas.registrar_movimiento(cur, reserva['id_cancha'], reserva['fecha'], reservas=-1,
+                                          ingresos=-(reserva['precio'] or 0))
         db.commit()
         flash(f'Reserva para {reserva["cancha"]} cancelada exitosamente', 'success')
     except Exception as e:
@@ -802,7 +958,7 @@ def usuario_favoritos():
     cur.execute("""
         SELECT c.id_cancha, c.nombre, c.precio, c.descripcion, c.imagen_url, c.direccion
         FROM favoritos f
-        JOIN canchas c ON f.cancha = c.nombre
+        JOIN canchas c ON f.id_cancha = c.id_cancha
         WHERE f.id_usuario = ?
         ORDER BY f.fecha_agregado DESC
     """, (current_user.id,))
@@ -825,17 +981,18 @@ def usuario_agregar_favorito(id_cancha):
     try:
         cur.execute("""
             SELECT id_favorito FROM favoritos 
-            WHERE id_usuario = ? AND cancha = ?
-        """, (current_user.id, cancha['nombre']))
+            WHERE id_usuario = ? AND id_cancha = ?
+        """, (current_user.id, id_cancha))
         
         if cur.fetchone():
             return jsonify({'success': False, 'message': 'Ya está en favoritos'}), 400
         
         cur.execute("""
-            INSERT INTO favoritos (id_usuario, cancha)
-            VALUES (?, ?)
-        """, (current_user.id, cancha['nombre']))
+            INSERT INTO favoritos (id_usuario, id_cancha, cancha)
+            VALUES (?, ?, ?)
+        """, (current_user.id, id_cancha, cancha['nombre']))
         db.commit()
+        cache_respuestas.invalidar_favoritos(db, current_user.id)
         
         return jsonify({'success': True, 'message': 'Agregado a favoritos'})
     except Exception as e:
@@ -858,9 +1015,10 @@ def usuario_eliminar_favorito(id_cancha):
     try:
         cur.execute("""
             DELETE FROM favoritos 
-            WHERE id_usuario = ? AND cancha = ?
-        """, (current_user.id, cancha['nombre']))
+            WHERE id_usuario = ? AND id_cancha = ?
+        """, (current_user.id, id_cancha))
         db.commit()
+        cache_respuestas.invalidar_favoritos(db, current_user.id)
         
         flash('Eliminado de favoritos', 'success')
         return jsonify({'success': True, 'message': 'Eliminado de favoritos'})
@@ -903,6 +1061,7 @@ def perfil_usuario():
                 """, (nombre, correo, edad, direccion, current_user.id))
             
             db.commit()
+            invalidate_user(current_user.id)
             flash('Perfil actualizado exitosamente', 'success')
             return redirect(url_for('perfil_usuario'))
             
@@ -916,7 +1075,7 @@ def perfil_usuario():
     cur.execute("SELECT COUNT(*) FROM reservas WHERE id_usuario = ?", (current_user.id,))
     total_reservas = cur.fetchone()[0]
     
-    cur.execute("SELECT COUNT(DISTINCT cancha) FROM reservas WHERE id_usuario = ?", (current_user.id,))
+    cur.execute("SELECT COUNT(DISTINCT id_cancha) FROM reservas WHERE id_usuario = ?", (current_user.id,))
     canchas_visitadas = cur.fetchone()[0]
     
     return render_template('perfil_usuario.html', 
@@ -944,24 +1103,197 @@ def check_availability(id_cancha, fecha):
         db = get_db()
         cur = db.cursor()
         
-        # Obtener reservas activas para esa cancha y fecha
+        # Horario de apertura y franjas ocupadas en una sola consulta (usa idx_reservas_slot_unico)
         cur.execute("""
-            SELECT r.horario 
-            FROM reservas r
-            JOIN canchas c ON r.cancha = c.nombre
-            WHERE c.id_cancha = ? 
-            AND r.fecha = ?
-        """, (id_cancha, fecha))
+            SELECT h.hora_inicio, h.hora_fin, r.slot
+            FROM canchas c
+            LEFT JOIN horarios_canchas h ON h.id_cancha = c.id_cancha
+            LEFT JOIN reservas r ON r.id_cancha = c.id_cancha AND r.fecha = ? AND r.slot IS NOT NULL
+            WHERE c.id_cancha = ?
+        """, (fecha, id_cancha))
+        
+        filas = cur.fetchall()
+        if not filas:
+            return jsonify({'success': False, 'error': 'Cancha no encontrada'}), 404
+        
+        ocupados = {fila[2] for fila in filas if fila[2] is not None}
+        slots = slots_de_apertura(filas[0][0], filas[0][1])
+        
+        return jsonify({
+            'success': True,
+            'horarios_ocupados': [horario_de_slot(s) for s in sorted(ocupados)],
+            'horarios_disponibles': [horario_de_slot(s) for s in slots if s not in ocupados]
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# Límites del API de disponibilidad por rango
+MAX_DIAS_RANGO = 62
+MAX_CANCHAS_RANGO = 50
+
+# API de disponibilidad de un rango de fechas para una o varias canchas
+@app.route('/api/disponibilidad/rango')
+@login_required
+def check_availability_range():
+    try:
+        ids = [int(x) for x in request.args.get('canchas', '').split(',') if x.strip()]
+        desde = datetime.strptime(request.args.get('desde', ahora_local().strftime('%Y-%m-%d')), '%Y-%m-%d').date()
+        if request.args.get('hasta'):
+            hasta = datetime.strptime(request.args['hasta'], '%Y-%m-%d').date()
+        else:
+            hasta = desde + timedelta(days=int(request.args.get('dias', 31)) - 1)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Parámetros inválidos'}), 400
+    
+    if not ids or len(ids) > MAX_CANCHAS_RANGO:
+        return jsonify({'success': False, 'error': f'Indica entre 1 y {MAX_CANCHAS_RANGO} canchas'}), 400
+    if hasta < desde or (hasta - desde).days >= MAX_DIAS_RANGO:
+        return jsonify({'success': False, 'error': f'El rango debe tener entre 1 y {MAX_DIAS_RANGO} días'}), 400
+    
+    try:
+        db = get_db()
+        cur = db.cursor()
+        marcadores = ', '.join(['?'] * len(ids))
+        
+        cur.execute(f"""
+            SELECT c.id_cancha, h.hora_inicio, h.hora_fin
+            FROM canchas c
+            LEFT JOIN horarios_canchas h ON h.id_cancha = c.id_cancha
+            WHERE c.id_cancha IN ({marcadores})
+        """, ids)
+        canchas = {}
+        for fila in cur.fetchall():
+            slots = slots_de_apertura(fila[1], fila[2])
+            canchas[str(fila[0])] = {
+                'apertura': slots[0] if slots else None,
+                'cierre': slots[-1] + 1 if slots else None,
+                'ocupados': {}
+            }
         
-        reservas = cur.fetchall()
-        horarios_ocupados = [r[0] for r in reservas]
+        # Un único recorrido de rango sobre idx_reservas_slot_unico (id_cancha, fecha, slot)
+        cur.execute(f"""
+            SELECT id_cancha, fecha, slot
+            FROM reservas
+            WHERE id_cancha IN ({marcadores})
+            AND fecha BETWEEN ? AND ?
+            AND slot IS NOT NULL
+            ORDER BY id_cancha, fecha, slot
+        """, ids + [desde.isoformat(), hasta.isoformat()])
+        for id_cancha, fecha, slot in cur.fetchall():
+            if str(id_cancha) not in canchas:
+                continue
+            # La fecha puede venir como string o como objeto date dependiendo del driver
+            ocupados = canchas[str(id_cancha)]['ocupados']
+            ocupados.setdefault(str(fecha)[:10], []).append(slot)
         
+        response = jsonify({
+            'success': True,
+            'desde': desde.isoformat(),
+            'hasta': hasta.isoformat(),
+            'canchas': canchas
+        })
+        # ETag del contenido: si nada cambió el navegador recibe 304 sin cuerpo
+        response.add_etag()
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response.make_conditional(request)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# API de canchas cercanas a un punto (coordenadas guardadas, sin geocodificar en el navegador)
+@app.route('/api/canchas/cercanas')
+def canchas_cercanas():
+    try:
+        lat = float(request.args['lat'])
+        lng = float(request.args['lng'])
+        radio_km = float(request.args.get('radio_km', geocodificacion.RADIO_DEFECTO_KM))
+        limite = int(request.args.get('limite', 20))
+    except (KeyError, ValueError):
+        return jsonify({'success': False, 'error': 'Parámetros inválidos'}), 400
+    
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return jsonify({'success': False, 'error': 'Coordenadas fuera de rango'}), 400
+    if not (0 < radio_km <= geocodificacion.RADIO_MAXIMO_KM):
+        return jsonify({'success': False, 'error': f'El radio debe estar entre 0 y {geocodificacion.RADIO_MAXIMO_KM} km'}), 400
+    limite = max(1, min(limite, 100))
+    
+    try:
+        cur = get_db().cursor()
         return jsonify({
             'success': True,
-            'horarios_ocupados': horarios_ocupados
+            'origen': {'lat': lat, 'lng': lng},
+            'radio_km': radio_km,
+            'canchas': geocodificacion.canchas_cercanas(cur, lat, lng, radio_km, limite)
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def _filtros_busqueda(args):
+    """Parámetros de búsqueda de canchas (?q=&precio_min=&precio_max=&hora=&fecha=&pagina=); ValueError si no son válidos"""
+    def numero(nombre, tipo):
+        valor = args.get(nombre, '').strip()
+        return tipo(valor) if valor else None
+    
+    filtros = {
+        'texto': args.get('q', '').strip(),
+        'precio_min': numero('precio_min', float),
+        'precio_max': numero('precio_max', float),
+        'hora': numero('hora', int),
+        'fecha': args.get('fecha', '').strip() or None,
+        'pagina': numero('pagina', int) or 1
+    }
+    if filtros['hora'] is not None and not 0 <= filtros['hora'] <= 23:
+        raise ValueError('hora')
+    if filtros['fecha']:
+        filtros['fecha'] = datetime.strptime(filtros['fecha'], '%Y-%m-%d').date().isoformat()
+    if filtros['pagina'] < 1:
+        raise ValueError('pagina')
+    return filtros
+
+# API de búsqueda de canchas por texto, precio, hora de apertura y franjas libres en una fecha
+@app.route('/api/canchas/buscar')
+def buscar_canchas():
+    try:
+        filtros = _filtros_busqueda(request.args)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Parámetros inválidos'}), 400
+    pagina = filtros.pop('pagina')
+    tamano = por_pagina(request.args.get('por_pagina'))
+    
+    try:
+        db = get_db()
+        cur = db.cursor()
+        ids, hay_mas, facetas = busqueda.buscar(cur, db.db_type, pagina=pagina, tamano=tamano,
+                                                facetas=pagina == 1, **filtros)
+        por_id = catalogo.por_id(cur)
+        canchas = []
+        for id_cancha in ids:
+            c = por_id.get(id_cancha)
+            if c is None:
+                continue
+            canchas.append({
+                'id_cancha': c['id_cancha'],
+                'nombre': c['nombre'],
+                'descripcion': c['descripcion'],
+                'direccion': c['direccion'],
+                'precio': c['precio'],
+                'precio_num': float(c['precio_num']) if c['precio_num'] is not None else None,
+                'imagen': static_url(c['imagen']),
+                'hora_inicio': str(c['hora_inicio']) if c['hora_inicio'] is not None else None,
+                'hora_fin': str(c['hora_fin']) if c['hora_fin'] is not None else None
+            })
+        respuesta = {
+            'success': True,
+            'canchas': canchas,
+            'pagina': pagina,
+            'siguiente': pagina + 1 if hay_mas else None
+        }
+        if facetas is not None:
+            respuesta['facetas'] = facetas
+        return jsonify(respuesta)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 if __name__ == "__main__":
+    # En producción el hilo lo inicia gunicorn.conf.py en cada worker
+    marcar_completadas.iniciar_hilo()
     app.run(debug=True)
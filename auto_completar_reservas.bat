@@ -1,13 +1,15 @@
 @echo off
 REM Script para ejecutar automáticamente la actualización de estados de reservas
-REM Puedes programar este script con el Programador de Tareas de Windows
+REM Puedes programar este script con el Programador de Tareas de Windows,
+REM o dejar corriendo "python marcar_completadas.py --cada 300" (modo programador)
 
 echo ========================================
 echo Actualizando estados de reservas
 echo ========================================
 echo.
 
-cd /d "c:\Users\du28f\Downloads\campofinder\campo finder\campo finder"
+REM Carpeta del proyecto (la misma de este script)
+cd /d "%~dp0"
 
 python marcar_completadas.py
 
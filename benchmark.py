@@ -0,0 +1,240 @@
+"""
+Benchmark de las rutas principales con el cliente de pruebas de Flask
+
+Recorre cada ruta con un jugador y con el dueño que más canchas tiene, mide la latencia
+(p50/p95/p99) y las consultas SQL por petición (instrumentacion.py) y puede guardar el
+resultado como línea base para comparar después:
+
+    python datos_sinteticos.py --usuarios 100000 --canchas 2000 --reservas 5000000
+    python benchmark.py --guardar antes           # benchmarks/antes.json
+    ... cambios ...
+    python benchmark.py --comparar antes          # sale con código 1 si hay regresiones
+
+Por defecto usa la base SQLite sintetico.db (SQLITE_DATABASE); para PostgreSQL se
+configura DATABASE_URL y RAILWAY_ENVIRONMENT como en producción. La ruta
+usuario_reservar (POST) crea reservas reales; --solo-lectura la omite.
+"""
+import argparse
+import json
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+
+CARPETA_BASES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks')
+# Una ruta empeora si su p95 sube más que esto (proporción, y al menos MINIMO_MS para no
+# marcar el ruido de las rutas de 1 ms) o si hace en promedio media consulta más
+TOLERANCIA = 0.2
+MINIMO_MS = 2.0
+
+def _rutas(contexto, rng):
+    """(nombre, usuario, método, generador de (url, datos)) de cada ruta medida"""
+    canchas = contexto['canchas']
+
+    def disponibilidad():
+        fecha = date.today() + timedelta(days=rng.randint(-30, 30))
+        return f"/api/disponibilidad/{rng.choice(canchas)}/{fecha.isoformat()}", None
+
+    def reservar():
+        fecha = date.today() + timedelta(days=rng.randint(1, 60))
+        return f"/usuario/reservar/{rng.choice(canchas)}", {
+            'fecha': fecha.isoformat(), 'horario': '%02d:00' % rng.randint(8, 21),
+            'numero': '3000000000', 'mensaje': 'benchmark'
+        }
+
+    return [
+        ('index', 'jugador', 'GET', lambda: ('/', None)),
+        ('usuario_explorar', 'jugador', 'GET', lambda: ('/usuario/explorar', None)),
+        ('dashboard_dueño', 'dueno', 'GET', lambda: ('/dashboard_dueño', None)),
+        ('dueno_reservas', 'dueno', 'GET', lambda: ('/dueño/reservas', None)),
+        ('check_availability', 'jugador', 'GET', disponibilidad),
+        ('usuario_reservar', 'jugador', 'POST', reservar)
+    ]
+
+def _contexto(cur):
+    """Usuarios y canchas para el benchmark: el jugador con más reservas y el dueño con más canchas"""
+    cur.execute("""
+        SELECT r.id_usuario, u.correo FROM reservas r JOIN usuarios u ON u.id = r.id_usuario
+        WHERE u.rol = 'usuario' GROUP BY r.id_usuario, u.correo ORDER BY COUNT(*) DESC LIMIT 1
+    """)
+    jugador = cur.fetchone()
+    cur.execute("""
+        SELECT c.usuario_id, u.correo FROM canchas c JOIN usuarios u ON u.id = c.usuario_id
+        WHERE u.rol = 'dueño' GROUP BY c.usuario_id, u.correo ORDER BY COUNT(*) DESC LIMIT 1
+    """)
+    dueno = cur.fetchone()
+    cur.execute("SELECT id_cancha FROM canchas WHERE usuario_id IS NOT NULL")
+    canchas = [fila[0] for fila in cur.fetchall()]
+
+    volumen = {}
+    for tabla in ('usuarios', 'canchas', 'favoritos', 'reservas'):
+        cur.execute(f"SELECT COUNT(*) FROM {tabla}")
+        volumen[tabla] = cur.fetchone()[0]
+
+    return {
+        'jugador': jugador[1] if jugador else None,
+        'dueno': dueno[1] if dueno else None,
+        'canchas': canchas,
+        'volumen': volumen
+    }
+
+def percentil(valores, p):
+    """Percentil p (0-100) con interpolación lineal sobre los valores ordenados"""
+    if not valores:
+        return None
+    posicion = (len(valores) - 1) * p / 100
+    inferior = int(posicion)
+    superior = min(inferior + 1, len(valores) - 1)
+    return valores[inferior] + (valores[superior] - valores[inferior]) * (posicion - inferior)
+
+def _medir(cliente, nombre, metodo, generar, iteraciones, calentamiento):
+    import instrumentacion
+
+    def pedir():
+        url, datos = generar()
+        respuesta = cliente.post(url, data=datos) if metodo == 'POST' else cliente.get(url)
+        return respuesta.status_code
+
+    # Calentamiento: cachés (catálogo, usuarios) y páginas de SQLite cargadas
+    for _ in range(calentamiento):
+        pedir()
+
+    instrumentacion.reiniciar()
+    tiempos = []
+    errores = 0
+    for _ in range(iteraciones):
+        inicio = time.perf_counter()
+        estado = pedir()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        if estado >= 400:
+            errores += 1
+
+    tiempos.sort()
+    sql = instrumentacion.metricas()['rutas'].get(nombre)
+    return {
+        'peticiones': iteraciones,
+        'errores': errores,
+        'p50_ms': round(percentil(tiempos, 50), 2),
+        'p95_ms': round(percentil(tiempos, 95), 2),
+        'p99_ms': round(percentil(tiempos, 99), 2),
+        'media_ms': round(sum(tiempos) / len(tiempos), 2),
+        'consultas': sql['consultas_promedio'] if sql else None,
+        'consultas_max': sql['consultas_max'] if sql else None,
+        'tiempo_db_ms': sql['tiempo_db_promedio_ms'] if sql else None
+    }
+
+def ejecutar(iteraciones=100, calentamiento=10, solo_lectura=False, jugador=None, dueno=None,
+             contrasena=None, semilla=1):
+    """Corre el benchmark de todas las rutas; devuelve el resultado (dict serializable a JSON)"""
+    from app import app
+    from db import get_db
+    from datos_sinteticos import CONTRASENA
+
+    app.config['TESTING'] = True
+    with app.app_context():
+        contexto = _contexto(get_db().cursor())
+    contexto['jugador'] = jugador or contexto['jugador']
+    contexto['dueno'] = dueno or contexto['dueno']
+    if not contexto['jugador'] or not contexto['dueno'] or not contexto['canchas']:
+        raise ValueError("La base no tiene jugadores con reservas, dueños con canchas o canchas "
+                         "(genera datos con datos_sinteticos.py)")
+
+    clientes = {}
+    for rol in ('jugador', 'dueno'):
+        cliente = app.test_client()
+        respuesta = cliente.post('/login', data={'correo': contexto[rol], 'contraseña': contrasena or CONTRASENA})
+        if respuesta.status_code != 302:
+            raise ValueError(f"No se pudo iniciar sesión como {contexto[rol]}")
+        clientes[rol] = cliente
+
+    rng = random.Random(semilla)
+    resultados = {}
+    for nombre, rol, metodo, generar in _rutas(contexto, rng):
+        if solo_lectura and metodo != 'GET':
+            continue
+        resultados[nombre] = _medir(clientes[rol], nombre, metodo, generar, iteraciones, calentamiento)
+        r = resultados[nombre]
+        print(f"   ✓ {nombre:<20} p50 {r['p50_ms']:>8.2f}  p95 {r['p95_ms']:>8.2f}  p99 {r['p99_ms']:>8.2f} ms"
+              f"  {r['consultas'] if r['consultas'] is not None else '-':>5} consultas"
+              + (f"  ⚠️  {r['errores']} errores" if r['errores'] else ''))
+
+    from config import DB_CONFIG
+    return {
+        'generado': datetime.now().isoformat(timespec='seconds'),
+        'base': DB_CONFIG['type'],
+        'volumen': contexto['volumen'],
+        'iteraciones': iteraciones,
+        'rutas': resultados
+    }
+
+def comparar(base, actual, tolerancia=TOLERANCIA):
+    """Imprime la comparación con una línea base; devuelve las rutas que empeoraron"""
+    regresiones = []
+    print(f"\n📊 Comparación con la línea base del {base['generado']}:")
+    # usuario_reservar agrega unas pocas reservas en cada corrida: solo se avisa si cambia más del 1%
+    volumen_base, volumen = base.get('volumen', {}), actual.get('volumen', {})
+    if any(abs(volumen.get(t, 0) - n) > n * 0.01 for t, n in volumen_base.items()):
+        print(f"   ⚠️  El volumen de datos es distinto: {volumen_base} -> {volumen}")
+    for nombre, r in actual['rutas'].items():
+        anterior = base['rutas'].get(nombre)
+        if anterior is None:
+            print(f"   • {nombre}: sin línea base")
+            continue
+        cambio = (r['p95_ms'] - anterior['p95_ms']) / anterior['p95_ms'] if anterior['p95_ms'] else 0
+        mas_lenta = cambio > tolerancia and r['p95_ms'] - anterior['p95_ms'] > MINIMO_MS
+        mas_consultas = (r['consultas'] or 0) - (anterior['consultas'] or 0) >= 0.5
+        empeoro = mas_lenta or mas_consultas
+        if empeoro:
+            regresiones.append(nombre)
+        print(f"   {'❌' if empeoro else '✓'} {nombre:<20} p95 {anterior['p95_ms']:.2f} -> {r['p95_ms']:.2f} ms "
+              f"({cambio:+.0%}), consultas {anterior['consultas']} -> {r['consultas']}")
+    return regresiones
+
+def _archivo(nombre):
+    return os.path.join(CARPETA_BASES, nombre if nombre.endswith('.json') else f"{nombre}.json")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark de las rutas principales (latencia y consultas)')
+    parser.add_argument('--base', help='archivo SQLite a medir (por defecto SQLITE_DATABASE o sintetico.db)')
+    parser.add_argument('--iteraciones', type=int, default=100, help='peticiones medidas por ruta (100)')
+    parser.add_argument('--calentamiento', type=int, default=10, help='peticiones previas sin medir (10)')
+    parser.add_argument('--solo-lectura', action='store_true', help='omitir usuario_reservar (POST)')
+    parser.add_argument('--jugador', help='correo del jugador (por defecto el que más reservas tiene)')
+    parser.add_argument('--dueno', help='correo del dueño (por defecto el que más canchas tiene)')
+    parser.add_argument('--contrasena', help='contraseña de ambos (por defecto la de datos_sinteticos.py)')
+    parser.add_argument('--guardar', metavar='NOMBRE', help='guardar el resultado en benchmarks/NOMBRE.json')
+    parser.add_argument('--comparar', metavar='NOMBRE', help='comparar con benchmarks/NOMBRE.json')
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA,
+                        help=f'aumento de p95 tolerado antes de marcar regresión ({TOLERANCIA})')
+    args = parser.parse_args()
+
+    # La configuración se lee al importar la aplicación: la base se elige antes
+    if args.base:
+        os.environ['SQLITE_DATABASE'] = args.base
+    else:
+        os.environ.setdefault('SQLITE_DATABASE', 'sintetico.db')
+
+    print("🚀 Benchmark de rutas...")
+    print("=" * 60)
+    try:
+        resultado = ejecutar(args.iteraciones, args.calentamiento, args.solo_lectura,
+                             args.jugador, args.dueno, args.contrasena)
+    except ValueError as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+    print(f"   Volumen: {resultado['volumen']}")
+
+    if args.guardar:
+        os.makedirs(CARPETA_BASES, exist_ok=True)
+        with open(_archivo(args.guardar), 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Línea base guardada en {_archivo(args.guardar)}")
+
+    if args.comparar:
+        with open(_archivo(args.comparar), 'r', encoding='utf-8') as f:
+            base = json.load(f)
+        regresiones = comparar(base, resultado, args.tolerancia)
+        if regresiones:
+            print(f"\n❌ Regresiones en: {', '.join(regresiones)}")
+            raise SystemExit(1)
+        print("\n✅ Sin regresiones")
@@ -0,0 +1,176 @@
+"""
+Búsqueda de canchas por texto (nombre, dirección y descripción) con filtros de precio,
+hora de apertura y franjas libres en una fecha.
+
+El texto se resuelve con el índice de texto completo de cada motor, así el costo
+depende de las coincidencias y no del tamaño del catálogo:
+- PostgreSQL: índice GIN idx_canchas_busqueda sobre DOCUMENTO_POSTGRES (tsvector
+  'spanish' con pesos A/B/C para nombre, dirección y descripción) y ts_rank.
+- SQLite: tabla FTS5 canchas_fts (tokenizer unicode61 sin tildes) que mantienen los
+  triggers de FTS_SQLITE, y bm25 con los mismos pesos relativos.
+Cada palabra se busca como prefijo ("cupu" encuentra "Cúpula") y sin tildes.
+"""
+import re
+import unicodedata
+from disponibilidad import HORA_APERTURA_DEFECTO, HORA_CIERRE_DEFECTO
+from paginacion import POR_PAGINA_DEFECTO
+
+# Palabras de la consulta que se tienen en cuenta
+MAX_PALABRAS = 8
+
+# translate() de PostgreSQL que deja el texto en minúsculas sin tildes (como palabras())
+_CON_TILDE = 'áàäâéèëêíìïîóòöôúùüûñç'
+_SIN_TILDE = 'aaaaeeeeiiiioooouuuunc'
+
+def _campo_postgres(campo, peso):
+    return (f"setweight(to_tsvector('spanish'::regconfig, translate(lower(coalesce({campo}, '')), "
+            f"'{_CON_TILDE}', '{_SIN_TILDE}')), '{peso}')")
+
+# Expresión indexada: las consultas deben usarla tal cual para que el planificador use el índice
+DOCUMENTO_POSTGRES = ' || '.join(_campo_postgres(campo, peso) for campo, peso in
+                                 (('nombre', 'A'), ('direccion', 'B'), ('descripcion', 'C')))
+
+# Tabla FTS5 con el contenido en canchas (no duplica el texto) y sus triggers de sincronización
+FTS_SQLITE = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS canchas_fts USING fts5(
+        nombre, direccion, descripcion,
+        content='canchas', content_rowid='id_cancha',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS canchas_fts_insertar AFTER INSERT ON canchas BEGIN
+        INSERT INTO canchas_fts (rowid, nombre, direccion, descripcion)
+        VALUES (new.id_cancha, new.nombre, new.direccion, new.descripcion);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS canchas_fts_eliminar AFTER DELETE ON canchas BEGIN
+        INSERT INTO canchas_fts (canchas_fts, rowid, nombre, direccion, descripcion)
+        VALUES ('delete', old.id_cancha, old.nombre, old.direccion, old.descripcion);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS canchas_fts_actualizar AFTER UPDATE OF nombre, direccion, descripcion ON canchas BEGIN
+        INSERT INTO canchas_fts (canchas_fts, rowid, nombre, direccion, descripcion)
+        VALUES ('delete', old.id_cancha, old.nombre, old.direccion, old.descripcion);
+        INSERT INTO canchas_fts (rowid, nombre, direccion, descripcion)
+        VALUES (new.id_cancha, new.nombre, new.direccion, new.descripcion);
+    END
+    """
+]
+# bm25 de (nombre, direccion, descripcion): menor es más relevante
+RELEVANCIA_SQLITE = "bm25(canchas_fts, 10.0, 4.0, 1.0)"
+
+# Hora entera de un TIME (SQLite lo guarda como texto 'HH:MM[:SS]')
+_HORA = {
+    'postgresql': "CAST(EXTRACT(HOUR FROM {}) AS INTEGER)",
+    'sqlite': "CAST(substr({}, 1, 2) AS INTEGER)"
+}
+
+def palabras(texto):
+    """Palabras de la consulta en minúsculas y sin tildes: 'Cúpula Soacha' -> ['cupula', 'soacha']"""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(ch for ch in texto if not unicodedata.combining(ch)).lower()
+    return re.findall(r'\w+', texto)[:MAX_PALABRAS]
+
+def _filtros(db_type, precio_min, precio_max, hora, fecha):
+    """(condiciones sin el precio, sus parámetros, condiciones de precio, sus parámetros)"""
+    condiciones, params = ["c.usuario_id IS NOT NULL"], []
+
+    if hora is not None:
+        # Abierta en la franja [hora, hora + 1): abre antes del fin de la franja y cierra después
+        fin_franja = '%02d:00' % (hora + 1)
+        abierta = """EXISTS (
+            SELECT 1 FROM horarios_canchas h
+            WHERE h.id_cancha = c.id_cancha AND h.hora_inicio < ? AND h.hora_fin >= ?
+        )"""
+        params += [fin_franja, fin_franja]
+        # Sin horarios_canchas la cancha abre en el horario por defecto
+        if HORA_APERTURA_DEFECTO <= hora < HORA_CIERRE_DEFECTO:
+            abierta = f"({abierta} OR NOT EXISTS (SELECT 1 FROM horarios_canchas h WHERE h.id_cancha = c.id_cancha))"
+        condiciones.append(abierta)
+
+    if fecha is not None:
+        if hora is not None:
+            # Búsqueda puntual en idx_reservas_slot_unico (id_cancha, fecha, slot)
+            condiciones.append("""NOT EXISTS (
+                SELECT 1 FROM reservas r WHERE r.id_cancha = c.id_cancha AND r.fecha = ? AND r.slot = ?
+            )""")
+            params += [fecha, hora]
+        else:
+            # Alguna franja libre: menos reservas ese día que franjas de apertura
+            horas = "{} - {}".format(_HORA[db_type].format('h.hora_fin'), _HORA[db_type].format('h.hora_inicio'))
+            condiciones.append(f"""(
+                SELECT COUNT(*) FROM reservas r
+                WHERE r.id_cancha = c.id_cancha AND r.fecha = ? AND r.slot IS NOT NULL
+            ) < COALESCE((SELECT MAX({horas}) FROM horarios_canchas h WHERE h.id_cancha = c.id_cancha), ?)""")
+            params += [fecha, HORA_CIERRE_DEFECTO - HORA_APERTURA_DEFECTO]
+
+    condiciones_precio, params_precio = [], []
+    if precio_min is not None:
+        condiciones_precio.append("c.precio_num >= ?")
+        params_precio.append(precio_min)
+    if precio_max is not None:
+        condiciones_precio.append("c.precio_num <= ?")
+        params_precio.append(precio_max)
+    return condiciones, params, condiciones_precio, params_precio
+
+def buscar(cur, db_type, texto='', precio_min=None, precio_max=None, hora=None, fecha=None,
+           pagina=1, tamano=POR_PAGINA_DEFECTO, facetas=False):
+    """
+    Busca canchas con dueño; devuelve (ids de la página, hay más páginas, facetas).
+    Con texto se ordenan por relevancia y si no, de la más nueva a la más antigua.
+    facetas=True agrega, si hay texto, {'total', 'precio_min', 'precio_max'}: el total con
+    todos los filtros y el rango de precios sin el filtro de precio (para mostrarlo). Sin
+    texto no se calculan: contarían el catálogo completo en cada búsqueda.
+    """
+    postgres = db_type == 'postgresql'
+    condiciones, params, condiciones_precio, params_precio = _filtros(db_type, precio_min, precio_max, hora, fecha)
+
+    desde = "canchas c"
+    relevancia, params_relevancia = "0", []
+    orden = "c.id_cancha DESC"
+    terminos = palabras(texto)
+    if terminos:
+        if postgres:
+            consulta = ' & '.join(f"{p}:*" for p in terminos)
+            condiciones.insert(0, f"({DOCUMENTO_POSTGRES}) @@ to_tsquery('spanish', ?)")
+            params.insert(0, consulta)
+            relevancia, params_relevancia = f"ts_rank({DOCUMENTO_POSTGRES}, to_tsquery('spanish', ?))", [consulta]
+            orden = "relevancia DESC, c.id_cancha DESC"
+        else:
+            desde = "canchas_fts JOIN canchas c ON c.id_cancha = canchas_fts.rowid"
+            condiciones.insert(0, "canchas_fts MATCH ?")
+            params.insert(0, ' AND '.join(f'"{p}"*' for p in terminos))
+            relevancia = RELEVANCIA_SQLITE
+            orden = "relevancia, c.id_cancha DESC"
+
+    donde = " AND ".join(condiciones + condiciones_precio)
+    cur.execute(f"""
+        SELECT c.id_cancha, {relevancia} AS relevancia
+        FROM {desde}
+        WHERE {donde}
+        ORDER BY {orden}
+        LIMIT ? OFFSET ?
+    """, params_relevancia + params + params_precio + [tamano + 1, (pagina - 1) * tamano])
+    ids = [fila[0] for fila in cur.fetchall()]
+    hay_mas = len(ids) > tamano
+
+    resumen = None
+    if facetas and terminos:
+        en_precio = " AND ".join(condiciones_precio) or "1 = 1"
+        cur.execute(f"""
+            SELECT COALESCE(SUM(CASE WHEN {en_precio} THEN 1 ELSE 0 END), 0),
+                   MIN(c.precio_num), MAX(c.precio_num)
+            FROM {desde}
+            WHERE {" AND ".join(condiciones)}
+        """, params_precio + params)
+        total, minimo, maximo = cur.fetchone()
+        resumen = {
+            'total': total,
+            'precio_min': float(minimo) if minimo is not None else None,
+            'precio_max': float(maximo) if maximo is not None else None
+        }
+    return ids[:tamano], hay_mas, resumen
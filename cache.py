@@ -0,0 +1,60 @@
+"""
+Cachés en memoria del proceso (uno por worker de gunicorn)
+Las entradas caducan por tiempo (TTL) y se descartan las menos usadas (LRU)
+"""
+import threading
+import time
+from collections import OrderedDict
+from config import USER_CACHE_CONFIG
+
+class TTLCache:
+    """Diccionario LRU con caducidad por tiempo, seguro entre hilos"""
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+# Registros ligeros de usuario (sin hash de contraseña) para el user_loader de Flask-Login.
+# Cada worker tiene su propia copia: la invalidación es local y el TTL acota
+# cuánto puede tardar otro worker en ver un cambio de perfil o de rol.
+user_cache = TTLCache(maxsize=USER_CACHE_CONFIG['maxsize'], ttl=USER_CACHE_CONFIG['ttl'])
+
+def invalidate_user(user_id):
+    """Debe llamarse después de modificar o eliminar un usuario"""
+    user_cache.delete(str(user_id))
@@ -0,0 +1,98 @@
+"""
+Caché de páginas renderizadas (inicio y explorar) con ETag y GET condicional.
+Estas páginas dependen solo del catálogo de canchas, de los favoritos de quien las pide
+y de los argumentos de la URL, así que el HTML ya renderizado se guarda en un LRU con
+esa clave:
+- ruta, argumentos que cambian la página y catalogo.version(), que cambia cuando el
+  catálogo se recarga (invalidar() después de modificar canchas u horarios);
+- con sesión iniciada, además el usuario (el menú muestra su nombre y rol) y la versión
+  de sus favoritos en versiones_datos, que avanza con invalidar_favoritos().
+Cada respuesta lleva un ETag fuerte (SHA-1 del cuerpo) y Cache-Control no-cache: el
+navegador revalida y, si la página no cambió, recibe 304 sin cuerpo. Las visitas
+anónimas al inicio no hacen consultas mientras el catálogo siga en memoria (salvo el
+contador de versión con CATALOG_CACHE_SHARED=true). De las páginas mayores que
+RESPONSE_CACHE_MAX_BYTES solo se guarda el ETag: se renderizan en cada visita nueva,
+pero las revalidaciones siguen recibiendo 304 sin renderizar.
+
+Las peticiones con mensajes flash pendientes se renderizan siempre: los mensajes salen
+en la página y se consumen al mostrarlos.
+"""
+from functools import wraps
+from flask import Response, make_response, request, session
+from flask_login import current_user
+import catalogo
+from cache import TTLCache
+from config import RESPONSE_CACHE_CONFIG
+from db import get_db
+
+_cache = TTLCache(maxsize=RESPONSE_CACHE_CONFIG['maxsize'], ttl=RESPONSE_CACHE_CONFIG['ttl'])
+
+def _nombre_favoritos(id_usuario):
+    return f"favoritos:{id_usuario}"
+
+def _version_favoritos(cur, id_usuario):
+    cur.execute("SELECT version FROM versiones_datos WHERE nombre = ?", (_nombre_favoritos(id_usuario),))
+    fila = cur.fetchone()
+    return fila[0] if fila else 0
+
+def invalidar_favoritos(db, id_usuario):
+    """Avanza la versión de los favoritos del usuario; se llama después del commit que los modificó"""
+    cur = db.cursor()
+    cur.execute("""
+        INSERT INTO versiones_datos (nombre, version) VALUES (?, 1)
+        ON CONFLICT (nombre) DO UPDATE SET version = versiones_datos.version + 1
+    """, (_nombre_favoritos(id_usuario),))
+    db.commit()
+
+def _clave(cur, parametros, kwargs):
+    clave = (request.endpoint, tuple(sorted(kwargs.items())),
+             tuple(request.args.get(p, '') for p in parametros), catalogo.version(cur))
+    if current_user.is_authenticated:
+        clave += (current_user.id, current_user.nombre, current_user.rol,
+                  _version_favoritos(cur, current_user.id))
+    return clave
+
+def cacheada(parametros=(), sin_cache=()):
+    """
+    Decorador de vistas GET que solo dependen del catálogo y de los favoritos del usuario.
+    parametros: argumentos de la URL que cambian la página (los demás se ignoran).
+    sin_cache: argumentos con los que la página depende de otros datos (p. ej. la
+    disponibilidad de una fecha, que cambia con cada reserva); con ellos se renderiza siempre.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            if (not RESPONSE_CACHE_CONFIG['activo'] or request.method != 'GET'
+                    or any(request.args.get(p) for p in sin_cache) or '_flashes' in session):
+                return vista(*args, **kwargs)
+
+            clave = _clave(get_db().cursor(), parametros, kwargs)
+            entrada = _cache.get(clave)
+            estado = 'HIT'
+            if entrada is not None and entrada[0] is None and not request.if_none_match.contains(entrada[2]):
+                # Página demasiado grande: solo se guardó su ETag para responder 304
+                entrada = None
+            if entrada is None:
+                estado = 'MISS'
+                respuesta = make_response(vista(*args, **kwargs))
+                if respuesta.status_code != 200 or respuesta.is_streamed:
+                    return respuesta
+                cuerpo = respuesta.get_data()
+                respuesta.add_etag()
+                entrada = (cuerpo, respuesta.content_type, respuesta.get_etag()[0])
+                guardado = entrada if len(cuerpo) <= RESPONSE_CACHE_CONFIG['max_bytes'] else (None,) + entrada[1:]
+                _cache.set(clave, guardado)
+
+            cuerpo, tipo, etag = entrada
+            respuesta = Response(cuerpo, content_type=tipo)
+            respuesta.set_etag(etag)
+            respuesta.headers['Cache-Control'] = 'private, no-cache' if current_user.is_authenticated else 'no-cache'
+            respuesta.headers['X-Cache'] = estado
+            respuesta.vary.add('Cookie')
+            return respuesta.make_conditional(request)
+        return envoltura
+    return decorador
+
+def estadisticas():
+    """Aciertos, fallos y páginas guardadas en este worker (para /admin/api/metricas)"""
+    return {'aciertos': _cache.hits, 'fallos': _cache.misses, 'entradas': len(_cache)}
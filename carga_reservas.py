@@ -0,0 +1,344 @@
+"""
+Prueba de carga concurrente de reservas contra una instancia en ejecución
+
+Muchas sesiones autenticadas (hilos, cada una con sus cookies) compiten a la vez por
+las mismas franjas (por defecto el viernes siguiente a las 20:00 en la cancha con más
+reservas): reservan (usuario_reservar), cancelan alguna de sus reservas pendientes
+(usuario_cancelar_reserva) y consultan la disponibilidad. Al final reporta
+throughput, tasas de error y latencia por operación, y verifica en la base de datos:
+
+- Que no haya dos reservas para la misma (cancha, fecha, franja).
+- Que el total de reservas sea el inicial + reservas confirmadas - cancelaciones.
+- Que las estadísticas mensuales de las canchas disputadas coincidan con las reservas.
+- Que los totales del dashboard del administrador coincidan (con --admin).
+
+    python app.py                                   # o gunicorn app:app
+    python carga_reservas.py --sesiones 200 --duracion 30
+    python carga_reservas.py --base sintetico.db --franjas 19,20,21 --admin admin@x.com
+
+Las sesiones son jugadores de la base (por defecto los de datos_sinteticos.py, con su
+contraseña). La base se lee con la misma configuración que los scripts (DATABASE_URL
+o SQLITE_DATABASE); debe ser la misma que usa la instancia y nadie más debe escribir
+en ella durante la prueba.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MEZCLA = 'reservar=5,cancelar=2,disponibilidad=3'
+TIMEOUT = 30
+
+class _SinRedireccion(urllib.request.HTTPRedirectHandler):
+    """Las redirecciones se devuelven tal cual: un 302 tras reservar significa éxito"""
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+class Sesion:
+    """Un jugador con su propia cookie de sesión"""
+    def __init__(self, url, correo):
+        self.url = url.rstrip('/')
+        self.correo = correo
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _SinRedireccion())
+
+    def pedir(self, ruta, datos=None):
+        """(código HTTP, cuerpo); los 3xx y 4xx/5xx no son excepciones"""
+        cuerpo = urllib.parse.urlencode(datos).encode('utf-8') if datos is not None else None
+        try:
+            with self.opener.open(self.url + ruta, data=cuerpo, timeout=TIMEOUT) as respuesta:
+                return respuesta.status, respuesta.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def iniciar(self, contrasena):
+        codigo, _ = self.pedir('/login', {'correo': self.correo, 'contraseña': contrasena})
+        return codigo == 302
+
+class Registro:
+    """Resultados de todas las sesiones (latencias y resultados por operación)"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencias = defaultdict(list)
+        self.resultados = defaultdict(Counter)
+        self.errores = Counter()
+
+    def anotar(self, operacion, resultado, segundos, detalle=None):
+        with self.lock:
+            self.latencias[operacion].append(segundos * 1000)
+            self.resultados[operacion][resultado] += 1
+            if detalle:
+                self.errores[f"{operacion}: {detalle}"] += 1
+
+def _reservar(sesion, registro, rng, objetivo):
+    id_cancha = rng.choice(objetivo['canchas'])
+    slot = rng.choice(objetivo['franjas'])
+    inicio = time.perf_counter()
+    try:
+        codigo, _ = sesion.pedir(f"/usuario/reservar/{id_cancha}", {
+            'fecha': objetivo['fecha'], 'horario': '%02d:00' % slot, 'numero': '3000000000', 'mensaje': 'carga'
+        })
+    except Exception as e:
+        registro.anotar('reservar', 'error', time.perf_counter() - inicio, type(e).__name__)
+        return
+    # 302 a mis reservas = confirmada; 200 = la página de nuevo con el aviso de franja ocupada
+    resultado = {302: 'ok', 200: 'conflicto'}.get(codigo, 'error')
+    registro.anotar('reservar', resultado, time.perf_counter() - inicio, None if resultado != 'error' else f"HTTP {codigo}")
+
+def _cancelar(sesion, registro, rng, objetivo):
+    inicio = time.perf_counter()
+    try:
+        codigo, cuerpo = sesion.pedir('/api/usuario/reservas?estado=pendiente&por_pagina=50')
+        ids = re.findall(r'cancelar-reserva/(\d+)', json.loads(cuerpo)['html']['tarjetas']) if codigo == 200 else []
+        if codigo != 200:
+            registro.anotar('cancelar', 'error', time.perf_counter() - inicio, f"HTTP {codigo} al listar")
+            return
+        if not ids:
+            registro.anotar('cancelar', 'sin_reservas', time.perf_counter() - inicio)
+            return
+        codigo, _ = sesion.pedir(f"/usuario/cancelar-reserva/{rng.choice(ids)}", {})
+        if codigo != 302:
+            registro.anotar('cancelar', 'error', time.perf_counter() - inicio, f"HTTP {codigo}")
+            return
+        duracion = time.perf_counter() - inicio
+        # Éxito y fallo redirigen igual: el mensaje flash de la página siguiente lo distingue
+        _, pagina = sesion.pedir('/usuario/mis-reservas')
+        resultado = 'ok' if 'cancelada exitosamente'.encode('utf-8') in pagina else 'rechazada'
+        registro.anotar('cancelar', resultado, duracion)
+    except Exception as e:
+        registro.anotar('cancelar', 'error', time.perf_counter() - inicio, type(e).__name__)
+
+def _disponibilidad(sesion, registro, rng, objetivo):
+    inicio = time.perf_counter()
+    try:
+        codigo, cuerpo = sesion.pedir(f"/api/disponibilidad/{rng.choice(objetivo['canchas'])}/{objetivo['fecha']}")
+        resultado = 'ok' if codigo == 200 and json.loads(cuerpo).get('success') else 'error'
+        registro.anotar('disponibilidad', resultado, time.perf_counter() - inicio,
+                        None if resultado == 'ok' else f"HTTP {codigo}")
+    except Exception as e:
+        registro.anotar('disponibilidad', 'error', time.perf_counter() - inicio, type(e).__name__)
+
+OPERACIONES = {
+    'reservar': _reservar,
+    'cancelar': _cancelar,
+    'disponibilidad': _disponibilidad
+}
+
+def _mezcla(texto):
+    pesos = {}
+    for parte in texto.split(','):
+        nombre, _, peso = parte.partition('=')
+        if nombre.strip() not in OPERACIONES:
+            raise ValueError(f"Operación desconocida: {nombre}")
+        pesos[nombre.strip()] = float(peso or 1)
+    return pesos
+
+def _sesion_de_carga(sesion, registro, objetivo, pesos, barrera, fin, semilla, pausa):
+    rng = random.Random(semilla)
+    nombres, valores = list(pesos), list(pesos.values())
+    barrera.wait()
+    while time.monotonic() < fin[0]:
+        OPERACIONES[rng.choices(nombres, weights=valores)[0]](sesion, registro, rng, objetivo)
+        if pausa:
+            time.sleep(rng.uniform(0, 2 * pausa))
+
+def _conteos(conn, objetivo):
+    """Totales de la base para comparar antes y después"""
+    cur = conn.cursor()
+    cur.execute("SELECT COUNT(*) FROM reservas")
+    total = cur.fetchone()[0]
+    canchas = ', '.join(['?'] * len(objetivo['canchas']))
+    franjas = ', '.join(['?'] * len(objetivo['franjas']))
+    cur.execute(f"SELECT COUNT(*) FROM reservas WHERE id_cancha IN ({canchas}) AND fecha = ? AND slot IN ({franjas})",
+                (*objetivo['canchas'], objetivo['fecha'], *objetivo['franjas']))
+    disputadas = cur.fetchone()[0]
+    cur.close()
+    conn.commit()
+    return total, disputadas
+
+def verificar(conn, objetivo, inicial, registro, totales_admin=None):
+    """Comprueba los invariantes después de la carga; devuelve la lista de fallos"""
+    fallos = []
+    cur = conn.cursor()
+
+    cur.execute("""
+        SELECT id_cancha, fecha, slot, COUNT(*) FROM reservas
+        WHERE slot IS NOT NULL GROUP BY id_cancha, fecha, slot HAVING COUNT(*) > 1
+    """)
+    duplicadas = cur.fetchall()
+    if duplicadas:
+        fallos.append(f"{len(duplicadas)} franjas con más de una reserva, p. ej. {tuple(duplicadas[0])}")
+
+    total, disputadas = _conteos(conn, objetivo)
+    esperado = inicial + registro.resultados['reservar']['ok'] - registro.resultados['cancelar']['ok']
+    if total != esperado:
+        fallos.append(f"Hay {total} reservas y se esperaban {esperado} (iniciales + confirmadas - canceladas)")
+    maximo = len(objetivo['canchas']) * len(objetivo['franjas'])
+    if disputadas > maximo:
+        fallos.append(f"{disputadas} reservas en las franjas disputadas, que solo admiten {maximo}")
+
+    mes = objetivo['fecha'][:7]
+    for id_cancha in objetivo['canchas']:
+        cur.execute("SELECT COUNT(*) FROM reservas WHERE id_cancha = ? AND substr(CAST(fecha AS TEXT), 1, 7) = ?",
+                    (id_cancha, mes))
+        reales = cur.fetchone()[0]
+        cur.execute("SELECT reservas FROM estadisticas_mensuales WHERE id_cancha = ? AND mes = ?", (id_cancha, mes))
+        fila = cur.fetchone()
+        if (fila[0] if fila else 0) != reales:
+            fallos.append(f"Estadísticas de la cancha {id_cancha} en {mes}: {fila[0] if fila else 0} reservas, "
+                          f"en la tabla hay {reales}")
+
+    if totales_admin is not None and totales_admin.get('reservas') != total:
+        fallos.append(f"El dashboard del administrador muestra {totales_admin.get('reservas')} reservas, "
+                      f"en la tabla hay {total}")
+    cur.close()
+    conn.commit()
+    return fallos
+
+def _objetivo(conn, args):
+    """Canchas, fecha y franjas por las que se compite"""
+    cur = conn.cursor()
+    if args.canchas:
+        canchas = [int(c) for c in args.canchas.split(',')]
+    else:
+        cur.execute("""
+            SELECT id_cancha FROM reservas WHERE id_cancha IS NOT NULL
+            GROUP BY id_cancha ORDER BY COUNT(*) DESC LIMIT ?
+        """, (args.num_canchas,))
+        canchas = [fila[0] for fila in cur.fetchall()]
+    if args.fecha:
+        fecha = args.fecha
+    else:
+        # El próximo viernes (nunca hoy, para que ninguna franja esté ya en el pasado)
+        hoy = date.today()
+        fecha = (hoy + timedelta(days=(4 - hoy.weekday()) % 7 or 7)).isoformat()
+
+    cur.execute("SELECT correo FROM usuarios WHERE rol = 'usuario' AND correo LIKE ? ORDER BY id LIMIT ?",
+                (args.correos, args.sesiones))
+    correos = [fila[0] for fila in cur.fetchall()]
+    cur.close()
+    conn.commit()
+    return {'canchas': canchas, 'fecha': fecha, 'franjas': [int(f) for f in args.franjas.split(',')]}, correos
+
+def _reporte(registro, segundos):
+    from benchmark import percentil
+
+    print(f"\n📊 Resultados ({segundos:.1f} s):")
+    total = 0
+    for operacion in OPERACIONES:
+        latencias = sorted(registro.latencias.get(operacion, []))
+        if not latencias:
+            continue
+        resultados = registro.resultados[operacion]
+        n = len(latencias)
+        total += n
+        errores = resultados['error']
+        print(f"   • {operacion:<15} {n:>7} ops  {n / segundos:>8.1f} ops/s  errores {errores / n:>6.2%}  "
+              f"p50 {percentil(latencias, 50):>7.1f}  p95 {percentil(latencias, 95):>7.1f}  "
+              f"p99 {percentil(latencias, 99):>7.1f}  máx {latencias[-1]:>7.1f} ms")
+        print(f"     {dict(resultados)}")
+    print(f"   Total: {total} ops, {total / segundos:.1f} ops/s")
+    if registro.errores:
+        print("\n⚠️  Errores más frecuentes:")
+        for detalle, veces in registro.errores.most_common(5):
+            print(f"   {veces:>6} × {detalle}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Carga concurrente de reservas con verificación de invariantes')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='instancia a probar')
+    parser.add_argument('--base', help='archivo SQLite de la instancia (SQLITE_DATABASE)')
+    parser.add_argument('--sesiones', type=int, default=100, help='jugadores concurrentes (100)')
+    parser.add_argument('--duracion', type=float, default=20, help='segundos de carga (20)')
+    parser.add_argument('--mezcla', default=MEZCLA, help=f'pesos de cada operación ({MEZCLA})')
+    parser.add_argument('--pausa', type=float, default=0, help='segundos promedio entre operaciones de una sesión (0)')
+    parser.add_argument('--canchas', help='ids de las canchas disputadas (por defecto las de más reservas)')
+    parser.add_argument('--num-canchas', type=int, default=1, help='cuántas canchas disputar (1)')
+    parser.add_argument('--fecha', help='fecha disputada YYYY-MM-DD (el próximo viernes)')
+    parser.add_argument('--franjas', default='20', help='horas disputadas, separadas por coma (20)')
+    parser.add_argument('--correos', default='%@sintetico.test', help='patrón LIKE de los jugadores')
+    parser.add_argument('--contrasena', help='contraseña de los jugadores (la de datos_sinteticos.py)')
+    parser.add_argument('--admin', help='correo de un administrador para comparar el dashboard')
+    parser.add_argument('--contrasena-admin', help='contraseña del administrador (la de --contrasena)')
+    parser.add_argument('--semilla', type=int, default=7)
+    args = parser.parse_args()
+
+    if args.base:
+        os.environ['SQLITE_DATABASE'] = os.path.abspath(args.base)
+    from db import script_connection
+    from datos_sinteticos import CONTRASENA
+
+    print("🚀 Prueba de carga de reservas...")
+    print("=" * 60)
+    conn = script_connection()
+    try:
+        objetivo, correos = _objetivo(conn, args)
+        if not correos or not objetivo['canchas']:
+            print("❌ No hay jugadores o canchas para la prueba (genera datos con datos_sinteticos.py)")
+            raise SystemExit(1)
+        print(f"🎯 Canchas {objetivo['canchas']}, {objetivo['fecha']}, franjas {objetivo['franjas']}; "
+              f"{len(correos)} sesiones durante {args.duracion:.0f} s")
+
+        contrasena = args.contrasena or CONTRASENA
+        sesiones = [Sesion(args.url, correo) for correo in correos]
+        try:
+            fallidas = [s.correo for s in sesiones if not s.iniciar(contrasena)]
+        except urllib.error.URLError as e:
+            print(f"❌ No se pudo conectar a {args.url}: {e.reason}")
+            raise SystemExit(1)
+        if fallidas:
+            print(f"❌ {len(fallidas)} sesiones no pudieron iniciar sesión (p. ej. {fallidas[0]})")
+            raise SystemExit(1)
+
+        admin = None
+        if args.admin:
+            admin = Sesion(args.url, args.admin)
+            if not admin.iniciar(args.contrasena_admin or contrasena):
+                print(f"❌ No se pudo iniciar sesión como {args.admin}")
+                raise SystemExit(1)
+
+        inicial, _ = _conteos(conn, objetivo)
+        registro = Registro()
+        barrera = threading.Barrier(len(sesiones) + 1)
+        fin = [0.0]
+        hilos = [threading.Thread(target=_sesion_de_carga, daemon=True,
+                                  args=(s, registro, objetivo, _mezcla(args.mezcla), barrera, fin,
+                                        args.semilla + i, args.pausa))
+                 for i, s in enumerate(sesiones)]
+        for hilo in hilos:
+            hilo.start()
+
+        # Todas las sesiones arrancan a la vez: la primera ola compite por la misma franja
+        fin[0] = time.monotonic() + args.duracion
+        inicio = time.perf_counter()
+        barrera.wait()
+        for hilo in hilos:
+            hilo.join()
+        _reporte(registro, time.perf_counter() - inicio)
+
+        totales = None
+        if admin is not None:
+            codigo, cuerpo = admin.pedir('/admin/api/totales')
+            totales = json.loads(cuerpo)['totales'] if codigo == 200 else {}
+
+        fallos = verificar(conn, objetivo, inicial, registro, totales)
+    finally:
+        conn.close()
+
+    if fallos:
+        print("\n❌ Invariantes incumplidos:")
+        for fallo in fallos:
+            print(f"   • {fallo}")
+        raise SystemExit(1)
+    print("\n✅ Invariantes verificados: sin reservas duplicadas y los totales cuadran")
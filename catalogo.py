@@ -0,0 +1,122 @@
+"""
+Catálogo de canchas compartido por el inicio, explorar y el dashboard del usuario.
+Las canchas cambian solo cuando un dueño las crea, edita o elimina (o un admin las
+borra), así que se guardan ya armadas en memoria y cada página solo agrega los
+favoritos del usuario. Las rutas que modifican canchas llaman a invalidar().
+"""
+import itertools
+import json
+import threading
+from cache import TTLCache
+from config import CATALOG_CACHE_CONFIG
+
+IMAGEN_DEFECTO = 'imagenes/cancha1.png'
+
+_cache = TTLCache(maxsize=1, ttl=CATALOG_CACHE_CONFIG['ttl'])
+_lock = threading.Lock()
+# Aumenta con cada invalidación local: una carga que se cruzó con una
+# invalidación no se guarda (podría traer datos de antes del cambio)
+_generacion = 0
+# Número de cada carga del catálogo: identifica los datos de una entrada (ver version())
+_cargas = itertools.count(1)
+
+def imagen_principal(imagen_url):
+    """Primera imagen de la cancha como ruta relativa a static/"""
+    img_path = imagen_url.split(',')[0].strip() if imagen_url else ''
+    if img_path.startswith('static/'):
+        img_path = img_path.replace('static/', '', 1)
+    return img_path or IMAGEN_DEFECTO
+
+def _cargar(cur):
+    cur.execute("""
+        SELECT c.id_cancha, c.nombre, c.descripcion, c.imagen_url, c.precio, c.precio_num,
+               c.direccion, h.hora_inicio, h.hora_fin, c.imagen_variantes
+        FROM canchas c
+        LEFT JOIN horarios_canchas h ON c.id_cancha = h.id_cancha
+        WHERE c.usuario_id IS NOT NULL
+        ORDER BY c.id_cancha DESC
+    """)
+    canchas = []
+    vistas = set()
+    for c in cur.fetchall():
+        # Una sola entrada por cancha aunque tenga varios horarios
+        if c[0] in vistas:
+            continue
+        vistas.add(c[0])
+        canchas.append({
+            'id_cancha': c[0],
+            'nombre': c[1],
+            'descripcion': c[2],
+            'imagen_url': c[3],
+            'imagen': imagen_principal(c[3]),
+            # Versiones reducidas para las tarjetas (None mientras no se generen)
+            'variantes': json.loads(c[9]) if c[9] else None,
+            'precio': c[4],
+            'precio_num': c[5],
+            'direccion': c[6],
+            'hora_inicio': c[7],
+            'hora_fin': c[8]
+        })
+    return tuple(canchas)
+
+def _version(cur):
+    cur.execute("SELECT version FROM versiones_datos WHERE nombre = ?", ('catalogo',))
+    fila = cur.fetchone()
+    return fila[0] if fila else 0
+
+def _entrada(cur):
+    version = _version(cur) if CATALOG_CACHE_CONFIG['shared'] else None
+    entrada = _cache.get('canchas')
+    if entrada is not None and entrada[0] == version:
+        return entrada
+
+    generacion = _generacion
+    registros = _cargar(cur)
+    entrada = (version, registros, {c['id_cancha']: c for c in registros}, next(_cargas))
+    with _lock:
+        if generacion == _generacion:
+            _cache.set('canchas', entrada)
+    return entrada
+
+def canchas(cur):
+    """
+    Canchas con dueño, de la más nueva a la más antigua. Las entradas son
+    compartidas entre peticiones: no deben modificarse (copiar antes con dict()).
+    """
+    return _entrada(cur)[1]
+
+def por_id(cur):
+    """{id_cancha: cancha} de las mismas entradas que canchas() (p. ej. para armar resultados de búsqueda)"""
+    return _entrada(cur)[2]
+
+def version(cur):
+    """
+    Identificador de los datos que devuelven ahora canchas() y por_id(): cambia con cada
+    recarga, así que lo que se arma a partir del catálogo (p. ej. las páginas en
+    cache_respuestas.py) caduca junto con él
+    """
+    return _entrada(cur)[3]
+
+def favoritos_de(cur, id_usuario):
+    """ids de las canchas favoritas del usuario (lo único por usuario de estas páginas)"""
+    cur.execute("SELECT id_cancha FROM favoritos WHERE id_usuario = ?", (id_usuario,))
+    return {fila[0] for fila in cur.fetchall()}
+
+def invalidar(db=None):
+    """
+    Descarta el catálogo; se llama después del commit que modificó canchas u horarios.
+    En modo compartido (pasando la conexión) también avanza la versión en la tabla
+    versiones_datos para que los demás workers recarguen en su próxima lectura.
+    """
+    global _generacion
+    with _lock:
+        _generacion += 1
+        _cache.clear()
+
+    if db is not None and CATALOG_CACHE_CONFIG['shared']:
+        cur = db.cursor()
+        cur.execute("""
+            INSERT INTO versiones_datos (nombre, version) VALUES (?, 1)
+            ON CONFLICT (nombre) DO UPDATE SET version = versiones_datos.version + 1
+        """, ('catalogo',))
+        db.commit()
@@ -3,6 +3,7 @@ Configuración de la base de datos
 Soporta SQLite (desarrollo) y PostgreSQL (producción)
 """
 import os
+from zoneinfo import ZoneInfo
 from dotenv import load_dotenv
 
 # Cargar variables de entorno desde .env (si existe)
@@ -28,12 +29,146 @@ if IS_PRODUCTION:
         'url': DATABASE_URL
     }
 else:
-    # Configuración SQLite para desarrollo local
+    # Configuración SQLite para desarrollo local (SQLITE_DATABASE permite usar otra base,
+    # p. ej. la de datos sintéticos de benchmark.py)
     DB_CONFIG = {
         'type': 'sqlite',
-        'database': 'usuariosdb.db'
+        'database': os.getenv('SQLITE_DATABASE', 'usuariosdb.db')
     }
 
+# Pool de conexiones PostgreSQL (uno por proceso/worker de gunicorn)
+DB_POOL_CONFIG = {
+    'min_size': int(os.getenv('DB_POOL_MIN', '1')),
+    'max_size': int(os.getenv('DB_POOL_MAX', '10')),
+    # Segundos máximos esperando una conexión libre antes de fallar
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+    # Las conexiones ociosas más de N segundos se verifican con SELECT 1 al sacarlas
+    'healthcheck_interval': float(os.getenv('DB_POOL_HEALTHCHECK', '30'))
+}
+
+# Traducción de consultas (? -> %s) y sentencias preparadas en PostgreSQL
+DB_STATEMENT_CONFIG = {
+    # Textos SQL distintos que se guardan ya traducidos (LRU)
+    'cache_size': int(os.getenv('DB_QUERY_CACHE_SIZE', '512')),
+    # Ejecuciones tras las que una consulta pasa a PREPARE/EXECUTE (0 = desactivado,
+    # necesario si se usa PgBouncer en modo transacción)
+    'prepare_threshold': int(os.getenv('DB_PREPARE_THRESHOLD', '0'))
+}
+
+# Instrumentación de las consultas SQL (ver instrumentacion.py)
+DB_METRICS_CONFIG = {
+    'activo': os.getenv('DB_METRICS', 'true').strip().lower() in ('1', 'true', 'yes'),
+    # Sentencias que tardan al menos N ms se registran en el log con su texto normalizado
+    'lenta_ms': float(os.getenv('DB_SLOW_QUERY_MS', '200')),
+    # Cabecera Server-Timing con el tiempo en la BD y el número de consultas de cada respuesta:
+    # true, false o admin (solo en las respuestas a administradores, por defecto en producción,
+    # para no mostrar a cualquiera cuánto cuesta cada ruta)
+    'server_timing': os.getenv('DB_SERVER_TIMING', 'admin' if IS_PRODUCTION else 'true').strip().lower(),
+    # Una misma sentencia repetida N veces en una petición se avisa como posible N+1
+    'repeticiones': int(os.getenv('DB_N_MAS_1', '10')),
+    # Textos SQL distintos que se acumulan en las métricas
+    'sentencias_max': int(os.getenv('DB_METRICS_SENTENCIAS', '500'))
+}
+
+# Caché de usuarios para el user_loader (segundos de vida y número máximo de entradas)
+USER_CACHE_CONFIG = {
+    'ttl': int(os.getenv('USER_CACHE_TTL', '30')),
+    'maxsize': int(os.getenv('USER_CACHE_SIZE', '2048'))
+}
+
+# Catálogo de canchas en memoria (inicio, explorar y dashboard del usuario).
+# Con CATALOG_CACHE_SHARED=true cada lectura compara además un contador de versión
+# en la base de datos (tabla versiones_datos) para que todos los workers vean los
+# cambios al instante; sin él, los demás workers los ven al vencer el TTL.
+CATALOG_CACHE_CONFIG = {
+    'ttl': int(os.getenv('CATALOG_CACHE_TTL', '300')),
+    'shared': os.getenv('CATALOG_CACHE_SHARED', 'false').strip().lower() in ('1', 'true', 'yes')
+}
+
+# Páginas renderizadas en memoria (inicio y explorar, ver cache_respuestas.py).
+# Cada entrada lleva la versión del catálogo y de los favoritos del usuario en la
+# clave, así que el TTL solo acota la memoria que ocupan las páginas que ya nadie pide.
+RESPONSE_CACHE_CONFIG = {
+    'activo': os.getenv('RESPONSE_CACHE', 'true').strip().lower() in ('1', 'true', 'yes'),
+    'maxsize': int(os.getenv('RESPONSE_CACHE_SIZE', '256')),
+    'ttl': int(os.getenv('RESPONSE_CACHE_TTL', '600')),
+    # De las páginas más grandes (en bytes) solo se guarda el ETag (sirve para responder 304)
+    'max_bytes': int(os.getenv('RESPONSE_CACHE_MAX_BYTES', str(2 * 1024 * 1024)))
+}
+
+# Geocodificación de las direcciones de las canchas (ver geocodificacion.py)
+# GEOCODER: 'nominatim' (OpenStreetMap), 'local' (sin red, para desarrollo y pruebas) o 'ninguno'
+GEOCODER_CONFIG = {
+    'proveedor': os.getenv('GEOCODER', 'nominatim').strip().lower(),
+    'url': os.getenv('GEOCODER_URL', 'https://nominatim.openstreetmap.org/search'),
+    # Se agrega a la dirección para desambiguar (las canchas son de la zona)
+    'contexto': os.getenv('GEOCODER_CONTEXTO', 'Soacha, Colombia'),
+    'timeout': float(os.getenv('GEOCODER_TIMEOUT', '3')),
+    'user_agent': os.getenv('GEOCODER_USER_AGENT', 'CampoFinder/1.0'),
+    # JSON {"dirección": [lat, lng]} para el geocodificador local
+    'archivo_local': os.getenv('GEOCODER_LOCAL_FILE', ''),
+    # Hilos que geocodifican las canchas nuevas fuera de la petición (0 = en la misma
+    # petición, después del commit)
+    'workers': int(os.getenv('GEOCODER_WORKERS', '1'))
+}
+
+# Versiones reducidas de las imágenes de las canchas (ver imagenes.py, requiere Pillow)
+IMAGE_CONFIG = {
+    # Anchos en píxeles de cada versión (se omiten los mayores que la original)
+    'anchos': sorted(int(a) for a in os.getenv('IMAGE_WIDTHS', '320,640,1280').split(',') if a.strip()),
+    # Calidad de WebP y JPEG (1-100)
+    'calidad': int(os.getenv('IMAGE_QUALITY', '80')),
+    # Hilos que procesan las imágenes fuera de la petición (0 = en la misma petición)
+    'workers': int(os.getenv('IMAGE_WORKERS', '2'))
+}
+
+# Archivos estáticos con huella de contenido y caché de larga duración (ver estaticos.py).
+# Desactivado por defecto en desarrollo para ver los cambios de CSS sin reiniciar.
+STATIC_ASSETS_CONFIG = {
+    'activo': os.getenv('STATIC_HASHED', 'true' if IS_PRODUCTION else 'false').strip().lower() in ('1', 'true', 'yes'),
+    # Segundos de Cache-Control de las URLs con huella (1 año)
+    'max_age': int(os.getenv('STATIC_MAX_AGE', '31536000')),
+    'largo_huella': 12,
+    # Carpetas de static/ que se publican con la aplicación (las imágenes subidas no)
+    'carpetas': tuple(c.strip().strip('/') for c in os.getenv('STATIC_HASHED_DIRS', 'css,js,img,imagenes').split(',') if c.strip()),
+    # Manifiesto y versiones comprimidas ya calculadas (python estaticos.py en el build),
+    # relativa a la carpeta del proyecto si no es absoluta
+    'cache': os.getenv('STATIC_CACHE_DIR', '.cache_estaticos')
+}
+
+# Marcador en vivo por Server-Sent Events (ver marcador.py)
+MARCADOR_CONFIG = {
+    # Segundos entre comentarios de mantenimiento de la conexión
+    'latido': float(os.getenv('MARCADOR_SSE_LATIDO', '15')),
+    # Segundos que dura cada stream antes de que el navegador se reconecte
+    'duracion': float(os.getenv('MARCADOR_SSE_DURACION', '300')),
+    # Milisegundos que espera EventSource antes de reconectarse
+    'reintento_ms': int(os.getenv('MARCADOR_SSE_REINTENTO_MS', '3000')),
+    # Mensajes pendientes por espectador antes de cortar su stream
+    'cola_maxima': int(os.getenv('MARCADOR_COLA_MAXIMA', '100')),
+    # Segundos que se recuerda que un dueño puede editar el marcador de una reserva
+    'sesion_partido': int(os.getenv('MARCADOR_SESION_PARTIDO', '7200')),
+    # Un partido está en vivo mientras el dueño tiene abierta su página o lo actualizó
+    # hace menos de N segundos; fuera de eso no se abren streams
+    'en_vivo': int(os.getenv('MARCADOR_EN_VIVO', '600')),
+    # Streams abiertos a la vez en cada proceso: cada uno ocupa un hilo de gunicorn
+    # (threads de gunicorn.conf.py), así que los demás espectadores consultan el marcador cada tanto
+    'maximo_streams': int(os.getenv('MARCADOR_SSE_MAXIMO', '6'))
+}
+
+# Zona horaria de las fechas y franjas de las reservas: los contenedores de Railway
+# corren en UTC y las reservas se guardan en hora local
+ZONA_HORARIA = ZoneInfo(os.getenv('APP_TZ', 'America/Bogota'))
+
+# Paso de reservas a 'completada' cuando termina su franja (ver marcar_completadas.py)
+COMPLETADAS_CONFIG = {
+    # Segundos entre pasadas del hilo de fondo de la aplicación (0 = desactivado;
+    # entonces se programa aparte con python marcar_completadas.py --cada N)
+    'intervalo': int(os.getenv('COMPLETADAS_INTERVALO', '300' if IS_PRODUCTION else '0')),
+    # Reservas por lote (cada lote es una transacción corta)
+    'lote': int(os.getenv('COMPLETADAS_LOTE', '500'))
+}
+
 # Configuración de la aplicación Flask
 SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
 DEBUG = not IS_PRODUCTION
@@ -0,0 +1,295 @@
+"""
+Generador de datos sintéticos para medir la aplicación a escala (ver benchmark.py)
+
+Llena una base SQLite (un archivo aparte, por defecto sintetico.db) o la PostgreSQL de
+DATABASE_URL con usuarios, dueños, canchas con horario, favoritos y reservas. Las
+reservas siguen una distribución parecida a la real:
+- Pocas canchas concentran muchas reservas (popularidad tipo Zipf) y lo mismo los jugadores.
+- Más reservas en fin de semana y en la noche (18:00-21:00).
+- El volumen crece hacia hoy y las reservas futuras se concentran en los próximos días.
+Las del pasado quedan 'completada' y las de hoy en adelante 'pendiente'. Todos los
+usuarios generados (incluido un administrador) tienen la contraseña CONTRASENA.
+
+    python datos_sinteticos.py                                   # volumen pequeño en sintetico.db
+    python datos_sinteticos.py --usuarios 100000 --canchas 2000 --reservas 5000000
+    python datos_sinteticos.py --destino postgresql --reservas 1000000   # DATABASE_URL
+
+Los registros se agregan a los que ya existan (los ids continúan desde el máximo).
+"""
+import argparse
+import heapq
+import io
+import math
+import os
+import random
+import sqlite3
+import time
+from datetime import date, timedelta
+from itertools import islice
+from dotenv import load_dotenv
+from werkzeug.security import generate_password_hash
+
+load_dotenv()
+
+CONTRASENA = 'sintetico1'
+BASE_SQLITE = 'sintetico.db'
+LOTE = 20000
+
+# Peso de cada hora de inicio (las no listadas pesan 1); el fin de semana se juega más de día
+PESO_HORA = {17: 1.8, 18: 3.0, 19: 3.5, 20: 3.2, 21: 2.2, 22: 1.0}
+PESO_HORA_FIN_DE_SEMANA = {h: 1.8 for h in range(9, 17)}
+# Viernes, sábado y domingo
+PESO_DIA_SEMANA = [1.0, 0.9, 1.0, 1.1, 1.5, 1.9, 1.7]
+
+DESCRIPCION = ('Cancha sintética generada para pruebas de carga. Grama sintética, iluminación '
+               'nocturna y camerinos.')
+
+def _conectar(destino, base):
+    """ConnectionWrapper de la base de destino con el esquema al día"""
+    from db import ConnectionWrapper
+    from migraciones import aplicar
+
+    if destino == 'postgresql':
+        import psycopg2
+
+        database_url = (os.getenv('DATABASE_URL') or '').strip()
+        if not database_url:
+            raise ValueError("DATABASE_URL no está configurada")
+        if database_url.startswith('postgres://'):
+            database_url = database_url.replace('postgres://', 'postgresql://', 1)
+        conn = ConnectionWrapper(psycopg2.connect(database_url), 'postgresql')
+    else:
+        conn = ConnectionWrapper(sqlite3.connect(base), 'sqlite')
+        # Carga masiva: si se corta, se vuelve a generar
+        conn.conn.execute("PRAGMA synchronous = OFF")
+
+    if not aplicar(conn):
+        raise RuntimeError("No se pudo preparar el esquema")
+    return conn
+
+def _maximo(conn, tabla, columna):
+    cur = conn.conn.cursor()
+    cur.execute(f"SELECT COALESCE(MAX({columna}), 0) FROM {tabla}")
+    maximo = cur.fetchone()[0]
+    cur.close()
+    return maximo
+
+def _insertar(conn, tabla, columnas, filas):
+    """Inserta las filas por lotes (COPY en PostgreSQL, executemany en SQLite); devuelve cuántas"""
+    cur = conn.conn.cursor()
+    total = 0
+    filas = iter(filas)
+    while True:
+        lote = list(islice(filas, LOTE))
+        if not lote:
+            break
+        if conn.db_type == 'postgresql':
+            from export_data import campo_csv
+
+            datos = io.StringIO()
+            for fila in lote:
+                datos.write(','.join(campo_csv(v) for v in fila) + '\n')
+            datos.seek(0)
+            cur.copy_expert(f"COPY {tabla} ({', '.join(columnas)}) FROM STDIN WITH (FORMAT csv)", datos)
+        else:
+            cur.executemany(f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join(['?'] * len(columnas))})",
+                            lote)
+        total += len(lote)
+    conn.commit()
+    cur.close()
+    return total
+
+def _pesos_zipf(n, rng, exponente=0.8):
+    """Pesos de popularidad 1/rango^s en orden aleatorio"""
+    pesos = [1 / (rango ** exponente) for rango in range(1, n + 1)]
+    rng.shuffle(pesos)
+    return pesos
+
+def _acumulados(pesos):
+    total = 0.0
+    acumulados = []
+    for peso in pesos:
+        total += peso
+        acumulados.append(total)
+    return acumulados
+
+def _pesos_dias(desde, hoy, hasta):
+    """Peso de cada fecha: crecimiento hacia hoy, fines de semana y anticipación de las futuras"""
+    dias = []
+    pasados = max((hoy - desde).days, 1)
+    fecha = desde
+    while fecha <= hasta:
+        if fecha < hoy:
+            tendencia = 0.4 + 0.6 * (fecha - desde).days / pasados
+        else:
+            # Se reserva con pocos días de anticipación
+            tendencia = math.exp(-(fecha - hoy).days / 7)
+        dias.append((fecha, tendencia * PESO_DIA_SEMANA[fecha.weekday()]))
+        fecha += timedelta(days=1)
+    return dias
+
+def generar(conn, usuarios=1000, canchas=50, reservas=20000, favoritos=None, dias_pasados=365,
+            dias_futuros=30, duenos=None, semilla=42):
+    """Agrega los datos sintéticos a `conn`; devuelve las filas insertadas por tabla"""
+    rng = random.Random(semilla)
+    duenos = duenos or max(1, canchas // 4)
+    favoritos = usuarios // 2 if favoritos is None else favoritos
+    contrasena = generate_password_hash(CONTRASENA)
+    insertadas = {}
+    inicio = time.perf_counter()
+
+    # Usuarios: primero los dueños, luego los jugadores y al final un administrador
+    primer_id = _maximo(conn, 'usuarios', 'id') + 1
+    ids_duenos = list(range(primer_id, primer_id + duenos))
+    ids_jugadores = list(range(primer_id + duenos, primer_id + duenos + usuarios))
+    id_admin = primer_id + duenos + usuarios
+
+    def usuario(i):
+        if i == id_admin:
+            nombre, correo, rol = 'Administrador', 'admin', 'administrador'
+        elif i < ids_jugadores[0]:
+            nombre, correo, rol = 'Dueño', 'dueno', 'dueño'
+        else:
+            nombre, correo, rol = 'Jugador', 'jugador', 'usuario'
+        return (i, f"{nombre} {i}", f"{correo}{i}@sintetico.test", rng.randint(16, 60), contrasena, rol)
+
+    insertadas['usuarios'] = _insertar(conn, 'usuarios', ['id', 'nombre', 'correo', 'edad', 'contraseña', 'rol'],
+                                       (usuario(i) for i in range(primer_id, id_admin + 1)))
+
+    # Canchas: unos pocos dueños tienen muchas
+    primera_cancha = _maximo(conn, 'canchas', 'id_cancha') + 1
+    acumulado_duenos = _acumulados(_pesos_zipf(duenos, rng))
+    datos_canchas = []
+    for id_cancha in range(primera_cancha, primera_cancha + canchas):
+        precio = rng.randrange(60000, 160000, 5000)
+        datos_canchas.append({
+            'id_cancha': id_cancha,
+            'nombre': f"Cancha Sintética {id_cancha}",
+            'precio': precio,
+            'usuario_id': rng.choices(ids_duenos, cum_weights=acumulado_duenos)[0],
+            'apertura': rng.choice([6, 7, 8]),
+            'cierre': rng.choice([22, 23])
+        })
+    insertadas['canchas'] = _insertar(conn, 'canchas', [
+        'id_cancha', 'nombre', 'precio', 'precio_num', 'descripcion', 'direccion', 'lat', 'lng', 'usuario_id'
+    ], (
+        (c['id_cancha'], c['nombre'], str(c['precio']), c['precio'], DESCRIPCION,
+         f"Calle {rng.randint(1, 80)} # {rng.randint(1, 60)}-{rng.randint(1, 99)}",
+         round(4.58 + rng.gauss(0, 0.03), 6), round(-74.21 + rng.gauss(0, 0.03), 6), c['usuario_id'])
+        for c in datos_canchas
+    ))
+    insertadas['horarios_canchas'] = _insertar(conn, 'horarios_canchas', ['id_cancha', 'hora_inicio', 'hora_fin', 'disponible'], (
+        (c['id_cancha'], '%02d:00' % c['apertura'], '%02d:00' % c['cierre'], True) for c in datos_canchas
+    ))
+
+    # Favoritos: pares (jugador, cancha) distintos, sesgados hacia las canchas populares
+    popularidad = _pesos_zipf(canchas, rng)
+    acumulado_canchas = _acumulados(popularidad)
+    pares = set()
+    favoritos = min(favoritos, usuarios * canchas)
+    while len(pares) < favoritos:
+        indice = rng.choices(range(canchas), cum_weights=acumulado_canchas)[0]
+        pares.add((rng.choice(ids_jugadores), indice))
+    insertadas['favoritos'] = _insertar(conn, 'favoritos', ['id_usuario', 'cancha', 'id_cancha'], (
+        (id_usuario, datos_canchas[i]['nombre'], datos_canchas[i]['id_cancha']) for id_usuario, i in sorted(pares)
+    ))
+
+    # Reservas: cuántas le tocan a cada (cancha, fecha), acotado por las franjas que tiene
+    hoy = date.today()
+    dias = _pesos_dias(hoy - timedelta(days=dias_pasados), hoy, hoy + timedelta(days=dias_futuros))
+    capacidad = [c['cierre'] - c['apertura'] for c in datos_canchas]
+    suma = sum(popularidad) * sum(peso for _, peso in dias)
+    escala = reservas / suma if suma else 0
+    # Las canchas que se llenan no absorben todo lo que les toca: se reparte entre las demás
+    for _ in range(4):
+        esperadas = sum(min(capacidad[i], escala * popularidad[i] * peso)
+                        for i in range(canchas) for _, peso in dias)
+        if not esperadas:
+            break
+        escala *= reservas / esperadas
+    if reservas > sum(capacidad) * len(dias):
+        print(f"⚠️  Solo caben {sum(capacidad) * len(dias)} reservas en {canchas} canchas y {len(dias)} días")
+
+    acumulado_jugadores = _acumulados(_pesos_zipf(usuarios, rng, exponente=0.6))
+
+    def filas_reservas():
+        for fecha, peso_dia in dias:
+            iso = fecha.isoformat()
+            estado = 'completada' if fecha < hoy else 'pendiente'
+            pesos_hora = PESO_HORA_FIN_DE_SEMANA if fecha.weekday() >= 4 else {}
+            for i, c in enumerate(datos_canchas):
+                esperadas = escala * popularidad[i] * peso_dia
+                cantidad = min(capacidad[i], int(esperadas) + (rng.random() < esperadas % 1))
+                if not cantidad:
+                    continue
+                # Muestreo ponderado sin reemplazo (clave u^(1/peso))
+                slots = heapq.nlargest(cantidad, range(c['apertura'], c['cierre']), key=lambda h: rng.random() ** (
+                    1 / pesos_hora.get(h, PESO_HORA.get(h, 1.0))))
+                jugadores = rng.choices(ids_jugadores, cum_weights=acumulado_jugadores, k=cantidad)
+                for slot, id_usuario in zip(slots, jugadores):
+                    yield (id_usuario, c['nombre'], c['id_cancha'], '%02d:00' % slot, slot, iso,
+                           f"3{rng.randrange(10 ** 9):09d}", estado, c['usuario_id'], c['precio'])
+
+    insertadas['reservas'] = _insertar(conn, 'reservas', [
+        'id_usuario', 'cancha', 'id_cancha', 'horario', 'slot', 'fecha', 'numero', 'estado', 'id_dueno', 'precio'
+    ], filas_reservas())
+
+    _finalizar(conn)
+    print(f"⏱️  {time.perf_counter() - inicio:.1f} s")
+    return insertadas
+
+def _finalizar(conn):
+    """Secuencias, estadísticas mensuales, catálogo y estadísticas del planificador"""
+    import estadisticas
+    import catalogo
+
+    if conn.db_type == 'postgresql':
+        from import_data import _reiniciar_secuencias
+        _reiniciar_secuencias(conn.conn, ['usuarios', 'canchas', 'favoritos', 'horarios_canchas', 'reservas'])
+
+    cur = conn.cursor()
+    print(f"🔄 Estadísticas mensuales: {estadisticas.recalcular(cur)} meses-cancha")
+    conn.commit()
+    catalogo.invalidar(conn)
+
+    if conn.db_type == 'postgresql':
+        # ANALYZE no puede ir dentro de una transacción con las escrituras anteriores
+        conn.conn.autocommit = True
+    cur.execute("ANALYZE")
+    conn.commit()
+    cur.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Genera datos sintéticos para pruebas de rendimiento')
+    parser.add_argument('--destino', choices=['sqlite', 'postgresql'], default='sqlite',
+                        help=f'sqlite (--base, {BASE_SQLITE}) o postgresql (DATABASE_URL)')
+    parser.add_argument('--base', default=BASE_SQLITE, help='archivo SQLite de destino')
+    parser.add_argument('--usuarios', type=int, default=1000, help='jugadores (1000)')
+    parser.add_argument('--duenos', type=int, default=None, help='dueños (canchas / 4)')
+    parser.add_argument('--canchas', type=int, default=50, help='canchas (50)')
+    parser.add_argument('--reservas', type=int, default=20000, help='reservas aproximadas (20000)')
+    parser.add_argument('--favoritos', type=int, default=None, help='favoritos (usuarios / 2)')
+    parser.add_argument('--dias-pasados', type=int, default=365, help='historial en días (365)')
+    parser.add_argument('--dias-futuros', type=int, default=30, help='días con reservas futuras (30)')
+    parser.add_argument('--semilla', type=int, default=42, help='semilla aleatoria (42)')
+    args = parser.parse_args()
+
+    print("🚀 Generando datos sintéticos...")
+    print("=" * 60)
+    try:
+        conn = _conectar(args.destino, args.base)
+    except Exception as e:
+        print(f"❌ Error al conectar: {e}")
+        raise SystemExit(1)
+
+    try:
+        filas = generar(conn, args.usuarios, args.canchas, args.reservas, args.favoritos,
+                        args.dias_pasados, args.dias_futuros, args.duenos, args.semilla)
+    finally:
+        conn.close()
+
+    for tabla, total in filas.items():
+        print(f"   ✓ {tabla}: {total} registros")
+    print(f"\n✅ Datos generados (contraseña de todos los usuarios: {CONTRASENA})")
+    if args.destino == 'sqlite':
+        print(f"💡 python benchmark.py --base {args.base}")
@@ -2,29 +2,129 @@
 Módulo de conexión a la base de datos
 Soporta SQLite (desarrollo) y PostgreSQL (producción) con compatibilidad de sintaxis
 """
+import os
+import hashlib
+import logging
 import sqlite3
+import threading
+from functools import lru_cache
 from flask import g
-from config import DB_CONFIG
+from config import DB_CONFIG, DB_POOL_CONFIG, DB_STATEMENT_CONFIG
+import instrumentacion
 import time
 
+logger = logging.getLogger('campofinder.sql')
+
 # Importar psycopg2 solo si estamos en producción
 if DB_CONFIG['type'] == 'postgresql':
     import psycopg2
     import psycopg2.extras
 
+class CompiledQuery:
+    """
+    Resultado de traducir una vez un texto SQL con placeholders ? a la sintaxis de psycopg2.
+    Guarda además la versión con $1..$n para PREPARE y cuántas veces se ha ejecutado.
+    """
+    PREPARABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+
+    def __init__(self, query):
+        self.text, self.prepare_text, self.param_count = _translate_placeholders(query)
+        self.name = 'cf_' + hashlib.md5(query.encode('utf-8')).hexdigest()[:16]
+        self.preparable = query.lstrip().split(None, 1)[0].upper() in self.PREPARABLE if query.strip() else False
+        self.execute_text = f"EXECUTE {self.name} ({', '.join(['%s'] * self.param_count)})"
+        self.hits = 0
+
+def _translate_placeholders(query):
+    """
+    Recorre el SQL una sola vez respetando literales ('...'), identificadores ("...")
+    y comentarios, de modo que un ? dentro de un texto no se toma como parámetro.
+    Devuelve (consulta con %s y % escapados, consulta con $n, número de parámetros).
+    """
+    pyformat = []
+    numbered = []
+    count = 0
+    i = 0
+    n = len(query)
+    
+    while i < n:
+        ch = query[i]
+        if ch in ("'", '"'):
+            # Literal o identificador entre comillas; la comilla doble interna es un escape
+            j = i + 1
+            while j < n:
+                if query[j] == ch:
+                    if j + 1 < n and query[j + 1] == ch:
+                        j += 2
+                        continue
+                    break
+                j += 1
+            chunk = query[i:j + 1]
+        elif query.startswith('--', i):
+            j = query.find('\n', i)
+            j = n - 1 if j == -1 else j
+            chunk = query[i:j + 1]
+        elif query.startswith('/*', i):
+            j = query.find('*/', i + 2)
+            j = n - 1 if j == -1 else j + 1
+            chunk = query[i:j + 1]
+        elif ch == '?':
+            count += 1
+            pyformat.append('%s')
+            numbered.append(f'${count}')
+            i += 1
+            continue
+        else:
+            chunk = ch
+        
+        # psycopg2 interpreta % en todo el texto cuando hay parámetros
+        pyformat.append(chunk.replace('%', '%%'))
+        numbered.append(chunk)
+        i += len(chunk)
+    
+    return ''.join(pyformat), ''.join(numbered), count
+
+# SQLSTATE de los errores propios de PREPARE/EXECUTE (no de los datos): solo estos hacen
+# que una sentencia deje de prepararse. invalid_sql_statement_name, duplicate_prepared_statement,
+# feature_not_supported (p. ej. "cached plan must not change result type"),
+# indeterminate_datatype y ambiguous_parameter
+ERRORES_PREPARE = {'26000', '42P05', '0A000', '42P18', '42P08'}
+
+def _error_de_prepare(error):
+    return getattr(error, 'pgcode', None) in ERRORES_PREPARE
+
+@lru_cache(maxsize=DB_STATEMENT_CONFIG['cache_size'])
+def compile_query(query):
+    """Traduce (y memoriza en un LRU) cada texto SQL distinto"""
+    return CompiledQuery(query)
+
 class UnifiedCursor:
     """
     Cursor unificado que traduce la sintaxis de SQLite (?) a PostgreSQL (%s)
     y asegura que los resultados sean accesibles tanto por índice como por nombre.
     """
-    def __init__(self, original_cursor, db_type):
+    def __init__(self, original_cursor, db_type, prepared=None):
         self.cursor = original_cursor
         self.db_type = db_type
+        # Nombres de sentencias ya preparadas en esta conexión (None = sin PREPARE)
+        self.prepared = prepared
+        # Última sentencia anotada en instrumentacion (los fetch le suman su tiempo)
+        self._entrada = None
 
     def execute(self, query, params=None):
-        # Traducir placeholder ? a %s si es PostgreSQL
-        if self.db_type == 'postgresql' and '?' in query:
-            query = query.replace('?', '%s')
+        inicio = time.perf_counter()
+        try:
+            return self._execute(query, params)
+        finally:
+            # Se mide también la que falla: una consulta que agota el timeout cuenta
+            self._entrada = instrumentacion.registrar(query, time.perf_counter() - inicio, params)
+
+    def _execute(self, query, params):
+        # Traducir placeholder ? a %s si es PostgreSQL (sin parámetros se ejecuta tal cual)
+        if self.db_type == 'postgresql' and params:
+            compiled = compile_query(query)
+            if self._should_prepare(compiled, params):
+                return self._execute_prepared(compiled, params)
+            query = compiled.text
         
         try:
             if params:
@@ -32,15 +132,65 @@ class UnifiedCursor:
             else:
                 return self.cursor.execute(query)
         except Exception as e:
-            print(f"❌ Error SQL: {e}")
-            print(f"   Query: {query}")
+            logger.error("❌ Error SQL: %s\n   Query: %s", e, query)
+            raise e
+
+    def _should_prepare(self, compiled, params):
+        threshold = DB_STATEMENT_CONFIG['prepare_threshold']
+        if self.prepared is None or not threshold or not compiled.preparable:
+            return False
+        if isinstance(params, dict) or len(params) != compiled.param_count:
+            return False
+        compiled.hits += 1
+        return compiled.hits >= threshold
+
+    def _execute_prepared(self, compiled, params):
+        """Ejecuta una sentencia frecuente como PREPARE/EXECUTE para evitar parse/plan repetidos"""
+        if compiled.name not in self.prepared:
+            try:
+                # El savepoint evita que un PREPARE fallido aborte la transacción en curso
+                self.cursor.execute("SAVEPOINT cf_prepare")
+                self.cursor.execute(f"PREPARE {compiled.name} AS {compiled.prepare_text}")
+                self.cursor.execute("RELEASE SAVEPOINT cf_prepare")
+                self.prepared.add(compiled.name)
+            except Exception as e:
+                # Se libera también el savepoint para no acumularlos en transacciones largas
+                self.cursor.execute("ROLLBACK TO SAVEPOINT cf_prepare")
+                self.cursor.execute("RELEASE SAVEPOINT cf_prepare")
+                if _error_de_prepare(e):
+                    compiled.preparable = False
+                logger.warning("⚠️ No se pudo preparar la sentencia, se ejecuta sin PREPARE: %s", e)
+        
+        try:
+            if compiled.name in self.prepared:
+                return self.cursor.execute(compiled.execute_text, params)
+            return self.cursor.execute(compiled.text, params)
+        except Exception as e:
+            # P. ej. el esquema cambió y el plan guardado ya no es válido: dejar de prepararla.
+            # Los errores de los datos (clave duplicada, FK, valores inválidos) no la desactivan
+            if compiled.name in self.prepared and _error_de_prepare(e):
+                compiled.preparable = False
+                self.prepared.discard(compiled.name)
+            logger.error("❌ Error SQL: %s\n   Query: %s", e, compiled.text)
             raise e
 
     def fetchone(self):
-        return self.cursor.fetchone()
+        inicio = time.perf_counter()
+        fila = self.cursor.fetchone()
+        instrumentacion.sumar(self._entrada, time.perf_counter() - inicio)
+        return fila
 
     def fetchall(self):
-        return self.cursor.fetchall()
+        inicio = time.perf_counter()
+        filas = self.cursor.fetchall()
+        instrumentacion.sumar(self._entrada, time.perf_counter() - inicio)
+        return filas
+
+    def fetchmany(self, size=None):
+        inicio = time.perf_counter()
+        filas = self.cursor.fetchmany() if size is None else self.cursor.fetchmany(size)
+        instrumentacion.sumar(self._entrada, time.perf_counter() - inicio)
+        return filas
     
     def close(self):
         self.cursor.close()
@@ -60,14 +210,193 @@ class UnifiedCursor:
     def __getattr__(self, name):
         return getattr(self.cursor, name)
 
+class PoolExhaustedError(Exception):
+    """No se obtuvo una conexión libre del pool dentro del tiempo de espera"""
+    pass
+
+class ConnectionPool:
+    """
+    Pool de conexiones PostgreSQL para un proceso.
+    Reutiliza conexiones entre peticiones (evita TLS + autenticación en cada una),
+    verifica las conexiones ociosas al sacarlas y lleva métricas de espera y agotamiento.
+    """
+    def __init__(self, connect, min_size=1, max_size=10, timeout=10, healthcheck_interval=30):
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.timeout = timeout
+        self.healthcheck_interval = healthcheck_interval
+        self.pid = os.getpid()
+        self._cond = threading.Condition()
+        self._idle = []       # [(conexion, ultimo_uso)] usadas como pila (LIFO)
+        self._size = 0        # conexiones abiertas (ociosas + prestadas)
+        self._prepared = {}   # id(conexion) -> nombres de sentencias preparadas en ella
+        self._stats = {
+            'checkouts': 0,
+            'wait_total': 0.0,
+            'wait_max': 0.0,
+            'exhausted': 0,
+            'timeouts': 0,
+            'healthcheck_failures': 0,
+            'connections_created': 0,
+            'connections_discarded': 0
+        }
+        
+        # Precargar las conexiones mínimas; si la BD no responde se crearán bajo demanda
+        try:
+            for _ in range(min(self.min_size, self.max_size)):
+                conn = self._new_connection()
+                with self._cond:
+                    self._size += 1
+                    self._idle.append((conn, time.monotonic()))
+        except Exception as e:
+            print(f"⚠️ No se pudo precargar el pool de conexiones: {e}")
+
+    def _new_connection(self):
+        conn = self._connect()
+        with self._cond:
+            self._stats['connections_created'] += 1
+        return conn
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.healthcheck_interval:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._prepared.pop(id(conn), None)
+            self._size -= 1
+            self._stats['connections_discarded'] += 1
+            self._cond.notify()
+
+    def getconn(self):
+        """Saca una conexión del pool, esperando hasta `timeout` si está agotado"""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        exhausted = False
+        
+        while True:
+            entry = None
+            with self._cond:
+                while True:
+                    if self._idle:
+                        entry = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    if not exhausted:
+                        exhausted = True
+                        self._stats['exhausted'] += 1
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolExhaustedError(
+                            f"Pool agotado: {self.max_size} conexiones en uso tras {self.timeout}s de espera"
+                        )
+                    self._cond.wait(remaining)
+            
+            if entry is None:
+                try:
+                    conn = self._new_connection()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                break
+            
+            conn, last_used = entry
+            if self._is_healthy(conn, last_used):
+                break
+            
+            with self._cond:
+                self._stats['healthcheck_failures'] += 1
+            self._discard(conn)
+        
+        waited = time.monotonic() - start
+        with self._cond:
+            self._stats['checkouts'] += 1
+            self._stats['wait_total'] += waited
+            self._stats['wait_max'] = max(self._stats['wait_max'], waited)
+        return conn
+
+    def putconn(self, conn, discard=False):
+        """Devuelve una conexión al pool (o la descarta si está rota)"""
+        if self.pid != os.getpid():
+            # Conexión heredada de otro proceso: no tocar el socket del padre
+            return
+        
+        if not discard and not conn.closed:
+            try:
+                # Deja la conexión sin transacción abierta para el siguiente uso
+                conn.rollback()
+            except Exception:
+                discard = True
+        else:
+            discard = True
+        
+        if discard:
+            self._discard(conn)
+            return
+        
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def prepared_statements(self, conn):
+        """Conjunto de sentencias preparadas (PREPARE) que viven en esta conexión"""
+        with self._cond:
+            return self._prepared.setdefault(id(conn), set())
+
+    def closeall(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            for conn, _ in idle:
+                self._prepared.pop(id(conn), None)
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def get_stats(self):
+        """Métricas del pool: tiempo de espera al sacar conexiones y veces que se agotó"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['size'] = self._size
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = self._size - len(self._idle)
+            stats['max_size'] = self.max_size
+        stats['wait_avg'] = stats['wait_total'] / stats['checkouts'] if stats['checkouts'] else 0.0
+        return stats
+
 class ConnectionWrapper:
     """Wrapper para la conexión que devuelve nuestro cursor unificado"""
-    def __init__(self, conn, db_type):
+    def __init__(self, conn, db_type, pool=None):
         self.conn = conn
         self.db_type = db_type
+        self.pool = pool
+        # Las sentencias preparadas solo sobreviven en conexiones reutilizadas por el pool
+        self.prepared = pool.prepared_statements(conn) if pool is not None else None
     
     def cursor(self):
-        return UnifiedCursor(self.conn.cursor(), self.db_type)
+        return UnifiedCursor(self.conn.cursor(), self.db_type, self.prepared)
     
     def commit(self):
         self.conn.commit()
@@ -76,50 +405,108 @@ class ConnectionWrapper:
         self.conn.rollback()
     
     def close(self):
-        self.conn.close()
+        # Con pool, la conexión vuelve a estar disponible en lugar de cerrarse
+        if self.pool is not None:
+            self.pool.putconn(self.conn)
+        else:
+            self.conn.close()
+
+def _connect_postgres():
+    """Abre una conexión nueva a PostgreSQL con reintentos (la BD de Railway puede estar despertando)"""
+    # Usamos DictCursor para permitir acceso por nombre, pero también soporta índices
+    max_retries = 5
+    retry_delay = 2
+    
+    for attempt in range(max_retries):
+        try:
+            return psycopg2.connect(
+                DB_CONFIG['url'],
+                cursor_factory=psycopg2.extras.DictCursor
+            )
+        except psycopg2.OperationalError as e:
+            if attempt < max_retries - 1:
+                print(f"⚠️ Error conectando a BD (intento {attempt+1}/{max_retries}): {e}")
+                print(f"   Esperando {retry_delay} segundos...")
+                time.sleep(retry_delay)
+            else:
+                print("❌ No se pudo conectar a la base de datos después de varios intentos.")
+                raise e
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Devuelve el pool del proceso actual (se recrea tras un fork, p. ej. en cada worker de gunicorn)"""
+    global _pool
+    if _pool is None or _pool.pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool.pid != os.getpid():
+                _pool = ConnectionPool(_connect_postgres, **DB_POOL_CONFIG)
+    return _pool
+
+def _reset_pool_after_fork():
+    # El hijo no debe reutilizar ni cerrar los sockets heredados del padre
+    global _pool, _pool_lock
+    _pool = None
+    _pool_lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_pool_after_fork)
+
+def get_pool_stats():
+    """Métricas del pool del proceso actual (None si no se usa PostgreSQL)"""
+    if DB_CONFIG['type'] != 'postgresql' or _pool is None:
+        return None
+    return _pool.get_stats()
+
+def open_connection():
+    """
+    Conexión de la aplicación fuera del ciclo de la petición (p. ej. tareas en segundo
+    plano); quien la abre debe llamar a close() para devolverla al pool
+    """
+    if DB_CONFIG['type'] == 'postgresql':
+        # Conexión PostgreSQL tomada del pool del proceso
+        pool = get_pool()
+        return ConnectionWrapper(pool.getconn(), 'postgresql', pool)
+    
+    # Conexión SQLite
+    real_conn = sqlite3.connect(DB_CONFIG['database'])
+    real_conn.row_factory = sqlite3.Row
+    return ConnectionWrapper(real_conn, 'sqlite')
 
 def get_db():
     """Obtiene la conexión a la base de datos"""
     db = getattr(g, '_database', None)
     
     if db is None:
-        if DB_CONFIG['type'] == 'postgresql':
-            # Conexión PostgreSQL
-            # Usamos DictCursor para permitir acceso por nombre, pero también soporta índices
-            # Implementamos lógica de reintento para cuando la BD se está despertando (Railway)
-            max_retries = 5
-            retry_delay = 2
-            
-            for attempt in range(max_retries):
-                try:
-                    real_conn = psycopg2.connect(
-                        DB_CONFIG['url'],
-                        cursor_factory=psycopg2.extras.DictCursor
-                    )
-                    db = g._database = ConnectionWrapper(real_conn, 'postgresql')
-                    break # Conexión exitosa
-                except psycopg2.OperationalError as e:
-                    if attempt < max_retries - 1:
-                        print(f"⚠️ Error conectando a BD (intento {attempt+1}/{max_retries}): {e}")
-                        print(f"   Esperando {retry_delay} segundos...")
-                        time.sleep(retry_delay)
-                    else:
-                        print("❌ No se pudo conectar a la base de datos después de varios intentos.")
-                        raise e
-        else:
-            # Conexión SQLite
-            real_conn = sqlite3.connect(DB_CONFIG['database'])
-            real_conn.row_factory = sqlite3.Row
-            db = g._database = ConnectionWrapper(real_conn, 'sqlite')
+        db = g._database = open_connection()
     
     return db
 
 def close_connection(exception=None):
-    """Cierra la conexión a la base de datos al finalizar la petición"""
-    db = getattr(g, '_database', None)
+    """Libera la conexión a la base de datos al finalizar la petición"""
+    db = g.pop('_database', None)
     if db is not None:
         db.close()
 
+def script_connection():
+    """
+    Conexión fuera de Flask (scripts de mantenimiento) envuelta para usar la misma
+    sintaxis (?) que la aplicación: PostgreSQL si hay DATABASE_URL, si no el SQLite local
+    """
+    database_url = os.getenv('DATABASE_URL')
+    if database_url and database_url.strip():
+        import psycopg2
+
+        database_url = database_url.strip()
+        if database_url.startswith('postgres://'):
+            database_url = database_url.replace('postgres://', 'postgresql://', 1)
+        return ConnectionWrapper(psycopg2.connect(database_url), 'postgresql')
+
+    # SQLITE_DATABASE como en config.py (relativa a la carpeta del proyecto si no es absoluta)
+    db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.getenv('SQLITE_DATABASE', 'usuariosdb.db'))
+    return ConnectionWrapper(sqlite3.connect(db_path), 'sqlite')
+
 def execute_query(query, params=None, fetch_one=False, fetch_all=False, commit=False):
     """Helper function para ejecutar queries (usa el wrapper automáticamente)"""
     db = get_db()
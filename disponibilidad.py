@@ -0,0 +1,44 @@
+"""
+Modelo de franjas horarias (slots) de las reservas
+Cada reserva ocupa una franja de 1 hora identificada por la hora de inicio (0-23),
+de modo que (id_cancha, fecha, slot) puede protegerse con un índice único.
+"""
+from datetime import datetime
+from config import ZONA_HORARIA
+
+# Horario usado cuando la cancha no tiene horarios_canchas definidos (igual que el formulario)
+HORA_APERTURA_DEFECTO = 8
+HORA_CIERRE_DEFECTO = 23
+
+def ahora_local():
+    """Fecha y hora actuales en ZONA_HORARIA, sin zona (como las fechas y franjas guardadas)"""
+    return datetime.now(ZONA_HORARIA).replace(tzinfo=None)
+
+def hora_de(valor):
+    """Hora entera de un TIME (PostgreSQL devuelve datetime.time, SQLite un texto 'HH:MM[:SS]')"""
+    if valor is None:
+        return None
+    if hasattr(valor, 'hour'):
+        return valor.hour
+    try:
+        return int(str(valor).split(':')[0])
+    except ValueError:
+        return None
+
+def slot_de_horario(horario):
+    """Convierte el horario del formulario ('18:00') en su franja (18); None si no es válido"""
+    hora = hora_de(horario)
+    if hora is None or not 0 <= hora <= 23:
+        return None
+    return hora
+
+def horario_de_slot(slot):
+    return '%02d:00' % slot
+
+def slots_de_apertura(hora_inicio, hora_fin):
+    """Franjas de 1 hora entre la apertura y el cierre de la cancha"""
+    inicio = hora_de(hora_inicio)
+    fin = hora_de(hora_fin)
+    if inicio is None or fin is None:
+        inicio, fin = HORA_APERTURA_DEFECTO, HORA_CIERRE_DEFECTO
+    return list(range(inicio, fin))
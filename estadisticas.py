@@ -0,0 +1,152 @@
+"""
+Estadísticas mensuales precalculadas por cancha (y por dueño) para el dashboard del dueño.
+Cada reserva creada, cancelada o completada actualiza su fila (id_cancha, mes) de forma
+incremental, así el dashboard lee unas pocas filas en vez de recorrer todo el historial.
+Los ingresos salen del precio guardado en cada reserva (reservas.precio, copiado de
+canchas.precio_num al reservar): crear y cancelar suman y restan el mismo valor aunque
+el dueño cambie el precio de la cancha entre medio.
+
+Uso para reconstruir las estadísticas desde cero (reparar desviaciones):
+    python estadisticas.py
+"""
+import re
+from decimal import Decimal
+from dotenv import load_dotenv
+from db import script_connection
+
+load_dotenv()
+
+# DDL válido tanto en SQLite como en PostgreSQL
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS estadisticas_mensuales (
+        id_cancha INTEGER NOT NULL,
+        mes VARCHAR(7) NOT NULL,
+        usuario_id INTEGER NOT NULL,
+        reservas INTEGER NOT NULL DEFAULT 0,
+        completadas INTEGER NOT NULL DEFAULT 0,
+        ingresos NUMERIC(14, 2) NOT NULL DEFAULT 0,
+        PRIMARY KEY (id_cancha, mes),
+        FOREIGN KEY (id_cancha) REFERENCES canchas(id_cancha) ON DELETE CASCADE
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_estadisticas_usuario_mes ON estadisticas_mensuales(usuario_id, mes)"
+]
+
+# Parte entera sin separadores o agrupada de a tres cifras con un mismo separador
+# ('120000', '120.000', '1,250,000'), y parte decimal opcional de una o dos cifras
+# con el otro separador ('120.000,50', '85,000.50', '120,5')
+_PRECIO = re.compile(r'(?P<entero>\d+|\d{1,3}(?P<miles>[.,])\d{3}(?:(?P=miles)\d{3})*)'
+                     r'(?:(?P<decimal>[.,])(?P<fraccion>\d{1,2}))?')
+
+def precio_numerico(precio):
+    """
+    Normaliza el precio escrito por el dueño ('120000', '$120.000', '85,000.50',
+    '120.000,50') a número. Devuelve None si no se puede interpretar sin ambigüedad
+    (p. ej. '120.000.50' o '120,5000').
+    """
+    if precio is None:
+        return None
+    if isinstance(precio, (int, float, Decimal)):
+        return float(precio)
+    texto = re.sub(r'[^0-9.,]', '', str(precio))
+    partes = _PRECIO.fullmatch(texto)
+    if not partes or (partes['miles'] and partes['miles'] == partes['decimal']):
+        return None
+    entero = partes['entero'].replace(partes['miles'] or '', '')
+    return float(f"{entero}.{partes['fraccion']}" if partes['fraccion'] else entero)
+
+def mes_de(fecha):
+    """'YYYY-MM' de una fecha (string en SQLite, date en PostgreSQL)"""
+    return str(fecha)[:7]
+
+def registrar_movimiento(cur, id_cancha, fecha, reservas=0, completadas=0, ingresos=0):
+    """
+    Suma (o resta, con valores negativos) un movimiento al mes de la reserva.
+    ingresos: precio guardado en la reserva (negativo al cancelarla), no el actual de la cancha.
+    """
+    cur.execute("""
+        INSERT INTO estadisticas_mensuales (id_cancha, mes, usuario_id, reservas, completadas, ingresos)
+        SELECT c.id_cancha, ?, c.usuario_id, ?, ?, ?
+        FROM canchas c
+        WHERE c.id_cancha = ?
+        ON CONFLICT (id_cancha, mes) DO UPDATE SET
+            reservas = estadisticas_mensuales.reservas + excluded.reservas,
+            completadas = estadisticas_mensuales.completadas + excluded.completadas,
+            ingresos = estadisticas_mensuales.ingresos + excluded.ingresos
+    """, (mes_de(fecha), reservas, completadas, ingresos or 0, id_cancha))
+
+def resumen_dueno(cur, usuario_id, mes):
+    """(reservas totales, reservas del mes, ingresos del mes) de todas las canchas del dueño"""
+    cur.execute("""
+        SELECT COALESCE(SUM(reservas), 0),
+               COALESCE(SUM(CASE WHEN mes = ? THEN reservas ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN mes = ? THEN ingresos ELSE 0 END), 0)
+        FROM estadisticas_mensuales
+        WHERE usuario_id = ?
+    """, (mes, mes, usuario_id))
+    fila = cur.fetchone()
+    return int(fila[0]), int(fila[1]), float(fila[2])
+
+def descontar_reservas_usuario(cur, id_usuario):
+    """Resta las reservas de un usuario antes de borrarlas (p. ej. al eliminar su cuenta)"""
+    cur.execute("""
+        INSERT INTO estadisticas_mensuales (id_cancha, mes, usuario_id, reservas, completadas, ingresos)
+        SELECT r.id_cancha, substr(CAST(r.fecha AS TEXT), 1, 7), c.usuario_id,
+               -COUNT(*),
+               -SUM(CASE WHEN r.estado = 'completada' THEN 1 ELSE 0 END),
+               -SUM(COALESCE(r.precio, 0))
+        FROM reservas r
+        JOIN canchas c ON r.id_cancha = c.id_cancha
+        WHERE r.id_usuario = ?
+        GROUP BY r.id_cancha, substr(CAST(r.fecha AS TEXT), 1, 7), c.usuario_id
+        ON CONFLICT (id_cancha, mes) DO UPDATE SET
+            reservas = estadisticas_mensuales.reservas + excluded.reservas,
+            completadas = estadisticas_mensuales.completadas + excluded.completadas,
+            ingresos = estadisticas_mensuales.ingresos + excluded.ingresos
+    """, (id_usuario,))
+
+def eliminar_cancha(cur, id_cancha):
+    cur.execute("DELETE FROM estadisticas_mensuales WHERE id_cancha = ?", (id_cancha,))
+
+def recalcular(cur, id_cancha=None):
+    """Reconstruye las estadísticas (de una cancha o de todas) a partir de la tabla reservas"""
+    if id_cancha is not None:
+        cur.execute("DELETE FROM estadisticas_mensuales WHERE id_cancha = ?", (id_cancha,))
+        filtro, params = "WHERE r.id_cancha = ?", (id_cancha,)
+    else:
+        cur.execute("DELETE FROM estadisticas_mensuales")
+        filtro, params = "", ()
+
+    cur.execute(f"""
+        INSERT INTO estadisticas_mensuales (id_cancha, mes, usuario_id, reservas, completadas, ingresos)
+        SELECT r.id_cancha, substr(CAST(r.fecha AS TEXT), 1, 7), c.usuario_id,
+               COUNT(*),
+               SUM(CASE WHEN r.estado = 'completada' THEN 1 ELSE 0 END),
+               SUM(COALESCE(r.precio, 0))
+        FROM reservas r
+        JOIN canchas c ON r.id_cancha = c.id_cancha
+        {filtro}
+        GROUP BY r.id_cancha, substr(CAST(r.fecha AS TEXT), 1, 7), c.usuario_id
+    """, params)
+    return cur.rowcount
+
+def crear_tabla(cur):
+    for sentencia in SCHEMA:
+        cur.execute(sentencia)
+
+if __name__ == "__main__":
+    print("🚀 Recalculando estadísticas mensuales de las canchas...")
+    print("-" * 60)
+    conn = script_connection()
+    cur = conn.cursor()
+    try:
+        crear_tabla(cur)
+        grupos = recalcular(cur)
+        conn.commit()
+        print(f"✅ {grupos} meses-cancha recalculados")
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error al recalcular estadísticas: {e}")
+    finally:
+        conn.close()
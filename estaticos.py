@@ -0,0 +1,186 @@
+"""
+Archivos estáticos con huella de contenido.
+Los archivos que se publican con la aplicación (las carpetas de STATIC_HASHED_DIRS:
+css, js, img, imagenes) reciben una URL con los primeros caracteres de su SHA-256
+(css/output.css -> /assets/css/output.1a2b3c4d5e6f.css). Como la URL cambia cuando cambia
+el archivo, se sirve con Cache-Control immutable y las visitas siguientes no vuelven a
+pedirlo. Los archivos de texto se comprimen una sola vez (gzip y, si está instalado el
+paquete brotli, br) y se entregan según Accept-Encoding.
+
+El manifiesto y las versiones comprimidas se guardan en STATIC_CACHE_DIR. En el build se
+generan con
+    python estaticos.py
+y al arrancar solo se comprueba el tamaño y la fecha de cada archivo: los que no
+cambiaron no se vuelven a leer ni a comprimir.
+
+En las plantillas se usa static_url('css/output.css') en lugar de
+url_for('static', filename='css/output.css'); las imágenes subidas (canchas_uploads) y
+los archivos que no estaban al arrancar siguen saliendo por /static.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import threading
+import time
+from flask import Blueprint, Response, abort, current_app, request, send_from_directory, url_for
+from config import STATIC_ASSETS_CONFIG
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Extensiones que vale la pena comprimir (las imágenes ya vienen comprimidas)
+COMPRIMIBLES = {'.css', '.js', '.svg', '.json', '.txt', '.map', '.html'}
+TAMANO_MINIMO_COMPRESION = 1024
+CODIFICACIONES = {'gzip': '.gz', 'br': '.br'}
+
+CARPETA_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), STATIC_ASSETS_CONFIG['cache'])
+MANIFIESTO_CACHE = 'manifiesto.json'
+
+estaticos = Blueprint('estaticos', __name__)
+
+_manifiesto = {}      # 'css/output.css' -> 'css/output.1a2b3c4d5e6f.css'
+_originales = {}      # inverso: ruta con huella -> ruta real
+_comprimidos = {}     # (ruta real, 'br' | 'gzip') -> bytes
+_lock = threading.Lock()
+
+def _con_huella(ruta, huella):
+    base, extension = os.path.splitext(ruta)
+    return f"{base}.{huella}{extension}"
+
+def _archivos(carpeta_static):
+    """(ruta relativa a static/, ruta completa) de los archivos de las carpetas publicadas"""
+    for carpeta in STATIC_ASSETS_CONFIG['carpetas']:
+        for raiz, _, archivos in os.walk(os.path.join(carpeta_static, carpeta)):
+            for nombre in archivos:
+                completa = os.path.join(raiz, nombre)
+                yield os.path.relpath(completa, carpeta_static).replace(os.sep, '/'), completa
+
+def _escribir(archivo, datos):
+    """Escritura atómica en la caché; si el disco es de solo lectura se sigue sin ella"""
+    try:
+        os.makedirs(os.path.dirname(archivo), exist_ok=True)
+        temporal = f"{archivo}.{os.getpid()}.tmp"
+        with open(temporal, 'wb') as f:
+            f.write(datos)
+        os.replace(temporal, archivo)
+    except OSError:
+        pass
+
+def _leer_manifiesto_cache():
+    """{ruta: [tamaño, mtime_ns, ruta con huella]} del último construir()"""
+    try:
+        with open(os.path.join(CARPETA_CACHE, MANIFIESTO_CACHE), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _comprimido(hashed, codificacion, leer):
+    """Versión comprimida de la caché en disco; si falta se comprime y se guarda"""
+    archivo = os.path.join(CARPETA_CACHE, hashed + CODIFICACIONES[codificacion])
+    try:
+        with open(archivo, 'rb') as f:
+            return f.read()
+    except OSError:
+        pass
+    if codificacion == 'gzip':
+        datos = gzip.compress(leer(), compresslevel=9, mtime=0)
+    else:
+        datos = brotli.compress(leer(), quality=11)
+    _escribir(archivo, datos)
+    return datos
+
+def construir(carpeta_static):
+    """
+    Calcula el manifiesto y las versiones comprimidas de las carpetas publicadas,
+    reutilizando la caché en disco para los archivos que no cambiaron
+    """
+    previo = _leer_manifiesto_cache()
+    entradas, manifiesto, originales, comprimidos = {}, {}, {}, {}
+    codificaciones = ('br', 'gzip') if brotli is not None else ('gzip',)
+    for ruta, completa in _archivos(carpeta_static):
+        info = os.stat(completa)
+        contenido = None
+
+        def leer():
+            # El archivo se lee solo si cambió o le falta alguna versión comprimida
+            nonlocal contenido
+            if contenido is None:
+                with open(completa, 'rb') as f:
+                    contenido = f.read()
+            return contenido
+
+        entrada = previo.get(ruta)
+        if entrada and entrada[:2] == [info.st_size, info.st_mtime_ns]:
+            hashed = entrada[2]
+        else:
+            hashed = _con_huella(ruta, hashlib.sha256(leer()).hexdigest()[:STATIC_ASSETS_CONFIG['largo_huella']])
+        entradas[ruta] = [info.st_size, info.st_mtime_ns, hashed]
+        manifiesto[ruta] = hashed
+        originales[hashed] = ruta
+
+        if os.path.splitext(ruta)[1].lower() in COMPRIMIBLES and info.st_size >= TAMANO_MINIMO_COMPRESION:
+            for codificacion in codificaciones:
+                comprimidos[(ruta, codificacion)] = _comprimido(hashed, codificacion, leer)
+
+    if entradas != previo:
+        _escribir(os.path.join(CARPETA_CACHE, MANIFIESTO_CACHE),
+                  json.dumps(entradas, indent=1, sort_keys=True).encode('utf-8'))
+
+    global _manifiesto, _originales, _comprimidos
+    with _lock:
+        _manifiesto, _originales, _comprimidos = manifiesto, originales, comprimidos
+    return manifiesto
+
+@estaticos.record_once
+def _al_registrar(state):
+    if STATIC_ASSETS_CONFIG['activo']:
+        construir(state.app.static_folder)
+
+@estaticos.app_template_global('static_url')
+def static_url(filename):
+    """Igual que url_for('static', filename=...) pero con la URL con huella si existe"""
+    filename = filename.replace('static/', '', 1) if filename.startswith('static/') else filename
+    hashed = _manifiesto.get(filename)
+    if hashed is None:
+        return url_for('static', filename=filename)
+    return url_for('estaticos.asset', filename=hashed)
+
+def _codificacion_aceptada(ruta):
+    aceptadas = request.accept_encodings
+    for codificacion in ('br', 'gzip'):
+        if (ruta, codificacion) in _comprimidos and aceptadas[codificacion]:
+            return codificacion
+    return None
+
+@estaticos.route('/assets/<path:filename>')
+def asset(filename):
+    ruta = _originales.get(filename)
+    if ruta is None:
+        abort(404)
+
+    max_age = STATIC_ASSETS_CONFIG['max_age']
+    codificacion = _codificacion_aceptada(ruta)
+    if codificacion is None:
+        response = send_from_directory(current_app.static_folder, ruta, max_age=max_age, conditional=True)
+    else:
+        mimetype = mimetypes.guess_type(ruta)[0] or 'application/octet-stream'
+        response = Response(_comprimidos[(ruta, codificacion)], mimetype=mimetype)
+        response.headers['Content-Encoding'] = codificacion
+
+    # El contenido de una URL con huella nunca cambia
+    response.headers['Cache-Control'] = f'public, max-age={max_age}, immutable'
+    if (ruta, 'gzip') in _comprimidos:
+        response.vary.add('Accept-Encoding')
+    return response
+
+if __name__ == "__main__":
+    print("🚀 Calculando huellas y versiones comprimidas de los estáticos...")
+    print("-" * 60)
+    inicio = time.perf_counter()
+    archivos = construir(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
+    print(f"✅ {len(archivos)} archivos de {', '.join(STATIC_ASSETS_CONFIG['carpetas'])} "
+          f"en {CARPETA_CACHE} ({time.perf_counter() - inicio:.2f} s)")
@@ -1,65 +1,216 @@
 """
-Script opcional para migrar datos de SQLite a PostgreSQL
+Script opcional para migrar datos de SQLite a PostgreSQL (o respaldar cualquiera de las dos)
 Solo ejecuta esto si quieres transferir datos existentes
+
+Lee cada tabla por lotes (fetchmany; en PostgreSQL con un cursor del servidor) y la
+escribe fila por fila, así la memoria no crece con el tamaño de la base de datos.
+Genera una carpeta con un archivo por tabla y un manifest.json:
+
+    data_export/
+        manifest.json           # columnas, filas y SHA-256 de cada archivo
+        usuarios.ndjson         # un objeto JSON por línea (o .csv con --formato csv)
+        ...
+
+    python export_data.py                          # SQLite local (usuariosdb.db)
+    python export_data.py --formato csv --gzip     # CSV comprimido (.csv.gz)
+    python export_data.py --origen postgresql      # desde la base de DATABASE_URL
+
+Las estadísticas mensuales no se exportan: se recalculan con python estadisticas.py.
 """
-import sqlite3
+import argparse
+import gzip
+import hashlib
+import io
 import json
-from datetime import datetime
+import os
+import sqlite3
+from datetime import date, datetime, time
+from decimal import Decimal
+from dotenv import load_dotenv
 
-def export_data_from_sqlite():
-    """Exporta todos los datos de SQLite a un archivo JSON"""
-    
-    try:
-        # Conectar a SQLite
-        conn = sqlite3.connect('usuariosdb.db')
-        conn.row_factory = sqlite3.Row
+load_dotenv()
+
+# Tablas a exportar, en orden de importación (respetando foreign keys)
+TABLES = ['usuarios', 'canchas', 'favoritos', 'horarios_canchas', 'reservas', 'geocodificaciones']
+LOTE = 1000
+MANIFEST = 'manifest.json'
+
+class _ArchivoConHash(io.RawIOBase):
+    """Archivo de salida que calcula el SHA-256 y el tamaño de lo que se escribe"""
+    def __init__(self, archivo):
+        self.archivo = archivo
+        self.sha256 = hashlib.sha256()
+        self.bytes = 0
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self.sha256.update(datos)
+        self.bytes += len(datos)
+        return self.archivo.write(datos)
+
+def _valor(valor):
+    """Valor exportable: fechas en ISO 8601 y decimales como texto (sin perder precisión)"""
+    if isinstance(valor, (datetime, date, time)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+def campo_csv(valor):
+    """
+    Campo CSV con la convención de COPY ... FORMAT csv de PostgreSQL: NULL es un campo
+    vacío sin comillas y el texto va siempre entre comillas (así '' no se confunde con NULL)
+    """
+    valor = _valor(valor)
+    if valor is None:
+        return ''
+    if isinstance(valor, str):
+        return '"' + valor.replace('"', '""') + '"'
+    return str(valor)
+
+def _conectar(origen):
+    """(conexión, tipo): el SQLite local o la base de DATABASE_URL"""
+    if origen == 'postgresql':
+        import psycopg2
+
+        database_url = (os.getenv('DATABASE_URL') or '').strip()
+        if not database_url:
+            raise ValueError("DATABASE_URL no está configurada")
+        if database_url.startswith('postgres://'):
+            database_url = database_url.replace('postgres://', 'postgresql://', 1)
+        conn = psycopg2.connect(database_url)
+        # Una sola foto consistente de todas las tablas
+        conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+        return conn, 'postgresql'
+
+    if not os.path.exists('usuariosdb.db'):
+        raise FileNotFoundError("No se encontró 'usuariosdb.db'")
+    conn = sqlite3.connect('usuariosdb.db')
+    # Una sola transacción de lectura para todas las tablas
+    conn.execute('BEGIN')
+    return conn, 'sqlite'
+
+def _existe(conn, db_type, table):
+    cursor = conn.cursor()
+    if db_type == 'postgresql':
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (table,))
+    else:
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    existe = bool(cursor.fetchone()[0])
+    cursor.close()
+    return existe
+
+def _filas(conn, db_type, table, lote):
+    """(columnas, iterador de filas) leyendo de a `lote` filas"""
+    if db_type == 'postgresql':
+        # Cursor con nombre = cursor del servidor: solo viajan `lote` filas por vez
+        cursor = conn.cursor(name=f'export_{table}')
+        cursor.itersize = lote
+    else:
         cursor = conn.cursor()
-        
-        data = {}
-        
-        # Tablas a exportar
-        tables = ['usuarios', 'canchas', 'favoritos', 'horarios_canchas', 'reservas']
-        
-        print("📤 Exportando datos de SQLite...")
+    # Ordenadas por la clave primaria (primera columna) para que la exportación sea reproducible
+    cursor.execute(f"SELECT * FROM {table} ORDER BY 1")
+    primeras = cursor.fetchmany(lote)
+    columnas = [d[0] for d in cursor.description]
+
+    def iterar():
+        filas = primeras
+        try:
+            while filas:
+                yield from filas
+                filas = cursor.fetchmany(lote)
+        finally:
+            cursor.close()
+
+    return columnas, iterar()
+
+def _exportar_tabla(conn, db_type, table, carpeta, formato, comprimir, lote):
+    nombre = f"{table}.{formato}" + ('.gz' if comprimir else '')
+    columnas, filas = _filas(conn, db_type, table, lote)
+    total = 0
+
+    with open(os.path.join(carpeta, nombre), 'wb') as archivo:
+        destino = _ArchivoConHash(archivo)
+        binario = gzip.GzipFile(fileobj=destino, mode='wb', mtime=0) if comprimir else destino
+        texto = io.TextIOWrapper(binario, encoding='utf-8', newline='')
+        try:
+            if formato == 'csv':
+                texto.write(','.join(campo_csv(col) for col in columnas) + '\n')
+                for fila in filas:
+                    texto.write(','.join(campo_csv(v) for v in fila) + '\n')
+                    total += 1
+            else:
+                for fila in filas:
+                    registro = {col: _valor(v) for col, v in zip(columnas, fila)}
+                    texto.write(json.dumps(registro, ensure_ascii=False) + '\n')
+                    total += 1
+        finally:
+            texto.close()
+
+    return {
+        'tabla': table,
+        'archivo': nombre,
+        'columnas': columnas,
+        'filas': total,
+        'bytes': destino.bytes,
+        'sha256': destino.sha256.hexdigest()
+    }
+
+def export_data(carpeta='data_export', formato='ndjson', comprimir=False, lote=LOTE, origen='sqlite'):
+    """Exporta todas las tablas a `carpeta` con su manifest.json"""
+
+    try:
+        conn, db_type = _conectar(origen)
+    except Exception as e:
+        print(f"❌ Error al conectar: {e}")
+        return False
+
+    try:
+        os.makedirs(carpeta, exist_ok=True)
+        manifest = {
+            'generado': datetime.now().isoformat(timespec='seconds'),
+            'origen': db_type,
+            'formato': formato,
+            'gzip': comprimir,
+            'tablas': []
+        }
+
+        print(f"📤 Exportando datos de {'PostgreSQL' if db_type == 'postgresql' else 'SQLite'}...")
         print("-" * 60)
-        
-        for table in tables:
-            try:
-                cursor.execute(f"SELECT * FROM {table}")
-                rows = cursor.fetchall()
-                
-                # Convertir rows a diccionarios
-                data[table] = []
-                for row in rows:
-                    row_dict = dict(row)
-                    # Convertir valores None y fechas a strings
-                    for key, value in row_dict.items():
-                        if value is None:
-                            row_dict[key] = None
-                        elif isinstance(value, (datetime,)):
-                            row_dict[key] = value.isoformat()
-                    data[table].append(row_dict)
-                
-                print(f"   ✓ {table}: {len(rows)} registros exportados")
-            except sqlite3.Error as e:
-                print(f"   ⚠️  {table}: No se pudo exportar ({e})")
-                data[table] = []
-        
-        # Guardar a JSON
-        with open('data_export.json', 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        
-        conn.close()
-        
-        print("\n✅ Datos exportados exitosamente a 'data_export.json'")
+
+        for table in TABLES:
+            if not _existe(conn, db_type, table):
+                print(f"   ⚠️  {table}: No existe, se omite")
+                continue
+            info = _exportar_tabla(conn, db_type, table, carpeta, formato, comprimir, lote)
+            manifest['tablas'].append(info)
+            print(f"   ✓ {table}: {info['filas']} registros exportados ({info['archivo']})")
+
+        with open(os.path.join(carpeta, MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+        print(f"\n✅ Datos exportados exitosamente a '{carpeta}/'")
         print("💡 Ahora puedes usar import_data.py para importar a PostgreSQL")
         return True
-        
+
     except Exception as e:
         print(f"❌ Error al exportar datos: {e}")
         return False
+    finally:
+        conn.close()
 
 if __name__ == "__main__":
-    print("🚀 Exportando datos de SQLite...")
+    parser = argparse.ArgumentParser(description='Exporta las tablas por streaming (NDJSON o CSV)')
+    parser.add_argument('--origen', choices=['sqlite', 'postgresql'], default='sqlite',
+                        help='sqlite (usuariosdb.db) o postgresql (DATABASE_URL)')
+    parser.add_argument('--salida', default='data_export', help='carpeta de salida (data_export)')
+    parser.add_argument('--formato', choices=['ndjson', 'csv'], default='ndjson')
+    parser.add_argument('--gzip', action='store_true', help='comprimir cada archivo (.gz)')
+    parser.add_argument('--lote', type=int, default=LOTE, help=f'filas por lectura ({LOTE})')
+    args = parser.parse_args()
+
+    print("🚀 Exportando datos...")
     print("=" * 60)
-    export_data_from_sqlite()
+    export_data(args.salida, args.formato, args.gzip, args.lote, args.origen)
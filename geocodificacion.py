@@ -0,0 +1,334 @@
+"""
+Geocodificación de las direcciones de las canchas y búsqueda de canchas cercanas.
+La dirección se convierte en coordenadas una sola vez al guardar la cancha
+(canchas.lat / canchas.lng) y el resultado por dirección queda en la tabla
+geocodificaciones, así los visitantes no consultan ningún servicio externo.
+Las direcciones nuevas se consultan al proveedor fuera de la petición, después del
+commit que guardó la cancha, y nunca más seguido que su intervalo.
+
+El proveedor se elige con GEOCODER (ver config.py). Para llenar las canchas que aún
+no tienen coordenadas:
+    python geocodificacion.py
+"""
+import hashlib
+import json
+import logging
+import math
+import re
+import threading
+import time
+import urllib.parse
+import urllib.request
+from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+from cache import TTLCache
+from config import GEOCODER_CONFIG
+
+load_dotenv()
+
+logger = logging.getLogger('campofinder.geocodificacion')
+
+RADIO_TIERRA_KM = 6371.0
+KM_POR_GRADO_LAT = 111.32
+
+# Radio de búsqueda por defecto y máximo de /api/canchas/cercanas
+RADIO_DEFECTO_KM = 25
+RADIO_MAXIMO_KM = 200
+
+class GeocodificadorError(Exception):
+    """Fallo temporal del proveedor (red, límite de uso): el resultado no se guarda"""
+
+class GeocodificadorNominatim:
+    """Nominatim de OpenStreetMap (máximo 1 petición por segundo según su política de uso)"""
+    intervalo = 1.0
+
+    def __init__(self, config):
+        self.url = config['url']
+        self.contexto = config['contexto']
+        self.timeout = config['timeout']
+        self.user_agent = config['user_agent']
+
+    def buscar(self, direccion):
+        consulta = f"{direccion}, {self.contexto}" if self.contexto else direccion
+        url = f"{self.url}?{urllib.parse.urlencode({'format': 'json', 'limit': 1, 'q': consulta})}"
+        peticion = urllib.request.Request(url, headers={'User-Agent': self.user_agent})
+        try:
+            with urllib.request.urlopen(peticion, timeout=self.timeout) as respuesta:
+                datos = json.loads(respuesta.read().decode('utf-8'))
+        except (OSError, ValueError) as e:
+            raise GeocodificadorError(str(e)) from e
+        if not datos:
+            return None
+        return float(datos[0]['lat']), float(datos[0]['lon'])
+
+class GeocodificadorLocal:
+    """
+    Sin red, para desarrollo y pruebas: usa las direcciones del archivo JSON
+    GEOCODER_LOCAL_FILE y, para las demás, un punto fijo (derivado del texto)
+    a menos de ~10 km del centro de la zona.
+    """
+    intervalo = 0
+    centro = (4.5794, -74.2168)
+
+    def __init__(self, config):
+        self.direcciones = {}
+        if config['archivo_local']:
+            with open(config['archivo_local'], encoding='utf-8') as f:
+                self.direcciones = {normalizar(d): tuple(c) for d, c in json.load(f).items()}
+
+    def buscar(self, direccion):
+        clave = normalizar(direccion)
+        if clave in self.direcciones:
+            return self.direcciones[clave]
+        resumen = hashlib.md5(clave.encode('utf-8')).digest()
+        desplazamiento_lat = (resumen[0] / 255 - 0.5) * 0.18
+        desplazamiento_lng = (resumen[1] / 255 - 0.5) * 0.18
+        return self.centro[0] + desplazamiento_lat, self.centro[1] + desplazamiento_lng
+
+class GeocodificadorNulo:
+    """Geocodificación desactivada: las canchas quedan sin coordenadas"""
+    intervalo = 0
+
+    def __init__(self, config):
+        pass
+
+    def buscar(self, direccion):
+        return None
+
+PROVEEDORES = {
+    'nominatim': GeocodificadorNominatim,
+    'local': GeocodificadorLocal,
+    'ninguno': GeocodificadorNulo
+}
+
+_geocodificador = None
+# Direcciones ya resueltas en este proceso (evita releer la tabla al editar)
+_cache = TTLCache(maxsize=1024, ttl=3600)
+# Consultas hechas al proveedor externo
+consultas_externas = 0
+# Una consulta externa a la vez y separadas por el intervalo del proveedor (en este proceso)
+_consulta_lock = threading.Lock()
+_ultima_consulta = 0.0
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def obtener_geocodificador():
+    global _geocodificador
+    if _geocodificador is None:
+        proveedor = PROVEEDORES.get(GEOCODER_CONFIG['proveedor'], GeocodificadorNulo)
+        _geocodificador = proveedor(GEOCODER_CONFIG)
+    return _geocodificador
+
+def usar_geocodificador(geocodificador):
+    """Reemplaza el proveedor (p. ej. un stub en pruebas)"""
+    global _geocodificador
+    _geocodificador = geocodificador
+    _cache.clear()
+
+def normalizar(direccion):
+    """Clave de caché: minúsculas y espacios simples"""
+    return re.sub(r'\s+', ' ', (direccion or '').strip().lower())
+
+def guardadas(cur, direccion):
+    """
+    (lat, lng) ya conocidas de una dirección (caché del proceso o tabla geocodificaciones),
+    sin consultar al proveedor; None si nunca se ha resuelto. Las direcciones vacías o no
+    encontradas dan (None, None).
+    """
+    clave = normalizar(direccion)
+    if not clave:
+        return None, None
+
+    resultado = _cache.get(clave)
+    if resultado is not None:
+        return resultado
+
+    cur.execute("SELECT lat, lng FROM geocodificaciones WHERE direccion = ?", (clave,))
+    fila = cur.fetchone()
+    if fila is None:
+        return None
+    resultado = (fila[0], fila[1])
+    _cache.set(clave, resultado)
+    return resultado
+
+def _consultar(direccion):
+    """
+    Consulta al proveedor esperando su intervalo desde la consulta anterior; None si
+    falló temporalmente (no se guarda para reintentar).
+    """
+    global consultas_externas, _ultima_consulta
+    geocodificador = obtener_geocodificador()
+    with _consulta_lock:
+        espera = _ultima_consulta + geocodificador.intervalo - time.monotonic()
+        if espera > 0:
+            time.sleep(espera)
+        consultas_externas += 1
+        try:
+            encontrado = geocodificador.buscar(direccion)
+        except GeocodificadorError as e:
+            logger.warning("No se pudo geocodificar '%s': %s", direccion, e)
+            return None
+        finally:
+            _ultima_consulta = time.monotonic()
+    # También se guardan las direcciones no encontradas (lat/lng NULL)
+    return encontrado if encontrado else (None, None)
+
+def _guardar(cur, direccion, resultado):
+    clave = normalizar(direccion)
+    cur.execute("""
+        INSERT INTO geocodificaciones (direccion, lat, lng) VALUES (?, ?, ?)
+        ON CONFLICT (direccion) DO NOTHING
+    """, (clave, resultado[0], resultado[1]))
+    _cache.set(clave, resultado)
+
+def coordenadas(cur, direccion):
+    """
+    (lat, lng) de una dirección, o (None, None) si no se pudo resolver.
+    Consulta primero la caché del proceso, luego la tabla geocodificaciones y por
+    último al proveedor (puede tardar hasta GEOCODER_TIMEOUT: no usar en peticiones).
+    """
+    resultado = guardadas(cur, direccion)
+    if resultado is not None:
+        return resultado
+    resultado = _consultar(direccion)
+    if resultado is None:
+        return None, None
+    _guardar(cur, direccion, resultado)
+    return resultado
+
+def _tarea(id_cancha, direccion):
+    # Import diferido: db importa Flask y este módulo también lo usan los scripts
+    from db import open_connection
+    import catalogo
+
+    conn = open_connection()
+    try:
+        cur = conn.cursor()
+        resultado = guardadas(cur, direccion)
+        # Sin transacción abierta mientras se espera al proveedor
+        conn.rollback()
+        if resultado is None:
+            resultado = _consultar(direccion)
+            if resultado is None:
+                return
+            _guardar(cur, direccion, resultado)
+        # Si la dirección cambió mientras tanto, la cancha queda para la tarea más reciente
+        cur.execute("""
+            UPDATE canchas SET lat = ?, lng = ?
+            WHERE id_cancha = ? AND direccion = ?
+        """, (resultado[0], resultado[1], id_cancha, direccion))
+        actualizada = cur.rowcount > 0
+        conn.commit()
+        if actualizada:
+            catalogo.invalidar(conn)
+    except Exception as e:
+        conn.rollback()
+        logger.warning("Error geocodificando la cancha %s: %s", id_cancha, e)
+    finally:
+        conn.close()
+
+def programar(id_cancha, direccion):
+    """
+    Encola la geocodificación de la cancha (se llama después del commit que guardó la
+    dirección con lat/lng NULL). Con GEOCODER_WORKERS=0 se hace en el mismo hilo.
+    """
+    if not normalizar(direccion):
+        return
+    if GEOCODER_CONFIG['workers'] <= 0:
+        _tarea(id_cancha, direccion)
+        return
+
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=GEOCODER_CONFIG['workers'],
+                                           thread_name_prefix='geocodificacion')
+    _executor.submit(_tarea, id_cancha, direccion)
+
+def esperar():
+    """Espera a que terminen las geocodificaciones encoladas (scripts y pruebas)"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+def distancia_km(lat1, lng1, lat2, lng2):
+    """Distancia en línea recta (fórmula de haversine)"""
+    d_lat = math.radians(lat2 - lat1)
+    d_lng = math.radians(lng2 - lng1)
+    a = (math.sin(d_lat / 2) ** 2 +
+         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(d_lng / 2) ** 2)
+    return 2 * RADIO_TIERRA_KM * math.asin(math.sqrt(a))
+
+def caja(lat, lng, radio_km):
+    """Rectángulo (lat_min, lat_max, lng_min, lng_max) que contiene el círculo del radio"""
+    d_lat = radio_km / KM_POR_GRADO_LAT
+    d_lng = radio_km / (KM_POR_GRADO_LAT * max(math.cos(math.radians(lat)), 0.01))
+    return lat - d_lat, lat + d_lat, lng - d_lng, lng + d_lng
+
+def canchas_cercanas(cur, lat, lng, radio_km=RADIO_DEFECTO_KM, limite=20):
+    """
+    Canchas dentro del radio ordenadas por distancia. El rectángulo se filtra en SQL
+    con el índice (lat, lng) y solo sus candidatas se miden con haversine.
+    """
+    lat_min, lat_max, lng_min, lng_max = caja(lat, lng, radio_km)
+    cur.execute("""
+        SELECT id_cancha, nombre, direccion, lat, lng
+        FROM canchas
+        WHERE lat BETWEEN ? AND ? AND lng BETWEEN ? AND ?
+        AND usuario_id IS NOT NULL
+    """, (lat_min, lat_max, lng_min, lng_max))
+
+    cercanas = []
+    for c in cur.fetchall():
+        distancia = distancia_km(lat, lng, c[3], c[4])
+        if distancia <= radio_km:
+            cercanas.append({
+                'id_cancha': c[0],
+                'nombre': c[1],
+                'direccion': c[2],
+                'lat': c[3],
+                'lng': c[4],
+                'distancia_km': round(distancia, 2)
+            })
+    cercanas.sort(key=lambda c: c['distancia_km'])
+    return cercanas[:limite]
+
+def geocodificar_pendientes(conn, limite=None):
+    """Resuelve las canchas con dirección y sin coordenadas; devuelve (ubicadas, pendientes)"""
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT id_cancha, direccion FROM canchas
+        WHERE lat IS NULL AND direccion IS NOT NULL AND direccion <> ''
+        ORDER BY id_cancha
+    """)
+    pendientes = cur.fetchall()
+    if limite:
+        pendientes = pendientes[:limite]
+
+    ubicadas = 0
+    for id_cancha, direccion in pendientes:
+        # El intervalo del proveedor lo respeta _consultar
+        lat, lng = coordenadas(cur, direccion)
+        if lat is not None:
+            cur.execute("UPDATE canchas SET lat = ?, lng = ? WHERE id_cancha = ?", (lat, lng, id_cancha))
+            ubicadas += 1
+        conn.commit()
+    return ubicadas, len(pendientes)
+
+if __name__ == "__main__":
+    from db import script_connection
+
+    print("🚀 Geocodificando canchas sin coordenadas...")
+    print("-" * 60)
+    conn = script_connection()
+    try:
+        ubicadas, total = geocodificar_pendientes(conn)
+        print(f"✅ {ubicadas} de {total} canchas ubicadas")
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error al geocodificar: {e}")
+    finally:
+        conn.close()
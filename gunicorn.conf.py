@@ -0,0 +1,20 @@
+"""
+Configuración de gunicorn (la carga sola al arrancar desde la carpeta del proyecto)
+Railway, nixpacks.toml y el Procfile arrancan con el mismo `gunicorn app:app`; lo que
+debe valer en todos va aquí y no en la línea de comandos.
+
+Las tareas de fondo de la aplicación se inician aquí, en cada worker ya creado, y no al
+importar app: los scripts que importan la aplicación (benchmark.py, revisar_planes.py...)
+no las arrancan.
+"""
+import os
+
+# Hilos por worker: cada stream del marcador en vivo ocupa uno mientras está abierto
+# (hasta MARCADOR_SSE_MAXIMO), el resto atiende las demás peticiones
+threads = int(os.getenv('GUNICORN_THREADS', '16'))
+
+def post_worker_init(worker):
+    import marcar_completadas
+
+    # Marcar como completadas las reservas cuya franja ya terminó (COMPLETADAS_INTERVALO)
+    marcar_completadas.iniciar_hilo()
@@ -0,0 +1,197 @@
+"""
+Procesamiento de las imágenes de las canchas.
+La imagen subida se guarda tal cual con un nombre derivado de su contenido y, fuera
+de la petición, se generan versiones reducidas (WebP y JPEG/PNG) para las tarjetas
+de los listados. Sus rutas quedan en canchas.imagen_variantes (JSON) y el catálogo
+las entrega a las plantillas; la original se sigue usando en las vistas de detalle.
+
+Pillow es opcional: sin él las imágenes se guardan igual y se sirve la original.
+Para generar las versiones de las canchas existentes (una sola vez, p. ej. tras
+restaurar la base o montar un disco nuevo; no forma parte del arranque):
+    python imagenes.py
+"""
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import IMAGE_CONFIG
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+# Relativas a static/ (igual que las rutas que se pasan a url_for)
+CARPETA_ORIGINALES = 'canchas_uploads'
+CARPETA_VARIANTES = 'canchas_uploads/variantes'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def huella(contenido):
+    """Primeros 16 caracteres del SHA-256 del contenido (nombre de archivo estable)"""
+    return hashlib.sha256(contenido).hexdigest()[:16]
+
+def ruta_static(ruta):
+    """Ruta guardada en imagen_url ('static/...' o relativa a static/) -> relativa a static/"""
+    ruta = ruta.strip()
+    return ruta.replace('static/', '', 1) if ruta.startswith('static/') else ruta
+
+def guardar_original(archivo, extension):
+    """
+    Guarda un archivo subido con nombre <huella>.<extensión>; si el mismo contenido ya
+    existe no se vuelve a escribir. Devuelve la ruta para imagen_url ('static/...').
+    """
+    contenido = archivo.read()
+    nombre = f"{huella(contenido)}.{extension}"
+    destino = os.path.join(STATIC_DIR, CARPETA_ORIGINALES, nombre)
+    if not os.path.exists(destino):
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        with open(destino, 'wb') as f:
+            f.write(contenido)
+    return f"static/{CARPETA_ORIGINALES}/{nombre}"
+
+def generar_variantes(imagen_url):
+    """
+    Crea las versiones reducidas de la primera imagen de imagen_url. Devuelve la lista
+    [{'ancho', 'webp', 'src'}] de menor a mayor (rutas relativas a static/) o None si
+    no hay Pillow, no hay imagen o no se pudo leer. Es idempotente: los archivos que
+    ya existen (mismo contenido y ancho) no se regeneran.
+    """
+    if Image is None or not imagen_url:
+        return None
+    original = ruta_static(imagen_url.split(',')[0])
+    ruta_original = os.path.join(STATIC_DIR, original)
+    if not original or not os.path.isfile(ruta_original):
+        return None
+
+    with open(ruta_original, 'rb') as f:
+        base = huella(f.read())
+    carpeta = os.path.join(STATIC_DIR, CARPETA_VARIANTES)
+    os.makedirs(carpeta, exist_ok=True)
+
+    with Image.open(ruta_original) as imagen:
+        imagen = ImageOps.exif_transpose(imagen)
+        con_alfa = imagen.mode in ('RGBA', 'LA') or 'transparency' in imagen.info
+        imagen = imagen.convert('RGBA' if con_alfa else 'RGB')
+        formato, extension = ('PNG', 'png') if con_alfa else ('JPEG', 'jpg')
+
+        # Si la original es más angosta que todos los anchos se genera una sola versión
+        anchos = [a for a in IMAGE_CONFIG['anchos'] if a < imagen.width] or [imagen.width]
+        variantes = []
+        for ancho in anchos:
+            webp = f"{CARPETA_VARIANTES}/{base}-{ancho}.webp"
+            src = f"{CARPETA_VARIANTES}/{base}-{ancho}.{extension}"
+            if not (os.path.exists(os.path.join(STATIC_DIR, webp)) and
+                    os.path.exists(os.path.join(STATIC_DIR, src))):
+                alto = max(1, round(imagen.height * ancho / imagen.width))
+                reducida = imagen.resize((ancho, alto), Image.LANCZOS)
+                reducida.save(os.path.join(STATIC_DIR, webp), 'WEBP', quality=IMAGE_CONFIG['calidad'], method=4)
+                if formato == 'JPEG':
+                    reducida.save(os.path.join(STATIC_DIR, src), formato, quality=IMAGE_CONFIG['calidad'], optimize=True, progressive=True)
+                else:
+                    reducida.save(os.path.join(STATIC_DIR, src), formato, optimize=True)
+            variantes.append({'ancho': ancho, 'webp': webp, 'src': src})
+    return variantes
+
+def procesar_cancha(conn, id_cancha, imagen_url):
+    """
+    Genera las versiones y las guarda en la cancha, solo si su imagen no cambió
+    mientras tanto. Devuelve True si la cancha se actualizó.
+    """
+    variantes = generar_variantes(imagen_url)
+    if variantes is None:
+        return False
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE canchas SET imagen_variantes = ?
+        WHERE id_cancha = ? AND imagen_url = ?
+    """, (json.dumps(variantes), id_cancha, imagen_url))
+    conn.commit()
+    return cur.rowcount > 0
+
+def _tarea(id_cancha, imagen_url):
+    # Import diferido: db importa Flask y este módulo también lo usan los scripts
+    from db import open_connection
+    import catalogo
+
+    conn = open_connection()
+    try:
+        if procesar_cancha(conn, id_cancha, imagen_url):
+            catalogo.invalidar(conn)
+    except Exception as e:
+        conn.rollback()
+        print(f"⚠️ Error procesando la imagen de la cancha {id_cancha}: {e}")
+    finally:
+        conn.close()
+
+def programar(id_cancha, imagen_url):
+    """
+    Encola la generación de versiones de la imagen (se llama después del commit que
+    guardó imagen_url). Con IMAGE_WORKERS=0 se hace en el mismo hilo.
+    """
+    if Image is None or not imagen_url:
+        return
+    if IMAGE_CONFIG['workers'] <= 0:
+        _tarea(id_cancha, imagen_url)
+        return
+
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=IMAGE_CONFIG['workers'],
+                                           thread_name_prefix='imagenes')
+    _executor.submit(_tarea, id_cancha, imagen_url)
+
+def esperar():
+    """Espera a que terminen las imágenes encoladas (scripts y pruebas)"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+def generar_todas(conn):
+    """
+    Genera (o comprueba) las versiones de todas las canchas con imagen; los archivos que
+    ya existen no se regeneran. Sirve también tras un despliegue en un disco vacío, donde
+    imagen_variantes apunta a archivos que aún no existen. Devuelve (procesadas, total).
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT id_cancha, imagen_url FROM canchas
+        WHERE imagen_url IS NOT NULL AND imagen_url <> ''
+        ORDER BY id_cancha
+    """)
+    canchas = cur.fetchall()
+    procesadas = 0
+    for id_cancha, imagen_url in canchas:
+        if procesar_cancha(conn, id_cancha, imagen_url):
+            procesadas += 1
+        else:
+            print(f"  ⚠️  Cancha {id_cancha}: no se encontró o no se pudo leer '{imagen_url}'")
+    if procesadas:
+        import catalogo
+        catalogo.invalidar(conn)
+    return procesadas, len(canchas)
+
+if __name__ == "__main__":
+    from db import script_connection
+
+    print("🚀 Generando versiones reducidas de las imágenes de canchas...")
+    print("-" * 60)
+    if Image is None:
+        print("❌ Pillow no está instalado (pip install Pillow)")
+        raise SystemExit(1)
+
+    conn = script_connection()
+    try:
+        procesadas, total = generar_todas(conn)
+        print(f"✅ {procesadas} de {total} canchas con versiones reducidas")
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error al procesar imágenes: {e}")
+    finally:
+        conn.close()
@@ -4,34 +4,35 @@ Ejecuta este archivo para crear la base de datos con todas las tablas y datos
 """
 import sqlite3
 import os
+from db import ConnectionWrapper
+from migraciones import aplicar, SQL_SQLITE
 
-# Ruta de la base de datos
-DB_PATH = 'usuariosdb.db'
-SQL_FILE = 'usuariosdb.sql'
+# Ruta de la base de datos (la misma que usan los scripts, junto a este archivo)
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'usuariosdb.db')
+SQL_FILE = SQL_SQLITE
 
 def init_database():
-    """Crea la base de datos SQLite3 desde el archivo SQL"""
+    """Crea la base de datos SQLite3 desde el archivo SQL y aplica las migraciones pendientes"""
     
     # Verificar si el archivo SQL existe
     if not os.path.exists(SQL_FILE):
         print(f"❌ Error: No se encontró el archivo {SQL_FILE}")
         return False
     
+    # La migración 1 ejecuta usuariosdb.sql en una base nueva; las demás actualizan
+    # las bases creadas con versiones anteriores del esquema
+    # (siempre sobre el SQLite local, aunque haya DATABASE_URL en el entorno)
+    conn = ConnectionWrapper(sqlite3.connect(DB_PATH), 'sqlite')
+    try:
+        if not aplicar(conn):
+            return False
+    finally:
+        conn.close()
+    
     try:
-        # Conectar a la base de datos (se crea si no existe)
         conn = sqlite3.connect(DB_PATH)
         cursor = conn.cursor()
         
-        # Leer el archivo SQL
-        with open(SQL_FILE, 'r', encoding='utf-8') as f:
-            sql_script = f.read()
-        
-        # Ejecutar el script SQL
-        cursor.executescript(sql_script)
-        
-        # Confirmar cambios
-        conn.commit()
-        
         # Verificar que las tablas se crearon
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
         tables = cursor.fetchall()
@@ -0,0 +1,199 @@
+"""
+Instrumentación de las consultas SQL.
+UnifiedCursor avisa aquí de cada sentencia (execute y los fetch que le siguen, porque
+SQLite ejecuta buena parte de la consulta al leer las filas). Durante una petición se
+guarda la lista de sentencias en g y, al terminar, se agrega por ruta y por texto SQL
+normalizado (literales y parámetros reemplazados por ?), de modo que las rutas que
+hacen muchas consultas pequeñas (N+1) salen a la vista.
+
+- Sentencias más lentas que DB_SLOW_QUERY_MS: se registran en el logger campofinder.sql
+  con su texto normalizado, dentro o fuera de una petición.
+- Cabecera Server-Timing (db;dur=...;desc="N consultas") en cada respuesta, o solo en las
+  de administradores con DB_SERVER_TIMING=admin (el valor por defecto en producción).
+- /admin/api/metricas devuelve el resumen por ruta y las sentencias más costosas.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
+from flask import Blueprint, g, has_request_context, request
+from flask_login import current_user
+from config import DB_METRICS_CONFIG
+
+logger = logging.getLogger('campofinder.sql')
+
+instrumentacion = Blueprint('instrumentacion', __name__)
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAMETRO = re.compile(r"%s|\$\d+")
+_LISTA = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ESPACIOS = re.compile(r"\s+")
+
+_lock = threading.Lock()
+_rutas = {}        # endpoint -> acumulados de sus peticiones
+_sentencias = {}   # texto normalizado -> llamadas y tiempo
+_lentas = 0
+# Mientras se ejecuta capturar(): texto SQL exacto -> [parámetros de la primera vez, llamadas, rutas]
+_captura = None
+
+@lru_cache(maxsize=1024)
+def normalizar(query):
+    """Texto SQL sin valores concretos: 'WHERE id = 5 AND x IN (?, ?)' -> 'WHERE id = ? AND x IN (...)'"""
+    texto = _LITERAL.sub('?', query)
+    texto = _NUMERO.sub('?', texto)
+    texto = _PARAMETRO.sub('?', texto)
+    texto = _ESPACIOS.sub(' ', texto).strip()
+    return _LISTA.sub('(...)', texto)
+
+def _registrar_lenta(texto, segundos):
+    global _lentas
+    with _lock:
+        _lentas += 1
+    ruta = request.endpoint if has_request_context() else None
+    logger.warning("🐢 Consulta lenta (%.1f ms%s): %s", segundos * 1000,
+                   f" en {ruta}" if ruta else '', texto)
+
+def registrar(query, segundos, params=None):
+    """
+    Anota una sentencia ejecutada; devuelve la entrada [texto, segundos] para que los
+    fetch posteriores le sumen su tiempo (None si la instrumentación está desactivada)
+    """
+    if _captura is not None:
+        capturada = _captura.setdefault(query, [params, 0, set()])
+        capturada[1] += 1
+        capturada[2].add(request.endpoint if has_request_context() else None)
+    if not DB_METRICS_CONFIG['activo']:
+        return None
+    entrada = [normalizar(query), segundos]
+    peticion = g.get('_consultas') if has_request_context() else None
+    if peticion is not None:
+        peticion.append(entrada)
+    if segundos * 1000 >= DB_METRICS_CONFIG['lenta_ms']:
+        _registrar_lenta(entrada[0], segundos)
+    return entrada
+
+def sumar(entrada, segundos):
+    """Suma a una sentencia el tiempo de leer sus filas"""
+    if entrada is None:
+        return
+    umbral = DB_METRICS_CONFIG['lenta_ms']
+    antes = entrada[1] * 1000
+    entrada[1] += segundos
+    # Solo se avisa una vez: cuando la suma cruza el umbral
+    if antes < umbral <= entrada[1] * 1000:
+        _registrar_lenta(entrada[0], entrada[1])
+
+@instrumentacion.before_app_request
+def _iniciar_peticion():
+    if DB_METRICS_CONFIG['activo']:
+        g._consultas = []
+        g._consultas_inicio = time.perf_counter()
+
+def _acumular(ruta, consultas, tiempo, repeticion):
+    veces = repeticion[1]
+    with _lock:
+        datos = _rutas.setdefault(ruta, {
+            'peticiones': 0, 'consultas': 0, 'consultas_max': 0,
+            'tiempo_db_ms': 0.0, 'tiempo_db_max_ms': 0.0, 'posibles_n_mas_1': 0
+        })
+        datos['peticiones'] += 1
+        datos['consultas'] += len(consultas)
+        datos['consultas_max'] = max(datos['consultas_max'], len(consultas))
+        datos['tiempo_db_ms'] += tiempo * 1000
+        datos['tiempo_db_max_ms'] = max(datos['tiempo_db_max_ms'], tiempo * 1000)
+        if veces >= DB_METRICS_CONFIG['repeticiones']:
+            datos['posibles_n_mas_1'] += 1
+
+        for texto, segundos in consultas:
+            sentencia = _sentencias.get(texto)
+            if sentencia is None:
+                # Límite de textos distintos para que SQL dinámico no haga crecer la memoria
+                if len(_sentencias) >= DB_METRICS_CONFIG['sentencias_max']:
+                    continue
+                sentencia = _sentencias[texto] = {'llamadas': 0, 'tiempo_ms': 0.0, 'max_ms': 0.0}
+            sentencia['llamadas'] += 1
+            sentencia['tiempo_ms'] += segundos * 1000
+            sentencia['max_ms'] = max(sentencia['max_ms'], segundos * 1000)
+
+def _con_server_timing():
+    modo = DB_METRICS_CONFIG['server_timing']
+    if modo == 'admin':
+        return current_user.is_authenticated and current_user.is_admin()
+    return modo in ('1', 'true', 'yes')
+
+@instrumentacion.after_app_request
+def _cerrar_peticion(response):
+    consultas = g.pop('_consultas', None)
+    if consultas is None:
+        return response
+    duracion = time.perf_counter() - g.pop('_consultas_inicio')
+    tiempo = sum(segundos for _, segundos in consultas)
+    ruta = request.endpoint or 'desconocida'
+
+    repeticion = Counter(texto for texto, _ in consultas).most_common(1)
+    repeticion = repeticion[0] if repeticion else ('', 0)
+    if repeticion[1] >= DB_METRICS_CONFIG['repeticiones']:
+        logger.warning("🔁 Posible N+1 en %s: %d veces %s", ruta, repeticion[1], repeticion[0])
+    _acumular(ruta, consultas, tiempo, repeticion)
+
+    if _con_server_timing():
+        response.headers.add('Server-Timing', f'db;dur={tiempo * 1000:.1f};desc="{len(consultas)} consultas"')
+        response.headers.add('Server-Timing', f'app;dur={duracion * 1000:.1f}')
+    return response
+
+@contextmanager
+def capturar():
+    """
+    Guarda el texto exacto y los parámetros de cada sentencia distinta ejecutada dentro
+    del bloque (revisar_planes.py los pasa por EXPLAIN); pensado para un solo hilo
+    """
+    global _captura
+    _captura = {}
+    try:
+        yield _captura
+    finally:
+        _captura = None
+
+def peticion_actual():
+    """(consultas, segundos en la BD) de la petición en curso, o None fuera de una petición"""
+    consultas = g.get('_consultas') if has_request_context() else None
+    if consultas is None:
+        return None
+    return len(consultas), sum(segundos for _, segundos in consultas)
+
+def metricas(top=20):
+    """Resumen por ruta (promedios y máximos) y las `top` sentencias con más tiempo total"""
+    with _lock:
+        rutas = {ruta: dict(datos) for ruta, datos in _rutas.items()}
+        sentencias = [dict(datos, sql=texto) for texto, datos in _sentencias.items()]
+        lentas = _lentas
+
+    for datos in rutas.values():
+        datos['consultas_promedio'] = round(datos['consultas'] / datos['peticiones'], 2)
+        datos['tiempo_db_promedio_ms'] = round(datos['tiempo_db_ms'] / datos['peticiones'], 2)
+        datos['tiempo_db_ms'] = round(datos['tiempo_db_ms'], 2)
+        datos['tiempo_db_max_ms'] = round(datos['tiempo_db_max_ms'], 2)
+    sentencias.sort(key=lambda s: s['tiempo_ms'], reverse=True)
+    for datos in sentencias:
+        datos['promedio_ms'] = round(datos['tiempo_ms'] / datos['llamadas'], 3)
+        datos['tiempo_ms'] = round(datos['tiempo_ms'], 2)
+        datos['max_ms'] = round(datos['max_ms'], 2)
+
+    return {
+        'rutas': dict(sorted(rutas.items(), key=lambda r: r[1]['tiempo_db_ms'], reverse=True)),
+        'sentencias': sentencias[:top],
+        'consultas_lentas': lentas,
+        'umbral_lenta_ms': DB_METRICS_CONFIG['lenta_ms']
+    }
+
+def reiniciar():
+    """Borra los acumulados (p. ej. entre corridas de un benchmark)"""
+    global _lentas
+    with _lock:
+        _rutas.clear()
+        _sentencias.clear()
+        _lentas = 0
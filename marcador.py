@@ -0,0 +1,217 @@
+"""
+Marcador en vivo de los partidos (Server-Sent Events).
+El dueño actualiza el marcador desde la página del partido; la página agrupa los clics
+de un instante en un solo lote que se guarda con un único UPDATE (actualizar()). Cada
+cambio se publica una sola vez y la central de este proceso lo reparte a todos los que
+están viendo esa reserva sin consultar la base de datos por cada espectador.
+
+Solo hay streams mientras el partido está en vivo: desde que el dueño abre la página del
+partido o guarda un lote, hasta MARCADOR_EN_VIVO segundos después del último cambio. Cada
+stream ocupa un hilo de gunicorn, así que además hay un máximo por proceso
+(MARCADOR_SSE_MAXIMO); por encima de él los espectadores consultan el marcador cada tanto.
+
+La publicación pasa por un broker. BrokerLocal entrega directamente a la central del
+mismo proceso (sirve con un solo worker de gunicorn con varios hilos). Para varios
+workers se reemplaza con usar_broker() por uno que reenvíe entre procesos (Redis,
+LISTEN/NOTIFY de PostgreSQL...) y llame a central.entregar() al recibir cada mensaje.
+"""
+import json
+import queue
+import threading
+import time
+from cache import TTLCache
+from config import MARCADOR_CONFIG
+
+CAMPOS = ('goles_equipo1', 'goles_equipo2', 'tarjetas_amarillas', 'tarjetas_rojas')
+# Límites de un lote: goles y tarjetas nunca bajan de 0
+MAXIMO_VALOR = 999
+MAXIMO_INCREMENTO = 50
+
+# (id_dueño, id_reserva) ya verificados: durante el partido no se repite la verificación
+_partidos_verificados = TTLCache(maxsize=4096, ttl=MARCADOR_CONFIG['sesion_partido'])
+# id_reserva de los partidos en vivo (ver marcar_en_vivo())
+_en_vivo = TTLCache(maxsize=4096, ttl=MARCADOR_CONFIG['en_vivo'])
+
+class LoteInvalido(ValueError):
+    """El lote de cambios tiene campos desconocidos o valores fuera de rango"""
+
+class Suscripcion:
+    """Cola de mensajes de un espectador; si no la vacía a tiempo se descarta"""
+    def __init__(self, id_reserva):
+        self.id_reserva = id_reserva
+        self.cola = queue.Queue(maxsize=MARCADOR_CONFIG['cola_maxima'])
+        self.desbordada = False
+
+class CentralMarcadores:
+    """Reparte los mensajes de cada reserva a sus suscripciones en este proceso"""
+    def __init__(self):
+        self._suscripciones = {}
+        self._lock = threading.Lock()
+
+    def suscribir(self, id_reserva):
+        suscripcion = Suscripcion(id_reserva)
+        with self._lock:
+            self._suscripciones.setdefault(id_reserva, set()).add(suscripcion)
+        return suscripcion
+
+    def cancelar(self, suscripcion):
+        with self._lock:
+            suscripciones = self._suscripciones.get(suscripcion.id_reserva)
+            if suscripciones is not None:
+                suscripciones.discard(suscripcion)
+                if not suscripciones:
+                    del self._suscripciones[suscripcion.id_reserva]
+
+    def entregar(self, id_reserva, mensaje):
+        with self._lock:
+            suscripciones = list(self._suscripciones.get(id_reserva, ()))
+        for suscripcion in suscripciones:
+            try:
+                suscripcion.cola.put_nowait(mensaje)
+            except queue.Full:
+                # Espectador que no lee: se corta su stream y el navegador se reconecta
+                suscripcion.desbordada = True
+        return len(suscripciones)
+
+    def espectadores(self, id_reserva):
+        with self._lock:
+            return len(self._suscripciones.get(id_reserva, ()))
+
+    def total(self):
+        """Streams abiertos en este proceso"""
+        with self._lock:
+            return sum(len(suscripciones) for suscripciones in self._suscripciones.values())
+
+class BrokerLocal:
+    """Sustituto local del broker entre workers: entrega a la central del mismo proceso"""
+    def __init__(self, central):
+        self.central = central
+
+    def publicar(self, id_reserva, mensaje):
+        self.central.entregar(id_reserva, mensaje)
+
+central = CentralMarcadores()
+_broker = BrokerLocal(central)
+
+def usar_broker(broker):
+    """Reemplaza el broker (p. ej. uno que reenvíe entre workers)"""
+    global _broker
+    _broker = broker
+
+def publicar(id_reserva, cambios):
+    """Publica los campos del marcador que cambiaron (se llama después del commit)"""
+    datos = {campo: valor for campo, valor in cambios.items() if campo in CAMPOS}
+    marcar_en_vivo(id_reserva)
+    if datos:
+        # Se serializa una vez y el mismo texto se reparte a todos los espectadores
+        _broker.publicar(id_reserva, _evento('marcador', datos))
+
+def marcar_en_vivo(id_reserva):
+    """El dueño está llevando el partido: sigue en vivo MARCADOR_EN_VIVO segundos más"""
+    _en_vivo.set(id_reserva, True)
+
+def en_vivo(id_reserva):
+    return _en_vivo.get(id_reserva) is not None
+
+def hay_lugar():
+    """Si se puede abrir otro stream sin pasar de MARCADOR_SSE_MAXIMO"""
+    return central.total() < MARCADOR_CONFIG['maximo_streams']
+
+def validar_lote(incrementos, valores):
+    """Normaliza {campo: entero} de incrementos y valores absolutos; lanza LoteInvalido"""
+    lote = []
+    for cambios, minimo, maximo in ((incrementos, -MAXIMO_INCREMENTO, MAXIMO_INCREMENTO),
+                                    (valores, 0, MAXIMO_VALOR)):
+        if not isinstance(cambios, dict):
+            raise LoteInvalido('Formato de lote inválido')
+        normalizados = {}
+        for campo, valor in cambios.items():
+            if campo not in CAMPOS:
+                raise LoteInvalido(f'Campo inválido: {campo}')
+            if isinstance(valor, bool) or not isinstance(valor, int):
+                raise LoteInvalido(f'Valor inválido para {campo}')
+            if not minimo <= valor <= maximo:
+                raise LoteInvalido(f'Valor fuera de rango para {campo}')
+            normalizados[campo] = valor
+        lote.append(normalizados)
+    if not lote[0] and not lote[1]:
+        raise LoteInvalido('El lote está vacío')
+    return lote[0], lote[1]
+
+def actualizar(cur, id_reserva, id_dueno, incrementos, valores):
+    """
+    Aplica un lote de cambios al marcador en una sola sentencia y devuelve el marcador
+    resultante, o None si la reserva no existe o no es de una cancha del dueño.
+    Un valor absoluto se aplica antes que el incremento del mismo campo. La pertenencia
+    se comprueba dentro del mismo UPDATE la primera vez y luego se recuerda.
+    """
+    asignaciones = []
+    params = []
+    for campo in CAMPOS:
+        if campo in valores:
+            asignaciones.append(f"{campo} = ?")
+            params.append(max(0, valores[campo] + incrementos.get(campo, 0)))
+        elif campo in incrementos:
+            asignaciones.append(f"{campo} = CASE WHEN COALESCE({campo}, 0) + ? < 0 THEN 0 ELSE COALESCE({campo}, 0) + ? END")
+            params.extend([incrementos[campo], incrementos[campo]])
+
+    clave = (id_dueno, id_reserva)
+    condicion = "id_reserva = ?"
+    params.append(id_reserva)
+    verificado = _partidos_verificados.get(clave) is not None
+    if not verificado:
+        condicion += " AND id_cancha IN (SELECT id_cancha FROM canchas WHERE usuario_id = ?)"
+        params.append(id_dueno)
+
+    cur.execute(f"""
+        UPDATE reservas SET {', '.join(asignaciones)}
+        WHERE {condicion}
+        RETURNING {', '.join(CAMPOS)}
+    """, params)
+    fila = cur.fetchone()
+    if fila is None:
+        _partidos_verificados.delete(clave)
+        return None
+    if not verificado:
+        _partidos_verificados.set(clave, True)
+    return {campo: fila[i] or 0 for i, campo in enumerate(CAMPOS)}
+
+def recordar_partido(id_dueno, id_reserva):
+    """Marca la reserva como ya verificada para el dueño (al abrir la página del partido)"""
+    _partidos_verificados.set((id_dueno, id_reserva), True)
+
+def suscribir(id_reserva):
+    return central.suscribir(id_reserva)
+
+def cancelar(suscripcion):
+    central.cancelar(suscripcion)
+
+def _evento(nombre, datos):
+    return f"event: {nombre}\ndata: {json.dumps(datos)}\n\n"
+
+def eventos(suscripcion, inicial):
+    """
+    Stream SSE de una suscripción: primero el marcador completo y luego cada cambio.
+    Envía un comentario cada MARCADOR_SSE_LATIDO segundos para mantener viva la conexión
+    y termina a los MARCADOR_SSE_DURACION segundos (EventSource se reconecta solo), así
+    un espectador no ocupa un hilo del servidor indefinidamente. Cuando el partido deja de
+    estar en vivo envía el evento 'fin' (la página cierra el EventSource y no se reconecta).
+    """
+    latido = MARCADOR_CONFIG['latido']
+    fin = time.monotonic() + MARCADOR_CONFIG['duracion']
+    try:
+        yield f"retry: {MARCADOR_CONFIG['reintento_ms']}\n"
+        yield _evento('marcador', inicial)
+        while not suscripcion.desbordada:
+            restante = fin - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                yield suscripcion.cola.get(timeout=min(latido, restante))
+            except queue.Empty:
+                if not en_vivo(suscripcion.id_reserva):
+                    yield _evento('fin', {})
+                    break
+                yield ": latido\n\n"
+    finally:
+        cancelar(suscripcion)
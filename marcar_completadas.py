@@ -1,142 +1,171 @@
 """
 Script para marcar automáticamente las reservas como completadas
-cuando su fecha y hora ya han pasado.
+cuando su franja horaria ya terminó (fecha anterior a hoy, o de hoy con la
+franja de 1 hora ya cumplida).
 Soporta tanto SQLite (desarrollo) como PostgreSQL (producción)
+
+Cada lote es un único UPDATE ... RETURNING sobre el índice parcial de reservas
+pendientes (idx_reservas_pendientes) y suma las completadas a las estadísticas
+mensuales en la misma transacción.
+
+    python marcar_completadas.py            # una pasada
+    python marcar_completadas.py --cada 300 # modo programador: una pasada cada 5 minutos
+
+La aplicación también puede hacerlo en un hilo de fondo (COMPLETADAS_INTERVALO).
 """
-import os
+import argparse
 import sys
-from datetime import datetime, timedelta
+import threading
+import time
+from collections import Counter
+from datetime import datetime
 from dotenv import load_dotenv
+import estadisticas
+from config import COMPLETADAS_CONFIG
+from disponibilidad import ahora_local
 
 # Cargar variables de entorno
 load_dotenv()
 
-def marcar_completadas():
-    """Marca las reservas pendientes como completadas si su fecha/hora ya pasó"""
-    
-    database_url = os.getenv('DATABASE_URL')
-    
-    # Determinar si usar PostgreSQL o SQLite
-    usar_postgres = database_url and database_url.strip()
-    
-    if usar_postgres:
-        # Usar PostgreSQL
-        import psycopg2
-        from psycopg2.extras import RealDictCursor
-        
-        database_url = database_url.strip()
-        if database_url.startswith('postgres://'):
-            database_url = database_url.replace('postgres://', 'postgresql://', 1)
-        
-        try:
-            conn = psycopg2.connect(database_url)
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            print("🔗 Conectado a PostgreSQL")
-        except Exception as e:
-            print(f"❌ Error al conectar a PostgreSQL: {e}")
-            return False
-    else:
-        # Usar SQLite
-        import sqlite3
-        
-        db_path = os.path.join(os.path.dirname(__file__), 'usuariosdb.db')
-        if not os.path.exists(db_path):
-            print(f"❌ Base de datos SQLite no encontrada: {db_path}")
-            return False
-        
+# Métricas del proceso (modo programador o hilo de la aplicación)
+metricas = {
+    'ejecuciones': 0,
+    'errores': 0,
+    'filas_total': 0,
+    'ultimas_filas': 0,
+    'ultimos_lotes': 0,
+    'ultima_duracion_ms': 0.0,
+    'ultima_ejecucion': None
+}
+_metricas_lock = threading.Lock()
+
+def _lote(cur, db_type, fecha, hora, tamano):
+    # Se repite estado = 'pendiente' fuera de la subconsulta para que PostgreSQL lo
+    # vuelva a comprobar si otra ejecución completó la fila mientras esperaba su bloqueo
+    bloqueo = "FOR UPDATE SKIP LOCKED" if db_type == 'postgresql' else ""
+    cur.execute(f"""
+        UPDATE reservas
+        SET estado = 'completada'
+        WHERE estado = 'pendiente'
+        AND id_reserva IN (
+            SELECT id_reserva FROM reservas
+            WHERE estado = 'pendiente'
+            AND fecha <= ?
+            AND (fecha < ? OR slot < ?)
+            LIMIT ?
+            {bloqueo}
+        )
+        RETURNING id_cancha, fecha
+    """, (fecha, fecha, hora, tamano))
+    return cur.fetchall()
+
+def marcar_completadas(conn, ahora=None, tamano_lote=None):
+    """
+    Completa las reservas cuya franja ya terminó, en lotes de tamano_lote filas
+    (cada lote en su propia transacción). Devuelve (filas, lotes).
+    `ahora` es la hora local de las reservas (por defecto la actual en APP_TZ).
+    """
+    ahora = ahora or ahora_local()
+    tamano_lote = tamano_lote or COMPLETADAS_CONFIG['lote']
+    # La franja N dura de N:00 a N+1:00: a las 18:xx ya terminó la de las 17
+    fecha, hora = ahora.date().isoformat(), ahora.hour
+
+    filas = 0
+    lotes = 0
+    cur = conn.cursor()
+    while True:
         try:
-            conn = sqlite3.connect(db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            print("🔗 Conectado a SQLite")
-        except Exception as e:
-            print(f"❌ Error al conectar a SQLite: {e}")
-            return False
-    
+            completadas = _lote(cur, conn.db_type, fecha, hora, tamano_lote)
+            # Sumar las completadas a las estadísticas mensuales (misma transacción que el UPDATE)
+            por_mes = Counter((id_cancha, estadisticas.mes_de(f)) for id_cancha, f in completadas if id_cancha is not None)
+            for (id_cancha, mes), cantidad in por_mes.items():
+                estadisticas.registrar_movimiento(cur, id_cancha, mes, completadas=cantidad)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        filas += len(completadas)
+        lotes += 1
+        if len(completadas) < tamano_lote:
+            return filas, lotes
+
+def ejecutar(conn, ahora=None):
+    """Una pasada con métricas; los errores se registran y no detienen al programador"""
+    inicio = time.perf_counter()
     try:
-        # Obtener fecha y hora actual
-        ahora = datetime.now()
-        fecha_actual = ahora.date()
-        hora_actual = ahora.time()
-        
-        print(f"📅 Fecha/Hora actual: {ahora.strftime('%Y-%m-%d %H:%M:%S')}")
-        
-        # Buscar reservas pendientes cuya fecha ya pasó
-        if usar_postgres:
-            cursor.execute("""
-                SELECT id_reserva, cancha, fecha, horario, estado
-                FROM reservas
-                WHERE estado = 'pendiente' 
-                AND fecha < %s
-            """, (fecha_actual,))
-        else:
-            cursor.execute("""
-                SELECT id_reserva, cancha, fecha, horario, estado
-                FROM reservas
-                WHERE estado = 'pendiente' 
-                AND fecha < date('now')
-            """)
-        
-        reservas_pasadas = cursor.fetchall()
-        
-        if not reservas_pasadas:
-            print("✅ No hay reservas pendientes para marcar como completadas")
-            cursor.close()
-            conn.close()
-            return True
-        
-        print(f"🔄 Encontradas {len(reservas_pasadas)} reservas para actualizar:")
-        
-        # Actualizar cada reserva
-        ids_actualizados = []
-        for reserva in reservas_pasadas:
-            id_reserva = reserva['id_reserva'] if usar_postgres else reserva[0]
-            cancha = reserva['cancha'] if usar_postgres else reserva[1]
-            fecha = reserva['fecha'] if usar_postgres else reserva[2]
-            horario = reserva['horario'] if usar_postgres else reserva[3]
-            
-            print(f"  • ID {id_reserva}: {cancha} - {fecha} {horario}")
-            ids_actualizados.append(id_reserva)
-        
-        # Actualizar todas las reservas en una sola consulta
-        if usar_postgres:
-            cursor.execute("""
-                UPDATE reservas 
-                SET estado = 'completada'
-                WHERE estado = 'pendiente' 
-                AND fecha < %s
-            """, (fecha_actual,))
-        else:
-            cursor.execute("""
-                UPDATE reservas 
-                SET estado = 'completada'
-                WHERE estado = 'pendiente' 
-                AND fecha < date('now')
-            """)
-        
-        conn.commit()
-        
-        print(f"✅ {len(ids_actualizados)} reservas marcadas como completadas")
-        
-        cursor.close()
-        conn.close()
-        
-        return True
-        
+        filas, lotes = marcar_completadas(conn, ahora)
     except Exception as e:
+        with _metricas_lock:
+            metricas['errores'] += 1
         print(f"❌ Error al actualizar reservas: {e}")
-        if conn:
-            conn.rollback()
+        return None
+    duracion = (time.perf_counter() - inicio) * 1000
+    with _metricas_lock:
+        metricas['ejecuciones'] += 1
+        metricas['filas_total'] += filas
+        metricas['ultimas_filas'] = filas
+        metricas['ultimos_lotes'] = lotes
+        metricas['ultima_duracion_ms'] = round(duracion, 1)
+        metricas['ultima_ejecucion'] = datetime.now().isoformat(timespec='seconds')
+    if filas:
+        print(f"✅ {filas} reservas marcadas como completadas ({lotes} lotes, {duracion:.0f} ms)")
+    return filas
+
+def _programador(abrir_conexion, intervalo, detener):
+    while True:
+        conn = abrir_conexion()
+        try:
+            ejecutar(conn)
+        finally:
             conn.close()
-        return False
+        if detener.wait(intervalo):
+            return
+
+def iniciar_hilo(intervalo=None):
+    """
+    Ejecuta las pasadas en un hilo de fondo de la aplicación cada `intervalo` segundos.
+    Devuelve el Event que lo detiene (o None si está desactivado).
+    """
+    from db import open_connection
+
+    intervalo = COMPLETADAS_CONFIG['intervalo'] if intervalo is None else intervalo
+    if intervalo <= 0:
+        return None
+    detener = threading.Event()
+    threading.Thread(target=_programador, args=(open_connection, intervalo, detener),
+                     name='marcar_completadas', daemon=True).start()
+    return detener
 
 if __name__ == "__main__":
+    from db import script_connection
+
+    parser = argparse.ArgumentParser(description='Marca como completadas las reservas cuya franja ya terminó')
+    parser.add_argument('--cada', type=int, default=0, metavar='SEGUNDOS',
+                        help='modo programador: repetir cada N segundos')
+    args = parser.parse_args()
+
     print("🚀 Iniciando actualización de estados de reservas...")
     print("-" * 60)
-    
-    if marcar_completadas():
-        print("\n✅ Proceso completado exitosamente")
+
+    if args.cada > 0:
+        print(f"⏱️  Modo programador: una pasada cada {args.cada} segundos (Ctrl+C para salir)")
+        try:
+            _programador(script_connection, args.cada, threading.Event())
+        except KeyboardInterrupt:
+            print(f"\n📊 {metricas['ejecuciones']} pasadas, {metricas['filas_total']} reservas completadas, "
+                  f"{metricas['errores']} errores")
         sys.exit(0)
-    else:
+
+    conn = script_connection()
+    try:
+        filas = ejecutar(conn)
+    finally:
+        conn.close()
+
+    if filas is None:
         print("\n❌ Proceso completado con errores")
         sys.exit(1)
+    if filas == 0:
+        print("✅ No hay reservas pendientes para marcar como completadas")
+    print("\n✅ Proceso completado exitosamente")
+    sys.exit(0)
@@ -0,0 +1,773 @@
+"""
+Migraciones del esquema con versión (SQLite en desarrollo y PostgreSQL en producción).
+Cada migración es una función numerada registrada con @migracion; la tabla
+schema_migrations guarda las que ya se aplicaron y solo se ejecutan las pendientes, en
+orden. Si no hay ninguna pendiente, el arranque cuesta una sola consulta.
+
+    python migraciones.py            # aplica las pendientes
+    python migraciones.py --estado   # lista aplicadas y pendientes
+
+Para cambiar el esquema se agrega una función nueva al final con el siguiente número
+(nunca se edita una que ya se aplicó). Por defecto cada migración corre en una
+transacción junto con su registro en schema_migrations. Las que crean índices con
+m.crear_indice() o rellenan tablas grandes por lotes se declaran con transaccion=False:
+en PostgreSQL corren en autocommit (CREATE INDEX CONCURRENTLY no bloquea las
+escrituras) y deben poder re-ejecutarse si fallan a la mitad.
+
+Las migraciones 2 a 10 reemplazan a los antiguos migrate_*.py; son idempotentes, así
+que en una base que ya los tenía aplicados solo se registran.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from werkzeug.security import generate_password_hash
+
+load_dotenv()
+
+SQL_SQLITE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'usuariosdb.sql')
+# Clave del pg_advisory_lock que evita que dos procesos migren a la vez
+LOCK_MIGRACIONES = 7315001
+
+# Filas actualizadas por transacción durante los rellenos
+BATCH_SIZE = 5000
+
+Migracion = namedtuple('Migracion', 'version nombre funcion transaccion')
+MIGRACIONES = []
+
+def migracion(version, transaccion=True):
+    """Registra una migración con su número de versión (el nombre es el de la función)"""
+    def registrar(funcion):
+        if any(m.version == version for m in MIGRACIONES):
+            raise ValueError(f"Versión de migración repetida: {version}")
+        MIGRACIONES.append(Migracion(version, funcion.__name__, funcion, transaccion))
+        MIGRACIONES.sort(key=lambda m: m.version)
+        return funcion
+    return registrar
+
+class Migrador:
+    """Conexión y utilidades que recibe cada migración"""
+    def __init__(self, conn):
+        self.conn = conn
+        self.db_type = conn.db_type
+        self.postgres = conn.db_type == 'postgresql'
+        self.cur = conn.cursor()
+        # True mientras corre una migración transaccional: el commit lo hace el runner
+        self.en_transaccion = False
+
+    def tipo(self, postgres, sqlite):
+        return postgres if self.postgres else sqlite
+
+    def commit(self):
+        if not self.en_transaccion:
+            self.conn.commit()
+
+    @contextmanager
+    def transaccion(self):
+        """Paso atómico dentro de una migración con transaccion=False"""
+        if self.en_transaccion:
+            yield
+            return
+        self.conn.commit()
+        # En autocommit (PostgreSQL) la transacción se abre a mano; en SQLite IMMEDIATE
+        # toma el bloqueo de escritura desde el principio
+        self.cur.execute("BEGIN" if self.postgres else "BEGIN IMMEDIATE")
+        try:
+            yield
+        except Exception:
+            if self.postgres:
+                self.cur.execute("ROLLBACK")
+            else:
+                self.conn.rollback()
+            raise
+        if self.postgres:
+            self.cur.execute("COMMIT")
+        else:
+            self.conn.commit()
+
+    def tabla_existe(self, tabla):
+        if self.postgres:
+            self.cur.execute("SELECT to_regclass(?) IS NOT NULL", (tabla,))
+            return bool(self.cur.fetchone()[0])
+        self.cur.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ?", (tabla,))
+        return self.cur.fetchone()[0] > 0
+
+    def columnas(self, tabla):
+        if self.postgres:
+            self.cur.execute("""
+                SELECT column_name FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = ?
+            """, (tabla,))
+            return {fila[0] for fila in self.cur.fetchall()}
+        self.cur.execute(f"PRAGMA table_info({tabla})")
+        return {fila[1] for fila in self.cur.fetchall()}
+
+    def agregar_columnas(self, tabla, columnas):
+        """Agrega las columnas [(nombre, definición)] que falten en la tabla"""
+        existentes = self.columnas(tabla)
+        for nombre, definicion in columnas:
+            if nombre in existentes:
+                print(f"  ℹ️  Columna '{tabla}.{nombre}' ya existe")
+            else:
+                self.cur.execute(f"ALTER TABLE {tabla} ADD COLUMN {nombre} {definicion}")
+                print(f"  ✅ Columna '{tabla}.{nombre}' agregada")
+        self.commit()
+
+    def crear_indice(self, nombre, tabla, columnas, unico=False, donde=None, metodo=None):
+        """
+        Crea el índice si no existe; en PostgreSQL con CONCURRENTLY (solo en migraciones
+        con transaccion=False) y con el método indicado (p. ej. gin). Un índice que quedó
+        inválido por un CONCURRENTLY interrumpido se elimina y se vuelve a crear.
+        """
+        concurrently = ''
+        if self.postgres:
+            if self.en_transaccion:
+                raise RuntimeError("crear_indice() requiere una migración con transaccion=False")
+            concurrently = 'CONCURRENTLY '
+            self.cur.execute("""
+                SELECT i.indisvalid FROM pg_class c
+                JOIN pg_index i ON i.indexrelid = c.oid
+                WHERE c.relname = ? AND c.relnamespace = current_schema()::regnamespace
+            """, (nombre,))
+            fila = self.cur.fetchone()
+            if fila is not None and not fila[0]:
+                self.cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {nombre}")
+                print(f"  ⚠️  Índice inválido '{nombre}' eliminado para recrearlo")
+        unique = 'UNIQUE ' if unico else ''
+        where = f" WHERE {donde}" if donde else ''
+        using = f" USING {metodo}" if metodo and self.postgres else ''
+        self.cur.execute(f"CREATE {unique}INDEX {concurrently}IF NOT EXISTS {nombre} ON {tabla}{using}({columnas}){where}")
+        self.commit()
+        print(f"  ✅ Índice '{nombre}' listo")
+
+    def eliminar_indice(self, nombre):
+        concurrently = 'CONCURRENTLY ' if self.postgres and not self.en_transaccion else ''
+        self.cur.execute(f"DROP INDEX {concurrently}IF EXISTS {nombre}")
+        self.commit()
+
+# ---------------------------------------------------------------------------
+# Migraciones
+# ---------------------------------------------------------------------------
+
+ESQUEMA_POSTGRES = """
+-- Tabla: usuarios
+CREATE TABLE IF NOT EXISTS usuarios (
+    id SERIAL PRIMARY KEY,
+    nombre VARCHAR(255) NOT NULL,
+    correo VARCHAR(255) NOT NULL UNIQUE,
+    edad INTEGER NOT NULL,
+    contraseña VARCHAR(255) NOT NULL,
+    direccion TEXT DEFAULT NULL,
+    rol VARCHAR(50) NOT NULL DEFAULT 'usuario'
+);
+
+-- Tabla: canchas
+CREATE TABLE IF NOT EXISTS canchas (
+    id_cancha SERIAL PRIMARY KEY,
+    nombre VARCHAR(255) NOT NULL,
+    precio VARCHAR(50) DEFAULT NULL,
+    precio_num NUMERIC(12, 2) DEFAULT NULL,
+    lat DOUBLE PRECISION DEFAULT NULL,
+    lng DOUBLE PRECISION DEFAULT NULL,
+    imagen_variantes TEXT DEFAULT NULL,
+    descripcion TEXT DEFAULT NULL,
+    imagen_url TEXT DEFAULT NULL,
+    tiempo_uso INTEGER DEFAULT 0,
+    cronometro_inicio TIMESTAMP DEFAULT NULL,
+    direccion TEXT DEFAULT NULL,
+    usuario_id INTEGER NOT NULL,
+    FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE CASCADE
+);
+
+-- Tabla: favoritos
+CREATE TABLE IF NOT EXISTS favoritos (
+    id_favorito SERIAL PRIMARY KEY,
+    id_usuario INTEGER NOT NULL,
+    cancha VARCHAR(255) NOT NULL,
+    id_cancha INTEGER DEFAULT NULL,
+    fecha_agregado TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (id_usuario) REFERENCES usuarios(id) ON DELETE CASCADE,
+    FOREIGN KEY (id_cancha) REFERENCES canchas(id_cancha) ON DELETE CASCADE
+);
+
+-- Tabla: horarios_canchas
+CREATE TABLE IF NOT EXISTS horarios_canchas (
+    id_horario SERIAL PRIMARY KEY,
+    id_cancha INTEGER NOT NULL,
+    hora_inicio TIME NOT NULL,
+    hora_fin TIME NOT NULL,
+    disponible BOOLEAN DEFAULT TRUE,
+    FOREIGN KEY (id_cancha) REFERENCES canchas(id_cancha) ON DELETE CASCADE
+);
+
+-- Tabla: reservas
+CREATE TABLE IF NOT EXISTS reservas (
+    id_reserva SERIAL PRIMARY KEY,
+    id_usuario INTEGER NOT NULL,
+    cancha VARCHAR(255) NOT NULL,
+    id_cancha INTEGER DEFAULT NULL,
+    horario VARCHAR(100) NOT NULL,
+    slot INTEGER DEFAULT NULL,
+    fecha DATE NOT NULL,
+    numero VARCHAR(50),
+    mensaje TEXT,
+    goles_equipo1 INTEGER DEFAULT 0,
+    goles_equipo2 INTEGER DEFAULT 0,
+    tarjetas_amarillas INTEGER DEFAULT 0,
+    tarjetas_rojas INTEGER DEFAULT 0,
+    estado VARCHAR(20) DEFAULT 'pendiente',
+    id_dueno INTEGER DEFAULT NULL,
+    precio NUMERIC(12, 2) DEFAULT NULL,
+    FOREIGN KEY (id_usuario) REFERENCES usuarios(id) ON DELETE CASCADE,
+    FOREIGN KEY (id_cancha) REFERENCES canchas(id_cancha) ON DELETE CASCADE
+);
+
+-- Contadores de versión de datos cacheados (catálogo de canchas)
+CREATE TABLE IF NOT EXISTS versiones_datos (
+    nombre VARCHAR(50) PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_usuarios_correo ON usuarios(correo);
+CREATE INDEX IF NOT EXISTS idx_usuarios_rol ON usuarios(rol);
+CREATE INDEX IF NOT EXISTS idx_canchas_usuario ON canchas(usuario_id);
+CREATE INDEX IF NOT EXISTS idx_favoritos_usuario ON favoritos(id_usuario);
+CREATE INDEX IF NOT EXISTS idx_horarios_canchas_cancha ON horarios_canchas(id_cancha);
+"""
+
+@migracion(1)
+def esquema_inicial(m):
+    """Tablas base y administrador por defecto (en SQLite, usuariosdb.sql con sus datos)"""
+    if not m.postgres:
+        if m.tabla_existe('usuarios'):
+            # Bases de antes de noviembre de 2025 (antiguos migrations/*.sql)
+            if 'direccion' not in m.columnas('usuarios'):
+                m.agregar_columnas('usuarios', [('direccion', 'TEXT DEFAULT NULL')])
+            if 'admin_id' in m.columnas('canchas'):
+                m.cur.execute("ALTER TABLE canchas RENAME COLUMN admin_id TO usuario_id")
+                print("  ✅ Columna 'canchas.admin_id' renombrada a 'usuario_id'")
+            if 'direccion' not in m.columnas('canchas'):
+                m.agregar_columnas('canchas', [('direccion', 'TEXT DEFAULT NULL')])
+            m.cur.execute("""
+                CREATE TABLE IF NOT EXISTS versiones_datos (
+                    nombre TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            print("  ℹ️  Esquema SQLite ya creado")
+            return
+        with open(SQL_SQLITE, 'r', encoding='utf-8') as f:
+            m.conn.conn.executescript(f.read())
+        print("  ✅ Esquema y datos iniciales de usuariosdb.sql")
+        return
+
+    m.cur.execute(ESQUEMA_POSTGRES)
+    m.cur.execute("""
+        INSERT INTO usuarios (nombre, correo, edad, contraseña, direccion, rol)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (correo) DO NOTHING
+    """, ('Administrador Principal', 'admin@gmail.com', 30, generate_password_hash('admin123'),
+          'Oficina Central', 'administrador'))
+    if m.cur.rowcount:
+        print("  ✅ Usuario administrador creado: admin@gmail.com / admin123")
+    print("  ✅ Tablas base listas")
+
+@migracion(2, transaccion=False)
+def reservas_marcador(m):
+    """Goles, tarjetas y estado de las reservas"""
+    m.agregar_columnas('reservas', [
+        ('goles_equipo1', 'INTEGER DEFAULT 0'),
+        ('goles_equipo2', 'INTEGER DEFAULT 0'),
+        ('tarjetas_amarillas', 'INTEGER DEFAULT 0'),
+        ('tarjetas_rojas', 'INTEGER DEFAULT 0'),
+        ('estado', m.tipo("VARCHAR(20) DEFAULT 'pendiente'", "TEXT DEFAULT 'pendiente'"))
+    ])
+    m.crear_indice('idx_reservas_estado', 'reservas', 'estado')
+
+@migracion(3, transaccion=False)
+def reservas_favoritos_id_cancha(m):
+    """
+    Reservas y favoritos referencian la cancha por id_cancha en lugar de por su nombre
+    (texto libre, sin índice y que se rompe al renombrar la cancha)
+    """
+    for tabla, pk in (('reservas', 'id_reserva'), ('favoritos', 'id_favorito')):
+        # Columna nullable: agregarla no reescribe la tabla
+        m.agregar_columnas(tabla, [
+            ('id_cancha', 'INTEGER DEFAULT NULL REFERENCES canchas(id_cancha) ON DELETE CASCADE')
+        ])
+
+        # Relleno en lotes pequeños para no bloquear la tabla; con nombres repetidos
+        # se usa la cancha más antigua
+        total = 0
+        while True:
+            m.cur.execute(f"""
+                UPDATE {tabla}
+                SET id_cancha = (SELECT MIN(c.id_cancha) FROM canchas c WHERE c.nombre = {tabla}.cancha)
+                WHERE {pk} IN (
+                    SELECT t.{pk} FROM {tabla} t
+                    WHERE t.id_cancha IS NULL
+                    AND EXISTS (SELECT 1 FROM canchas c WHERE c.nombre = t.cancha)
+                    LIMIT ?
+                )
+            """, (BATCH_SIZE,))
+            m.commit()
+            if m.cur.rowcount <= 0:
+                break
+            total += m.cur.rowcount
+        print(f"  ✅ {tabla}: {total} registros enlazados a su cancha")
+
+        m.cur.execute(f"SELECT COUNT(*) FROM {tabla} WHERE id_cancha IS NULL")
+        huerfanas = m.cur.fetchone()[0]
+        if huerfanas:
+            print(f"  ⚠️  {tabla}: {huerfanas} registros sin cancha existente con ese nombre")
+
+    m.crear_indice('idx_favoritos_cancha', 'favoritos', 'id_cancha')
+    m.crear_indice('idx_favoritos_usuario_cancha', 'favoritos', 'id_usuario, id_cancha')
+
+@migracion(4, transaccion=False)
+def reservas_franjas(m):
+    """
+    Franja horaria de cada reserva (slot = hora de inicio 0-23) y el índice único
+    (id_cancha, fecha, slot) que impide las reservas dobles
+    """
+    m.agregar_columnas('reservas', [('slot', 'INTEGER DEFAULT NULL')])
+
+    # Solo horarios con formato 'HH:...' se pueden convertir a franja
+    formato_valido = m.tipo("horario ~ '^[0-9]{2}:'", "horario GLOB '[0-9][0-9]:*'")
+    total = 0
+    while True:
+        m.cur.execute(f"""
+            UPDATE reservas
+            SET slot = CAST(substr(horario, 1, 2) AS INTEGER)
+            WHERE id_reserva IN (
+                SELECT id_reserva FROM reservas
+                WHERE slot IS NULL AND {formato_valido}
+                LIMIT ?
+            )
+        """, (BATCH_SIZE,))
+        m.commit()
+        if m.cur.rowcount <= 0:
+            break
+        total += m.cur.rowcount
+    print(f"  ✅ {total} reservas con franja asignada")
+
+    # Reservas dobles ya existentes: se conserva la más antigua y las demás quedan sin
+    # franja (NULL no choca con el índice único) para poder crearlo
+    m.cur.execute("""
+        UPDATE reservas
+        SET slot = NULL
+        WHERE slot IS NOT NULL
+        AND EXISTS (
+            SELECT 1 FROM reservas o
+            WHERE o.id_cancha = reservas.id_cancha
+            AND o.fecha = reservas.fecha
+            AND o.slot = reservas.slot
+            AND o.id_reserva < reservas.id_reserva
+        )
+    """)
+    duplicadas = m.cur.rowcount
+    m.commit()
+    if duplicadas > 0:
+        print(f"  ⚠️  {duplicadas} reservas dobles anteriores quedaron sin franja")
+
+    m.crear_indice('idx_reservas_slot_unico', 'reservas', 'id_cancha, fecha, slot', unico=True)
+    # (id_cancha, fecha) queda cubierto por el prefijo del índice único
+    m.eliminar_indice('idx_reservas_cancha_fecha')
+
+@migracion(5, transaccion=False)
+def canchas_precio_num(m):
+    """Precio numérico de las canchas, interpretado una sola vez desde el texto de precio"""
+    from estadisticas import precio_numerico
+
+    m.agregar_columnas('canchas', [('precio_num', 'NUMERIC(12, 2) DEFAULT NULL')])
+
+    # Recorrido por id para no repetir las filas cuyo precio no se puede interpretar
+    ultimo_id = 0
+    actualizadas = 0
+    invalidas = []
+    while True:
+        m.cur.execute("""
+            SELECT id_cancha, precio FROM canchas
+            WHERE id_cancha > ? AND precio_num IS NULL
+            ORDER BY id_cancha
+            LIMIT ?
+        """, (ultimo_id, BATCH_SIZE))
+        filas = m.cur.fetchall()
+        if not filas:
+            break
+        for id_cancha, precio in filas:
+            valor = precio_numerico(precio)
+            if valor is None:
+                invalidas.append(id_cancha)
+                continue
+            m.cur.execute("UPDATE canchas SET precio_num = ? WHERE id_cancha = ?", (valor, id_cancha))
+            actualizadas += 1
+        m.commit()
+        ultimo_id = filas[-1][0]
+
+    print(f"  ✅ {actualizadas} canchas con precio numérico")
+    if invalidas:
+        print(f"  ⚠️  Precio no interpretable en las canchas: {invalidas}")
+
+    m.crear_indice('idx_canchas_precio_num', 'canchas', 'precio_num')
+
+@migracion(6, transaccion=False)
+def reservas_paginacion(m):
+    """
+    Índices que terminan en (fecha, horario, id_reserva), el orden de los listados, para
+    que cada página sea un recorrido acotado del índice
+    """
+    # Mis reservas (usuario) por pestaña
+    m.crear_indice('idx_reservas_usuario_orden', 'reservas', 'id_usuario, estado, fecha, horario, id_reserva')
+    # Reservas de las canchas del dueño por pestaña
+    m.crear_indice('idx_reservas_cancha_orden', 'reservas', 'id_cancha, estado, fecha, horario, id_reserva')
+    # Listado general del admin
+    m.crear_indice('idx_reservas_orden', 'reservas', 'fecha, horario, id_reserva')
+
+    # Quedan cubiertos por el prefijo de los índices nuevos
+    for nombre in ('idx_reservas_usuario', 'idx_reservas_fecha'):
+        m.eliminar_indice(nombre)
+
+def _reconstruir_estadisticas(m, ingresos):
+    """
+    Vuelve a calcular estadisticas_mensuales desde reservas con el SQL de la versión del
+    esquema de cada migración (no con estadisticas.recalcular, que asume el esquema actual).
+    ingresos: expresión de los ingresos de cada grupo (r = reservas, c = canchas).
+    """
+    m.cur.execute("DELETE FROM estadisticas_mensuales")
+    m.cur.execute(f"""
+        INSERT INTO estadisticas_mensuales (id_cancha, mes, usuario_id, reservas, completadas, ingresos)
+        SELECT r.id_cancha, substr(CAST(r.fecha AS TEXT), 1, 7), c.usuario_id,
+               COUNT(*),
+               SUM(CASE WHEN r.estado = 'completada' THEN 1 ELSE 0 END),
+               {ingresos}
+        FROM reservas r
+        JOIN canchas c ON r.id_cancha = c.id_cancha
+        GROUP BY r.id_cancha, substr(CAST(r.fecha AS TEXT), 1, 7), c.usuario_id, c.precio_num
+    """)
+    return m.cur.rowcount
+
+@migracion(7)
+def estadisticas_mensuales(m):
+    """Reservas e ingresos por cancha y mes, calculados desde las reservas existentes"""
+    m.cur.execute("""
+        CREATE TABLE IF NOT EXISTS estadisticas_mensuales (
+            id_cancha INTEGER NOT NULL,
+            mes VARCHAR(7) NOT NULL,
+            usuario_id INTEGER NOT NULL,
+            reservas INTEGER NOT NULL DEFAULT 0,
+            completadas INTEGER NOT NULL DEFAULT 0,
+            ingresos NUMERIC(14, 2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (id_cancha, mes),
+            FOREIGN KEY (id_cancha) REFERENCES canchas(id_cancha) ON DELETE CASCADE
+        )
+    """)
+    m.cur.execute("CREATE INDEX IF NOT EXISTS idx_estadisticas_usuario_mes ON estadisticas_mensuales(usuario_id, mes)")
+    m.cur.execute("SELECT EXISTS(SELECT 1 FROM estadisticas_mensuales)")
+    if m.cur.fetchone()[0]:
+        print("  ℹ️  Estadísticas mensuales ya calculadas")
+        return
+    # En esta versión los ingresos salen del precio actual de la cancha
+    grupos = _reconstruir_estadisticas(m, "COUNT(*) * COALESCE(c.precio_num, 0)")
+    print(f"  ✅ Estadísticas mensuales calculadas ({grupos} meses-cancha)")
+
+@migracion(8, transaccion=False)
+def canchas_coordenadas(m):
+    """
+    Coordenadas de las canchas, resultados de geocodificación por dirección y el índice
+    de la búsqueda de canchas cercanas
+    """
+    tipo_real = m.tipo('DOUBLE PRECISION', 'REAL')
+    m.agregar_columnas('canchas', [('lat', f'{tipo_real} DEFAULT NULL'), ('lng', f'{tipo_real} DEFAULT NULL')])
+    m.cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS geocodificaciones (
+            direccion VARCHAR(255) PRIMARY KEY,
+            lat {tipo_real},
+            lng {tipo_real}
+        )
+    """)
+    m.commit()
+    print("  ✅ Tabla 'geocodificaciones' lista")
+    m.crear_indice('idx_canchas_lat_lng', 'canchas', 'lat, lng')
+
+    m.cur.execute("SELECT COUNT(*) FROM canchas WHERE lat IS NULL AND direccion IS NOT NULL AND direccion <> ''")
+    pendientes = m.cur.fetchone()[0]
+    if pendientes:
+        print(f"  ⚠️  {pendientes} canchas sin coordenadas: ejecuta 'python geocodificacion.py'")
+
+@migracion(9)
+def canchas_imagen_variantes(m):
+    """Rutas de las versiones reducidas de la imagen de cada cancha (JSON)"""
+    m.agregar_columnas('canchas', [('imagen_variantes', 'TEXT DEFAULT NULL')])
+
+@migracion(10, transaccion=False)
+def reservas_pendientes(m):
+    """Índice parcial de reservas pendientes para marcar_completadas.py"""
+    m.crear_indice('idx_reservas_pendientes', 'reservas', 'fecha, slot', donde="estado = 'pendiente'")
+
+@migracion(11)
+def sin_trigger_registrar_admin(m):
+    """
+    El trigger registrar_admin de SQLite insertaba en la tabla administradores, que ya no
+    existe: SQLite lo compila en cada INSERT INTO usuarios y todos fallaban
+    """
+    if not m.postgres:
+        m.cur.execute("DROP TRIGGER IF EXISTS registrar_admin")
+
+@migracion(12, transaccion=False)
+def indices_duenos_y_horarios(m):
+    """
+    Índices que revisar_planes.py encontró faltantes: canchas por dueño y usuarios por rol
+    (solo existían en el esquema de PostgreSQL) y los horarios de cada cancha
+    """
+    m.crear_indice('idx_canchas_usuario', 'canchas', 'usuario_id')
+    m.crear_indice('idx_usuarios_rol', 'usuarios', 'rol')
+    m.crear_indice('idx_horarios_canchas_cancha', 'horarios_canchas', 'id_cancha')
+
+@migracion(13, transaccion=False)
+def canchas_busqueda(m):
+    """Índice de texto completo de nombre, dirección y descripción de las canchas (busqueda.py)"""
+    import busqueda
+
+    if m.postgres:
+        m.crear_indice('idx_canchas_busqueda', 'canchas', f"({busqueda.DOCUMENTO_POSTGRES})", metodo='gin')
+        return
+
+    for sentencia in busqueda.FTS_SQLITE:
+        m.cur.execute(sentencia)
+    # Indexa las canchas que ya existían (los triggers solo ven los cambios nuevos)
+    m.cur.execute("INSERT INTO canchas_fts (canchas_fts) VALUES ('rebuild')")
+    m.commit()
+    print("  ✅ Tabla 'canchas_fts' lista")
+
+@migracion(14, transaccion=False)
+def reservas_dueno(m):
+    """
+    Dueño de la cancha copiado en cada reserva (id_dueno) y su índice por pestaña: el
+    listado del dueño recorre (id_dueno, estado, fecha, horario, id_reserva) en orden en
+    lugar de juntar y ordenar el historial de todas sus canchas en cada página
+    """
+    m.agregar_columnas('reservas', [('id_dueno', 'INTEGER DEFAULT NULL')])
+
+    # Relleno por rangos de la clave primaria: cada lote es una búsqueda acotada y no
+    # vuelve a recorrer las filas ya completadas (ni las de canchas sin dueño)
+    m.cur.execute("SELECT MAX(id_reserva) FROM reservas")
+    maximo = m.cur.fetchone()[0] or 0
+    total = 0
+    for desde in range(0, maximo, BATCH_SIZE):
+        m.cur.execute("""
+            UPDATE reservas
+            SET id_dueno = (SELECT c.usuario_id FROM canchas c WHERE c.id_cancha = reservas.id_cancha)
+            WHERE id_reserva > ? AND id_reserva <= ? AND id_dueno IS NULL AND id_cancha IS NOT NULL
+        """, (desde, desde + BATCH_SIZE))
+        m.commit()
+        total += max(m.cur.rowcount, 0)
+    print(f"  ✅ {total} reservas con su dueño")
+
+    m.crear_indice('idx_reservas_dueno_orden', 'reservas', 'id_dueno, estado, fecha, horario, id_reserva')
+
+@migracion(15, transaccion=False)
+def reservas_precio(m):
+    """
+    Precio de la cancha copiado en cada reserva al crearla: las estadísticas suman y
+    restan ese valor, así cambiar el precio de la cancha no altera los ingresos ya
+    registrados ni descuadra las cancelaciones
+    """
+    m.agregar_columnas('reservas', [('precio', 'NUMERIC(12, 2) DEFAULT NULL')])
+
+    # Las reservas existentes toman el precio actual de su cancha (el único conocido)
+    m.cur.execute("SELECT MAX(id_reserva) FROM reservas")
+    maximo = m.cur.fetchone()[0] or 0
+    total = 0
+    for desde in range(0, maximo, BATCH_SIZE):
+        m.cur.execute("""
+            UPDATE reservas
+            SET precio = (SELECT c.precio_num FROM canchas c WHERE c.id_cancha = reservas.id_cancha)
+            WHERE id_reserva > ? AND id_reserva <= ? AND precio IS NULL AND id_cancha IS NOT NULL
+        """, (desde, desde + BATCH_SIZE))
+        m.commit()
+        total += max(m.cur.rowcount, 0)
+    print(f"  ✅ {total} reservas con su precio")
+
+    # Los ingresos acumulados pudieron sumar y restar precios distintos: se reconstruyen en
+    # una transacción con la tabla bloqueada, así los movimientos de los workers en marcha
+    # esperan y se suman después sobre las filas nuevas
+    with m.transaccion():
+        if m.postgres:
+            m.cur.execute("LOCK TABLE estadisticas_mensuales IN SHARE ROW EXCLUSIVE MODE")
+        grupos = _reconstruir_estadisticas(m, "SUM(COALESCE(r.precio, 0))")
+    print(f"  ✅ {grupos} meses-cancha recalculados con el precio de cada reserva")
+
+@migracion(16, transaccion=False)
+def canchas_precio_coma_decimal(m):
+    """
+    Vuelve a interpretar los precios con coma ('120.000,50' se guardaba como 120.0005 y
+    '120,5' como 1205) y corrige con ellos el precio de las reservas de esas canchas
+    """
+    from estadisticas import precio_numerico
+
+    corregidas, invalidas = 0, []
+    ultimo_id = 0
+    while True:
+        m.cur.execute("""
+            SELECT id_cancha, precio, precio_num FROM canchas
+            WHERE id_cancha > ? AND precio LIKE '%,%'
+            ORDER BY id_cancha
+            LIMIT ?
+        """, (ultimo_id, BATCH_SIZE))
+        filas = m.cur.fetchall()
+        if not filas:
+            break
+        for id_cancha, precio, anterior in filas:
+            valor = precio_numerico(precio)
+            if valor is None:
+                invalidas.append(id_cancha)
+            if valor is None and anterior is None:
+                continue
+            if valor is not None and anterior is not None and abs(float(anterior) - valor) < 0.005:
+                continue
+            with m.transaccion():
+                m.cur.execute("UPDATE canchas SET precio_num = ? WHERE id_cancha = ?", (valor, id_cancha))
+                if valor is not None and anterior is not None:
+                    m.cur.execute("UPDATE reservas SET precio = ? WHERE id_cancha = ? AND precio = ?",
+                                  (valor, id_cancha, anterior))
+            corregidas += 1
+        ultimo_id = filas[-1][0]
+
+    print(f"  ✅ {corregidas} canchas con el precio corregido")
+    if invalidas:
+        print(f"  ⚠️  Precio ambiguo (queda sin precio numérico hasta que el dueño lo edite): {invalidas}")
+    if corregidas:
+        with m.transaccion():
+            if m.postgres:
+                m.cur.execute("LOCK TABLE estadisticas_mensuales IN SHARE ROW EXCLUSIVE MODE")
+            grupos = _reconstruir_estadisticas(m, "SUM(COALESCE(r.precio, 0))")
+        print(f"  ✅ {grupos} meses-cancha recalculados")
+
+# ---------------------------------------------------------------------------
+# Ejecución
+# ---------------------------------------------------------------------------
+
+def _crear_tabla_versiones(m):
+    m.cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            nombre VARCHAR(100) NOT NULL,
+            aplicada_en {m.tipo('TIMESTAMP', 'DATETIME')} DEFAULT CURRENT_TIMESTAMP,
+            duracion_ms INTEGER
+        )
+    """)
+    m.commit()
+
+def _aplicadas(conn):
+    """Versiones ya aplicadas (una consulta), o None si schema_migrations no existe"""
+    # Cursor sin envolver: que la tabla no exista es normal en la primera ejecución
+    cur = conn.conn.cursor()
+    try:
+        cur.execute("SELECT version FROM schema_migrations")
+        return {fila[0] for fila in cur.fetchall()}
+    except Exception:
+        conn.rollback()
+        return None
+    finally:
+        cur.close()
+
+def _aplicar(m, migracion_):
+    inicio = time.perf_counter()
+    # psycopg2 no permite cambiar autocommit con una transacción abierta
+    m.conn.commit()
+    if m.postgres:
+        m.conn.conn.autocommit = not migracion_.transaccion
+    elif migracion_.transaccion:
+        # sqlite3 no abre transacción antes del DDL: se abre a mano para que sea atómica
+        m.cur.execute("BEGIN")
+    m.en_transaccion = migracion_.transaccion
+    try:
+        migracion_.funcion(m)
+        duracion = int((time.perf_counter() - inicio) * 1000)
+        m.cur.execute("INSERT INTO schema_migrations (version, nombre, duracion_ms) VALUES (?, ?, ?)",
+                      (migracion_.version, migracion_.nombre, duracion))
+        m.conn.commit()
+    except Exception:
+        m.conn.rollback()
+        raise
+    finally:
+        if m.postgres:
+            m.conn.conn.autocommit = False
+        m.en_transaccion = False
+    return duracion
+
+def aplicar(conn=None):
+    """Aplica las migraciones pendientes; devuelve True si el esquema quedó al día"""
+    from db import script_connection
+
+    propia = conn is None
+    conn = conn or script_connection()
+    try:
+        aplicadas = _aplicadas(conn)
+        if aplicadas is not None and all(mg.version in aplicadas for mg in MIGRACIONES):
+            print(f"✅ Esquema al día (versión {MIGRACIONES[-1].version})")
+            return True
+
+        m = Migrador(conn)
+        if m.postgres:
+            # Otro proceso que arranque a la vez espera aquí y luego ve todo aplicado; el
+            # bloqueo se toma antes del DDL para que dos réplicas no creen la tabla a la vez
+            m.cur.execute("SELECT pg_advisory_lock(?)", (LOCK_MIGRACIONES,))
+            m.commit()
+        try:
+            _crear_tabla_versiones(m)
+            aplicadas = _aplicadas(conn) or set()
+            for migracion_ in MIGRACIONES:
+                if migracion_.version in aplicadas:
+                    continue
+                print(f"🔄 Migración {migracion_.version:03d} {migracion_.nombre}...")
+                duracion = _aplicar(m, migracion_)
+                print(f"✅ Migración {migracion_.version:03d} aplicada ({duracion} ms)")
+        finally:
+            if m.postgres:
+                # Una transacción abortada no dejaría liberar el bloqueo
+                m.conn.rollback()
+                m.cur.execute("SELECT pg_advisory_unlock(?)", (LOCK_MIGRACIONES,))
+                m.commit()
+        return True
+
+    except Exception as e:
+        print(f"❌ Error en la migración: {e}")
+        return False
+    finally:
+        if propia:
+            conn.close()
+
+def estado(conn):
+    """[(version, nombre, aplicada_en o None)] de todas las migraciones registradas"""
+    aplicadas = {}
+    if _aplicadas(conn) is not None:
+        cur = conn.cursor()
+        cur.execute("SELECT version, aplicada_en FROM schema_migrations")
+        aplicadas = {fila[0]: fila[1] for fila in cur.fetchall()}
+    return [(mg.version, mg.nombre, aplicadas.get(mg.version)) for mg in MIGRACIONES]
+
+if __name__ == "__main__":
+    from db import script_connection
+
+    parser = argparse.ArgumentParser(description='Aplica las migraciones pendientes del esquema')
+    parser.add_argument('--estado', action='store_true', help='solo listar aplicadas y pendientes')
+    args = parser.parse_args()
+
+    if args.estado:
+        conn = script_connection()
+        try:
+            for version, nombre, aplicada_en in estado(conn):
+                marca = f"✅ {aplicada_en}" if aplicada_en else "⏳ pendiente"
+                print(f"  {version:03d} {nombre:<32} {marca}")
+        finally:
+            conn.close()
+        sys.exit(0)
+
+    print("🚀 Ejecutando migraciones...")
+    print("-" * 60)
+    sys.exit(0 if aplicar() else 1)
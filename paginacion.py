@@ -0,0 +1,63 @@
+"""
+Paginación por clave (keyset) de los listados de reservas.
+En vez de OFFSET, cada página continúa después de la última fila mostrada según
+(fecha, horario, id_reserva), así el costo de cada página no crece con el historial.
+El cursor que viaja al cliente es esa tupla codificada en base64.
+"""
+import base64
+import json
+
+# Tamaño de página por defecto y máximo aceptado en ?por_pagina=
+POR_PAGINA_DEFECTO = 20
+POR_PAGINA_MAXIMO = 100
+
+# Orden común de todos los listados (más recientes primero); id_reserva desempata
+ORDEN_RESERVAS = "ORDER BY r.fecha DESC, r.horario DESC, r.id_reserva DESC"
+
+def por_pagina(valor):
+    """Tamaño de página pedido por el cliente, acotado a [1, POR_PAGINA_MAXIMO]"""
+    try:
+        tamano = int(valor)
+    except (TypeError, ValueError):
+        return POR_PAGINA_DEFECTO
+    return max(1, min(tamano, POR_PAGINA_MAXIMO))
+
+def codificar_cursor(fila):
+    """Cursor opaco a partir de la última fila de la página"""
+    clave = [str(fila['fecha']), fila['horario'], fila['id_reserva']]
+    return base64.urlsafe_b64encode(json.dumps(clave).encode('utf-8')).decode('ascii')
+
+def decodificar_cursor(cursor):
+    """(fecha, horario, id_reserva) del cursor; None si no hay cursor o no es válido"""
+    if not cursor:
+        return None
+    try:
+        fecha, horario, id_reserva = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return str(fecha), str(horario), int(id_reserva)
+    except (ValueError, TypeError, UnicodeError):
+        return None
+
+def pagina_reservas(cur, consulta, condiciones, params, cursor=None, tamano=POR_PAGINA_DEFECTO):
+    """
+    Ejecuta `consulta` (SELECT ... FROM reservas r ... sin WHERE) filtrada por
+    `condiciones` y devuelve (filas, siguiente_cursor). Las filas deben incluir
+    r.id_reserva, r.fecha y r.horario. Se pide una fila de más para saber si hay
+    otra página sin tener que contar.
+    """
+    condiciones = list(condiciones)
+    params = tuple(params)
+    clave = decodificar_cursor(cursor)
+    if clave:
+        # Comparación de tuplas: aprovecha el índice (..., fecha, horario, id_reserva)
+        condiciones.append("(r.fecha, r.horario, r.id_reserva) < (?, ?, ?)")
+        params += clave
+    if condiciones:
+        consulta += " WHERE " + " AND ".join(condiciones)
+
+    cur.execute(f"{consulta} {ORDEN_RESERVAS} LIMIT ?", params + (tamano + 1,))
+    filas = cur.fetchall()
+
+    if len(filas) > tamano:
+        filas = filas[:tamano]
+        return filas, codificar_cursor(filas[-1])
+    return filas, None
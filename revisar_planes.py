@@ -0,0 +1,457 @@
+"""
+Revisión de los planes de ejecución de las consultas de la aplicación
+
+Recorre las páginas y APIs de app.py y admin/admin_usuarios.py con el cliente de pruebas
+de Flask (como jugador, dueño y administrador de los datos de datos_sinteticos.py),
+captura a través de UnifiedCursor cada sentencia distinta con los parámetros reales y
+la pasa por EXPLAIN QUERY PLAN (SQLite) o EXPLAIN (FORMAT JSON) (PostgreSQL).
+
+- Falla si una consulta de las rutas de jugadores o dueños (las de más tráfico) recorre
+  completa una tabla grande (SCAN sin índice / Seq Scan) u ordena en memoria tantas filas
+  como una tabla grande (aunque salgan de una búsqueda por índice).
+- Avisa de los recorridos completos de las rutas del administrador y de los recorridos
+  completos de un índice sin LIMIT.
+- Para cada recorrido sugiere un índice con las columnas del WHERE, del JOIN y del ORDER BY.
+
+    python datos_sinteticos.py --usuarios 100000 --canchas 2000 --reservas 2000000
+    python revisar_planes.py                        # sintetico.db, código 1 si algo falla
+    python revisar_planes.py --umbral-filas 50000 --todas
+
+Las rutas que escriben (reservar, favoritos, cancelar) se ejecutan de verdad.
+"""
+import argparse
+import json
+import os
+import re
+from collections import defaultdict
+from datetime import date, timedelta
+
+# Tablas con al menos tantas filas se consideran grandes
+UMBRAL_FILAS = 10000
+# Las rutas del administrador tienen poco tráfico: sus recorridos completos solo se avisan
+PREFIJO_ADMIN = 'admin_usuarios.'
+# Recorridos completos intencionales (fragmento del SQL normalizado -> motivo): se avisan sin fallar
+PERMITIDAS = {
+    'FROM canchas c LEFT JOIN horarios_canchas h ON c.id_cancha = h.id_cancha WHERE c.usuario_id IS NOT NULL':
+        'catálogo completo de catalogo.py: se carga una vez y queda en memoria hasta que cambia una cancha',
+}
+EXPLICABLES = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT')
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_TABLA = re.compile(r"\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+_NO_ALIAS = {'ON', 'WHERE', 'JOIN', 'LEFT', 'RIGHT', 'INNER', 'OUTER', 'CROSS', 'ORDER', 'GROUP',
+             'LIMIT', 'SET', 'USING', 'VALUES', 'AS', 'HAVING', 'UNION', 'RETURNING'}
+_COMPARACION = re.compile(r"(?:\b(\w+)\.)?\b(\w+)\s*(=|<>|!=|<=|>=|<|>|\bIN\b|\bBETWEEN\b|\bIS\b)(\s*\w+\.\w+)?",
+                          re.IGNORECASE)
+_DERECHA = re.compile(r"=\s*(\w+)\.(\w+)")
+_ORDEN = re.compile(r"\bORDER\s+BY\s+(.+?)(?:\bLIMIT\b|\bOFFSET\b|\bFOR\b|\)|$)", re.IGNORECASE | re.DOTALL)
+# ORDER BY ... [LIMIT ? [OFFSET ?]] final de la consulta (fuera de subconsultas)
+_ORDEN_FINAL = re.compile(r"\bORDER\s+BY\b[^()]*$", re.IGNORECASE)
+# Las tablas virtuales (FTS5) con MATCH aparecen como SCAN pero consultan su propio índice
+_SCAN_SQLITE = re.compile(r"^SCAN (\w+)\b(?! VIRTUAL TABLE)(?: USING (COVERING )?INDEX (\w+))?")
+
+# ---------------------------------------------------------------------------
+# Recorrido de la aplicación
+# ---------------------------------------------------------------------------
+
+def _contexto(cur):
+    """Usuarios, canchas y reservas con los que se recorren las rutas"""
+    from benchmark import _contexto as contexto_benchmark
+
+    contexto = contexto_benchmark(cur)
+    cur.execute("SELECT correo FROM usuarios WHERE rol = 'administrador' AND correo LIKE ? ORDER BY id DESC LIMIT 1",
+                ('%@sintetico.test',))
+    fila = cur.fetchone()
+    contexto['admin'] = fila[0] if fila else None
+    cur.execute("""
+        SELECT r.id_reserva, c.id_cancha FROM reservas r
+        JOIN canchas c ON c.id_cancha = r.id_cancha
+        JOIN usuarios u ON u.id = c.usuario_id
+        WHERE u.correo = ? ORDER BY r.id_reserva DESC LIMIT 1
+    """, (contexto['dueno'],))
+    fila = cur.fetchone()
+    contexto['reserva_dueno'], contexto['cancha_dueno'] = (fila[0], fila[1]) if fila else (None, None)
+    cur.execute("SELECT id FROM usuarios WHERE correo = ?", (contexto['jugador'],))
+    contexto['id_jugador'] = cur.fetchone()[0]
+    return contexto
+
+def _paginas(cliente, url):
+    """Primera y segunda página de un API paginado por cursor (ejercita el WHERE del cursor)"""
+    respuesta = cliente.get(url).get_json() or {}
+    if respuesta.get('siguiente'):
+        cliente.get(f"{url}&cursor={respuesta['siguiente']}")
+
+def recorrer(app, contexto, contrasena):
+    """Visita las rutas de cada rol; devuelve {sql: [params, llamadas, rutas]} capturado"""
+    import instrumentacion
+
+    def sesion(correo):
+        cliente = app.test_client()
+        if correo and cliente.post('/login', data={'correo': correo, 'contraseña': contrasena}).status_code == 302:
+            return cliente
+        print(f"⚠️  No se pudo iniciar sesión como {correo}: se omiten sus rutas")
+        return None
+
+    canchas = contexto['canchas']
+    cancha = canchas[0]
+    fecha = (date.today() + timedelta(days=3)).isoformat()
+
+    with instrumentacion.capturar() as capturadas:
+        jugador = sesion(contexto['jugador'])
+        if jugador is not None:
+            for url in ('/', '/dashboard_usuario', '/usuario/explorar', '/usuario/mis-reservas',
+                        '/usuario/favoritos', '/perfil_usuario', f'/usuario/reservar/{cancha}',
+                        f'/api/disponibilidad/{cancha}/{fecha}',
+                        f"/api/disponibilidad/rango?canchas={','.join(map(str, canchas[:5]))}&dias=14",
+                        '/api/canchas/cercanas?lat=4.58&lng=-74.21',
+                        f'/api/canchas/buscar?q=cancha&precio_max=100000&hora=20&fecha={fecha}',
+                        f'/api/canchas/buscar?fecha={fecha}', f'/usuario/explorar?q=cancha&hora=19'):
+                jugador.get(url)
+            for estado in ('pendiente', 'completada'):
+                _paginas(jugador, f'/api/usuario/reservas?estado={estado}')
+            jugador.post(f'/usuario/reservar/{cancha}', data={
+                'fecha': fecha, 'horario': '%02d:00' % 22, 'numero': '3000000000', 'mensaje': 'planes'})
+            jugador.post(f'/usuario/favoritos/agregar/{cancha}')
+            jugador.post(f'/usuario/favoritos/eliminar/{cancha}')
+            tarjetas = (jugador.get('/api/usuario/reservas?estado=pendiente').get_json() or {}).get('html', {})
+            cancelables = re.findall(r'cancelar-reserva/(\d+)', tarjetas.get('tarjetas', ''))
+            if cancelables:
+                jugador.post(f'/usuario/cancelar-reserva/{cancelables[0]}')
+
+        dueno = sesion(contexto['dueno'])
+        if dueno is not None:
+            for url in ('/dashboard_dueño', '/dueño/canchas', '/dueño/reservas', '/perfil_dueño'):
+                dueno.get(url)
+            if contexto['cancha_dueno']:
+                dueno.get(f"/dueño/canchas/editar/{contexto['cancha_dueno']}")
+            if contexto['reserva_dueno']:
+                dueno.get(f"/dueño/partido/{contexto['reserva_dueno']}")
+            for estado in ('pendiente', 'completada'):
+                _paginas(dueno, f'/api/dueño/reservas?estado={estado}')
+
+        admin = sesion(contexto['admin'])
+        if admin is not None:
+            for url in ('/admin/dashboard', '/admin/usuarios', '/admin/canchas', '/admin/reservas',
+                        '/admin/api/totales', f"/admin/usuarios/editar/{contexto['id_jugador']}"):
+                admin.get(url)
+            _paginas(admin, '/admin/api/reservas?por_pagina=20')
+
+    return capturadas
+
+# ---------------------------------------------------------------------------
+# Planes
+# ---------------------------------------------------------------------------
+
+def _alias(query):
+    """{alias o nombre: tabla} de las tablas del FROM/JOIN"""
+    alias = {}
+    for tabla, nombre in _TABLA.findall(_LITERAL.sub("''", query)):
+        alias[tabla.lower()] = tabla.lower()
+        if nombre and nombre.upper() not in _NO_ALIAS:
+            alias[nombre.lower()] = tabla.lower()
+    return alias
+
+class Revisor:
+    """EXPLAIN de las sentencias en la base de datos indicada"""
+    def __init__(self, conn, umbral_filas=UMBRAL_FILAS):
+        self.conn = conn
+        self.postgres = conn.db_type == 'postgresql'
+        self.umbral_filas = umbral_filas
+        self._filas = {}
+        self._columnas = {}
+        self._indices = {}
+
+    def filas(self, tabla):
+        if tabla not in self._filas:
+            cur = self.conn.conn.cursor()
+            if self.postgres:
+                cur.execute("SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE oid = to_regclass(%s)", (tabla,))
+            else:
+                cur.execute(f"SELECT COUNT(*) FROM {tabla}")
+            fila = cur.fetchone()
+            self._filas[tabla] = fila[0] if fila else 0
+            cur.close()
+        return self._filas[tabla]
+
+    def columnas(self, tabla):
+        if tabla not in self._columnas:
+            cur = self.conn.conn.cursor()
+            if self.postgres:
+                cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name = %s", (tabla,))
+                self._columnas[tabla] = {fila[0] for fila in cur.fetchall()}
+            else:
+                cur.execute(f"PRAGMA table_info({tabla})")
+                self._columnas[tabla] = {fila[1] for fila in cur.fetchall()}
+            cur.close()
+        return self._columnas[tabla]
+
+    def indices(self, tabla):
+        """{nombre: [columnas]} de los índices completos (no parciales) de la tabla"""
+        if tabla not in self._indices:
+            cur = self.conn.conn.cursor()
+            indices = {}
+            if self.postgres:
+                cur.execute("""
+                    SELECT i.relname, a.attname FROM pg_index x
+                    JOIN pg_class i ON i.oid = x.indexrelid
+                    JOIN pg_attribute a ON a.attrelid = x.indrelid AND a.attnum = ANY(x.indkey)
+                    WHERE x.indrelid = to_regclass(%s) AND x.indpred IS NULL
+                    ORDER BY i.relname, array_position(x.indkey::int2[], a.attnum)
+                """, (tabla,))
+                for nombre, columna in cur.fetchall():
+                    indices.setdefault(nombre, []).append(columna)
+            else:
+                cur.execute(f"PRAGMA index_list({tabla})")
+                for nombre in [fila[1] for fila in cur.fetchall() if not fila[4]]:
+                    cur.execute(f"PRAGMA index_info({nombre})")
+                    indices[nombre] = [fila[2] for fila in sorted(cur.fetchall())]
+                # INTEGER PRIMARY KEY es el rowid: no aparece en index_list
+                cur.execute(f"PRAGMA table_info({tabla})")
+                clave = [fila[1] for fila in sorted(cur.fetchall(), key=lambda f: f[5]) if fila[5]]
+                if clave:
+                    indices.setdefault('PRIMARY KEY', clave)
+            self._indices[tabla] = indices
+            cur.close()
+        return self._indices[tabla]
+
+    def plan(self, query, params):
+        """
+        (plan en texto, recorridos, filas ordenadas): recorridos son las tablas que el plan
+        lee completas como (tabla, índice o None, nombre en la consulta); filas ordenadas,
+        las que se ordenan en memoria (tabla temporal/Sort) o 0
+        """
+        cur = self.conn.conn.cursor()
+        try:
+            if self.postgres:
+                from db import compile_query
+
+                cur.execute("EXPLAIN (FORMAT JSON) " + (compile_query(query).text if params else query), params or None)
+                plan = cur.fetchone()[0]
+                plan = json.loads(plan) if isinstance(plan, str) else plan
+                recorridos, lineas, ordenadas = [], [], []
+                self._nodos_postgres(plan[0]['Plan'], recorridos, lineas, ordenadas, 0)
+                return '\n'.join(lineas), recorridos, max(ordenadas, default=0)
+
+            cur.execute("EXPLAIN QUERY PLAN " + query, params or ())
+            detalles = [fila[3] for fila in cur.fetchall()]
+        finally:
+            cur.close()
+            self.conn.rollback()
+
+        alias = _alias(query)
+        recorridos = []
+        for detalle in detalles:
+            encontrado = _SCAN_SQLITE.match(detalle)
+            if encontrado and encontrado.group(1).lower() in alias:
+                recorridos.append((alias[encontrado.group(1).lower()], encontrado.group(3), encontrado.group(1).lower()))
+        # SQLite no estima filas: las que llegan al ordenamiento se cuentan ejecutando la
+        # consulta sin su ORDER BY/LIMIT (también cuando vienen de una búsqueda por índice,
+        # p. ej. todo el historial de una cancha); si no se puede, la tabla más grande
+        ordenadas = 0
+        if any(detalle.startswith('USE TEMP B-TREE FOR ORDER BY') for detalle in detalles):
+            ordenadas = self.contar(query, params)
+            if ordenadas is None:
+                ordenadas = max((self.filas(tabla) for tabla in set(alias.values())), default=0)
+        return '\n'.join(detalles), recorridos, ordenadas
+
+    def contar(self, query, params):
+        """Filas de la consulta sin su ORDER BY/LIMIT final (None si no se puede separar)"""
+        final = _ORDEN_FINAL.search(_LITERAL.sub("''", query))
+        if not final:
+            return None
+        params = list(params or ())
+        sobrantes = query[final.start():].count('?')
+        if sobrantes:
+            params = params[:-sobrantes]
+        cur = self.conn.conn.cursor()
+        try:
+            cur.execute(f"SELECT COUNT(*) FROM ({query[:final.start()]}) AS sin_orden", params)
+            return cur.fetchone()[0]
+        except Exception:
+            return None
+        finally:
+            cur.close()
+            self.conn.rollback()
+
+    def _nodos_postgres(self, nodo, recorridos, lineas, ordenadas, nivel):
+        tipo = nodo['Node Type']
+        relacion = nodo.get('Relation Name')
+        lineas.append('  ' * nivel + tipo + (f" on {relacion}" if relacion else '') +
+                      (f" using {nodo['Index Name']}" if nodo.get('Index Name') else ''))
+        if tipo == 'Seq Scan':
+            recorridos.append((relacion, None, (nodo.get('Alias') or relacion).lower()))
+        elif tipo == 'Sort':
+            ordenadas.append(nodo.get('Plan Rows', 0))
+        for hijo in nodo.get('Plans', []):
+            self._nodos_postgres(hijo, recorridos, lineas, ordenadas, nivel + 1)
+
+    def sugerir_indice(self, query, tabla, nombre):
+        """CREATE INDEX con las columnas de igualdad, de rango y de orden de la tabla"""
+        texto = _LITERAL.sub("''", query)
+        alias = _alias(query)
+        columnas_tabla = self.columnas(tabla)
+
+        def de_la_tabla(calificador, columna):
+            if columna not in columnas_tabla:
+                return False
+            if calificador:
+                return calificador.lower() == nombre
+            return True
+
+        # Las columnas de los JOIN solo sirven si la tabla no tiene filtros propios
+        igualdad, rango, union = [], [], []
+        for calificador, columna, operador, otra_columna in _COMPARACION.findall(texto):
+            if de_la_tabla(calificador, columna):
+                if otra_columna:
+                    union.append(columna)
+                else:
+                    (igualdad if operador.upper() in ('=', 'IN') else rango).append(columna)
+        for calificador, columna in _DERECHA.findall(texto):
+            if de_la_tabla(calificador, columna):
+                union.append(columna)
+        if not igualdad and not rango:
+            igualdad = union
+        orden = []
+        encontrado = _ORDEN.search(texto)
+        if encontrado:
+            for parte in encontrado.group(1).split(','):
+                token = parte.strip().split()[0] if parte.strip() else ''
+                calificador, _, columna = token.rpartition('.')
+                if de_la_tabla(calificador, columna):
+                    orden.append(columna)
+
+        sugeridas = []
+        for columna in igualdad + rango + orden:
+            if columna not in sugeridas:
+                sugeridas.append(columna)
+        sugeridas = sugeridas[:4]
+        if not sugeridas:
+            return None
+        for indice, columnas in self.indices(tabla).items():
+            if columnas[:len(sugeridas)] == sugeridas:
+                return f"ya existe {indice}({', '.join(columnas)}) pero el plan no lo usa para este recorrido: revisa las estadísticas (ANALYZE) o la forma de la consulta"
+        return f"CREATE INDEX idx_{tabla}_{'_'.join(sugeridas)} ON {tabla}({', '.join(sugeridas)})"
+
+def revisar(revisor, capturadas, todas=False):
+    """
+    Clasifica las sentencias capturadas; devuelve (fallos, avisos), un dict por sentencia
+    con sus problemas como (motivo, índice sugerido)
+    """
+    from instrumentacion import normalizar
+
+    fallos, avisos = [], []
+    vistas = set()
+    for query, (params, llamadas, rutas) in capturadas.items():
+        partes = query.lstrip().split(None, 1)
+        if not partes or partes[0].upper() not in EXPLICABLES:
+            continue
+        texto = normalizar(query)
+        if texto in vistas:
+            continue
+        vistas.add(texto)
+        hallazgo = {'sql': texto, 'rutas': sorted(r or '(fuera de una ruta)' for r in rutas),
+                    'llamadas': llamadas, 'plan': '', 'problemas': []}
+
+        try:
+            plan, recorridos, ordenadas = revisor.plan(query, params)
+        except Exception as e:
+            hallazgo['problemas'].append((f"EXPLAIN falló: {e}", None))
+            avisos.append(hallazgo)
+            continue
+        hallazgo['plan'] = plan
+
+        caliente = any(ruta and not ruta.startswith(PREFIJO_ADMIN) for ruta in rutas)
+        con_limite = re.search(r'\bLIMIT\b', query, re.IGNORECASE) is not None
+        falla = False
+        for tabla, indice, nombre in recorridos:
+            filas = revisor.filas(tabla)
+            grande = filas >= revisor.umbral_filas
+            if indice is None and (grande or todas):
+                if con_limite and not ordenadas:
+                    # Sin ordenamiento el recorrido se detiene al completar el LIMIT: solo
+                    # es caro si el filtro descarta casi todas las filas
+                    hallazgo['problemas'].append((f"recorre la tabla {tabla} ({filas} filas) hasta completar el LIMIT",
+                                                  revisor.sugerir_indice(query, tabla, nombre)))
+                    continue
+                hallazgo['problemas'].append((f"recorre completa la tabla {tabla} ({filas} filas)",
+                                              revisor.sugerir_indice(query, tabla, nombre)))
+                falla = falla or (caliente and grande)
+            elif indice is not None and grande and not con_limite:
+                hallazgo['problemas'].append((f"recorre completo el índice {indice} de {tabla} ({filas} filas)",
+                                              revisor.sugerir_indice(query, tabla, nombre)))
+        if ordenadas >= revisor.umbral_filas:
+            hallazgo['problemas'].append((f"ordena en memoria hasta {ordenadas} filas: ningún índice da el ORDER BY "
+                                          "después de los filtros", None))
+            falla = falla or caliente
+
+        permitida = next((motivo for fragmento, motivo in PERMITIDAS.items() if fragmento in texto), None)
+        if permitida and hallazgo['problemas']:
+            hallazgo['problemas'].append((f"permitida: {permitida}", None))
+            falla = False
+        if falla:
+            fallos.append(hallazgo)
+        elif hallazgo['problemas']:
+            avisos.append(hallazgo)
+    return fallos, avisos
+
+def _imprimir(hallazgo, icono):
+    print(f"\n{icono} {hallazgo['sql'][:300]}")
+    print(f"   Rutas: {', '.join(hallazgo['rutas'])} ({hallazgo['llamadas']} ejecuciones)")
+    for motivo, sugerencia in hallazgo['problemas']:
+        print(f"   • {motivo}")
+        if sugerencia:
+            print(f"     💡 {sugerencia}" if sugerencia.startswith('ya existe') else
+                  f"     💡 Índice sugerido (como migración en migraciones.py): {sugerencia}")
+    if hallazgo['plan']:
+        print('   Plan:\n' + '\n'.join('      ' + linea for linea in hallazgo['plan'].splitlines()))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Revisa con EXPLAIN los planes de las consultas de la aplicación')
+    parser.add_argument('--base', help='archivo SQLite a revisar (por defecto SQLITE_DATABASE o sintetico.db)')
+    parser.add_argument('--umbral-filas', type=int, default=UMBRAL_FILAS,
+                        help=f'filas desde las que una tabla es grande ({UMBRAL_FILAS})')
+    parser.add_argument('--contrasena', help='contraseña de los usuarios (la de datos_sinteticos.py)')
+    parser.add_argument('--todas', action='store_true', help='informar también los recorridos de tablas pequeñas')
+    args = parser.parse_args()
+
+    if args.base:
+        os.environ['SQLITE_DATABASE'] = os.path.abspath(args.base)
+    else:
+        os.environ.setdefault('SQLITE_DATABASE', os.path.abspath('sintetico.db'))
+
+    from app import app
+    from db import get_db, script_connection
+    from datos_sinteticos import CONTRASENA
+
+    print("🚀 Revisando los planes de las consultas...")
+    print("=" * 60)
+    app.config['TESTING'] = True
+    try:
+        with app.app_context():
+            contexto = _contexto(get_db().cursor())
+    except Exception as e:
+        print(f"❌ No se pudieron leer usuarios y canchas ({e}): genera datos con datos_sinteticos.py")
+        raise SystemExit(1)
+    capturadas = recorrer(app, contexto, args.contrasena or CONTRASENA)
+
+    rutas = defaultdict(int)
+    for _, _, rutas_sentencia in capturadas.values():
+        for ruta in rutas_sentencia:
+            rutas[ruta] += 1
+    print(f"📋 {len(capturadas)} sentencias distintas capturadas en {len(rutas)} rutas")
+
+    conn = script_connection()
+    try:
+        fallos, avisos = revisar(Revisor(conn, args.umbral_filas), capturadas, args.todas)
+    finally:
+        conn.close()
+
+    for hallazgo in avisos:
+        _imprimir(hallazgo, '⚠️ ')
+    for hallazgo in fallos:
+        _imprimir(hallazgo, '❌')
+
+    if fallos:
+        print(f"\n❌ {len(fallos)} consultas de rutas frecuentes recorren u ordenan en memoria tablas grandes")
+        raise SystemExit(1)
+    print(f"\n✅ Ninguna consulta de rutas frecuentes recorre ni ordena en memoria una tabla grande ({len(avisos)} avisos)")
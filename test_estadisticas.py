@@ -0,0 +1,35 @@
+"""
+Test de la interpretación del precio escrito por el dueño (canchas.precio_num)
+
+    python -m unittest test_estadisticas
+"""
+import unittest
+from decimal import Decimal
+from estadisticas import precio_numerico
+
+class PrecioNumericoTest(unittest.TestCase):
+    def test_enteros_y_miles(self):
+        for texto, valor in (('120000', 120000), ('$120.000', 120000), ('1,250,000', 1250000),
+                             ('$ 90.000 COP', 90000), ('1.000.000', 1000000)):
+            self.assertEqual(precio_numerico(texto), valor, texto)
+
+    def test_decimales_con_punto(self):
+        for texto, valor in (('85,000.50', 85000.5), ('1.5', 1.5), ('99.99', 99.99)):
+            self.assertEqual(precio_numerico(texto), valor, texto)
+
+    def test_decimales_con_coma(self):
+        for texto, valor in (('120.000,50', 120000.5), ('120,5', 120.5), ('0,99', 0.99),
+                             ('1.000.000,25', 1000000.25)):
+            self.assertEqual(precio_numerico(texto), valor, texto)
+
+    def test_ambiguos_se_rechazan(self):
+        for texto in ('120.000.50', '120,5000', '12.34.56', '1.000,000', '1,000.000,50', '', 'gratis', ',50'):
+            self.assertIsNone(precio_numerico(texto), texto)
+
+    def test_numeros(self):
+        self.assertIsNone(precio_numerico(None))
+        self.assertEqual(precio_numerico(90000), 90000.0)
+        self.assertEqual(precio_numerico(Decimal('85000.50')), 85000.5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+"""
+Test de marcar_completadas con una hora fija (sin depender del reloj del servidor)
+
+    python -m unittest test_marcar_completadas
+"""
+import os
+import sqlite3
+import unittest
+from datetime import datetime
+from db import ConnectionWrapper
+from marcar_completadas import marcar_completadas
+
+ESQUEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'usuariosdb.sql')
+
+class MarcarCompletadasTest(unittest.TestCase):
+    def setUp(self):
+        conn = sqlite3.connect(':memory:')
+        with open(ESQUEMA, encoding='utf-8') as archivo:
+            conn.executescript(archivo.read())
+        conn.execute("DELETE FROM reservas")
+        for fecha, slot in (('2026-03-09', 22), ('2026-03-10', 17), ('2026-03-10', 18),
+                            ('2026-03-10', 20), ('2026-03-11', 8)):
+            conn.execute("""
+                INSERT INTO reservas (id_usuario, cancha, id_cancha, horario, slot, fecha, estado)
+                VALUES (1, 'Cancha', 27, ?, ?, ?, 'pendiente')
+            """, ('%02d:00' % slot, slot, fecha))
+        conn.commit()
+        self.conn = ConnectionWrapper(conn, 'sqlite')
+
+    def tearDown(self):
+        self.conn.close()
+
+    def completadas(self):
+        cur = self.conn.cursor()
+        cur.execute("SELECT fecha, slot FROM reservas WHERE estado = 'completada' ORDER BY fecha, slot")
+        return [(str(fecha), slot) for fecha, slot in cur.fetchall()]
+
+    def test_solo_franjas_terminadas(self):
+        # A las 18:30 ya terminó la franja de las 17, pero no la de las 18
+        filas, _ = marcar_completadas(self.conn, ahora=datetime(2026, 3, 10, 18, 30))
+        self.assertEqual(filas, 2)
+        self.assertEqual(self.completadas(), [('2026-03-09', 22), ('2026-03-10', 17)])
+
+    def test_noche_local_no_completa_el_dia(self):
+        # 20:15 en Bogotá (01:15 UTC del día siguiente): la franja de las 20 sigue en juego
+        marcar_completadas(self.conn, ahora=datetime(2026, 3, 10, 20, 15))
+        self.assertNotIn(('2026-03-10', 20), self.completadas())
+        self.assertNotIn(('2026-03-11', 8), self.completadas())
+
+    def test_lotes(self):
+        filas, lotes = marcar_completadas(self.conn, ahora=datetime(2026, 3, 12, 0, 0), tamano_lote=2)
+        self.assertEqual((filas, lotes), (5, 3))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+"""
+Test de las migraciones desde el esquema de antes de migraciones.py (el usuariosdb.sql
+original) hasta la última versión, en SQLite en memoria
+
+    python -m unittest test_migraciones
+"""
+import contextlib
+import io
+import sqlite3
+import unittest
+import estadisticas
+from db import ConnectionWrapper
+from migraciones import MIGRACIONES, aplicar, estado
+
+# Tablas tal como estaban antes de la migración 1 (sin id_cancha, estado, slot, precio_num...)
+ESQUEMA_ORIGINAL = """
+CREATE TABLE usuarios (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre TEXT NOT NULL,
+    correo TEXT NOT NULL UNIQUE,
+    edad INTEGER NOT NULL,
+    contraseña TEXT NOT NULL,
+    direccion TEXT DEFAULT NULL,
+    rol TEXT NOT NULL DEFAULT 'usuario'
+);
+CREATE TABLE canchas (
+    id_cancha INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre TEXT NOT NULL,
+    precio TEXT DEFAULT NULL,
+    descripcion TEXT DEFAULT NULL,
+    imagen_url TEXT DEFAULT NULL,
+    tiempo_uso INTEGER DEFAULT 0,
+    cronometro_inicio DATETIME DEFAULT NULL,
+    direccion TEXT DEFAULT NULL,
+    usuario_id INTEGER NOT NULL,
+    FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
+);
+CREATE TABLE favoritos (
+    id_favorito INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_usuario INTEGER NOT NULL,
+    cancha TEXT NOT NULL,
+    fecha_agregado DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (id_usuario) REFERENCES usuarios(id) ON DELETE CASCADE
+);
+CREATE TABLE horarios_canchas (
+    id_horario INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_cancha INTEGER NOT NULL,
+    hora_inicio TIME NOT NULL,
+    hora_fin TIME NOT NULL,
+    disponible INTEGER DEFAULT 1,
+    FOREIGN KEY (id_cancha) REFERENCES canchas(id_cancha)
+);
+CREATE TABLE reservas (
+    id_reserva INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_usuario INTEGER NOT NULL,
+    cancha TEXT NOT NULL,
+    horario TEXT NOT NULL,
+    fecha DATE NOT NULL,
+    numero TEXT,
+    mensaje TEXT,
+    goles_equipo1 INTEGER DEFAULT 0,
+    goles_equipo2 INTEGER DEFAULT 0,
+    tarjetas_amarillas INTEGER DEFAULT 0,
+    tarjetas_rojas INTEGER DEFAULT 0,
+    FOREIGN KEY (id_usuario) REFERENCES usuarios(id)
+);
+"""
+
+class MigracionesTest(unittest.TestCase):
+    def setUp(self):
+        conn = sqlite3.connect(':memory:')
+        conn.executescript(ESQUEMA_ORIGINAL)
+        conn.execute("INSERT INTO usuarios (id, nombre, correo, edad, contraseña, rol) VALUES (1, 'Jugador', 'j@x.com', 20, 'x', 'usuario')")
+        conn.execute("INSERT INTO usuarios (id, nombre, correo, edad, contraseña, rol) VALUES (2, 'Dueño', 'd@x.com', 30, 'x', 'dueño')")
+        conn.execute("INSERT INTO canchas (id_cancha, nombre, precio, usuario_id) VALUES (1, 'La Bombonera', '90000', 2)")
+        conn.execute("INSERT INTO canchas (id_cancha, nombre, precio, usuario_id) VALUES (2, 'La Cúpula', '$120.000', 2)")
+        conn.execute("INSERT INTO horarios_canchas (id_cancha, hora_inicio, hora_fin) VALUES (1, '08:00', '22:00')")
+        for cancha, horario, fecha in (('La Bombonera', '18:00', '2026-03-09'), ('La Bombonera', '19:00', '2026-03-09'),
+                                       ('La Cúpula', '10:00', '2026-03-10'), ('La Bombonera', '08:00', '2026-04-01')):
+            conn.execute("INSERT INTO reservas (id_usuario, cancha, horario, fecha) VALUES (1, ?, ?, ?)",
+                         (cancha, horario, fecha))
+        conn.commit()
+        self.conn = ConnectionWrapper(conn, 'sqlite')
+
+    def tearDown(self):
+        self.conn.close()
+
+    def aplicar(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return aplicar(self.conn)
+
+    def consultar(self, sql):
+        cur = self.conn.cursor()
+        cur.execute(sql)
+        return [tuple(fila) for fila in cur.fetchall()]
+
+    def test_desde_el_esquema_original(self):
+        self.assertTrue(self.aplicar())
+        self.assertTrue(all(aplicada_en for _, _, aplicada_en in estado(self.conn)))
+        self.assertEqual(self.consultar("SELECT MAX(version) FROM schema_migrations"), [(MIGRACIONES[-1].version,)])
+
+        # Columnas que agregan las migraciones, rellenas desde las canchas
+        self.assertEqual(self.consultar("SELECT id_cancha, slot, estado, id_dueno, precio FROM reservas ORDER BY id_reserva"), [
+            (1, 18, 'pendiente', 2, 90000), (1, 19, 'pendiente', 2, 90000),
+            (2, 10, 'pendiente', 2, 120000), (1, 8, 'pendiente', 2, 90000)
+        ])
+        self.assertEqual(self.consultar("""
+            SELECT id_cancha, mes, reservas, ingresos FROM estadisticas_mensuales ORDER BY id_cancha, mes
+        """), [(1, '2026-03', 2, 180000), (1, '2026-04', 1, 90000), (2, '2026-03', 1, 120000)])
+
+    def test_estadisticas_iguales_a_recalcular(self):
+        self.assertTrue(self.aplicar())
+        sql = "SELECT id_cancha, mes, usuario_id, reservas, completadas, ingresos FROM estadisticas_mensuales ORDER BY id_cancha, mes"
+        migradas = self.consultar(sql)
+        estadisticas.recalcular(self.conn.cursor())
+        self.assertEqual(self.consultar(sql), migradas)
+
+    def test_precio_con_coma_decimal(self):
+        # Bases migradas cuando '120.000,50' se guardaba como 120.0005
+        self.assertTrue(self.aplicar())
+        cur = self.conn.cursor()
+        cur.execute("UPDATE canchas SET precio = '120.000,50', precio_num = 120.0005 WHERE id_cancha = 2")
+        cur.execute("UPDATE reservas SET precio = 120.0005 WHERE id_cancha = 2")
+        cur.execute("DELETE FROM schema_migrations WHERE version = 16")
+        self.conn.commit()
+
+        self.assertTrue(self.aplicar())
+        self.assertEqual(self.consultar("SELECT precio_num FROM canchas WHERE id_cancha = 2"), [(120000.5,)])
+        self.assertEqual(self.consultar("SELECT precio FROM reservas WHERE id_cancha = 2"), [(120000.5,)])
+        self.assertEqual(self.consultar("SELECT ingresos FROM estadisticas_mensuales WHERE id_cancha = 2"), [(120000.5,)])
+
+    def test_sin_pendientes(self):
+        self.assertTrue(self.aplicar())
+        self.assertTrue(self.aplicar())
+        self.assertEqual(self.consultar("SELECT COUNT(*) FROM schema_migrations"), [(len(MIGRACIONES),)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -16,6 +16,8 @@ CREATE TABLE IF NOT EXISTS usuarios (
     rol TEXT NOT NULL DEFAULT 'usuario'
 );
 
+CREATE INDEX IF NOT EXISTS idx_usuarios_rol ON usuarios(rol);
+
 -- --------------------------------------------------------
 -- Table: administradores
 -- --------------------------------------------------------
@@ -29,6 +31,10 @@ CREATE TABLE IF NOT EXISTS canchas (
     id_cancha INTEGER PRIMARY KEY AUTOINCREMENT,
     nombre TEXT NOT NULL,
     precio TEXT DEFAULT NULL,
+    precio_num NUMERIC DEFAULT NULL,
+    lat REAL DEFAULT NULL,
+    lng REAL DEFAULT NULL,
+    imagen_variantes TEXT DEFAULT NULL,
     descripcion TEXT DEFAULT NULL,
     imagen_url TEXT DEFAULT NULL,
     tiempo_uso INTEGER DEFAULT 0,
@@ -38,6 +44,34 @@ CREATE TABLE IF NOT EXISTS canchas (
     FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
 );
 
+CREATE INDEX IF NOT EXISTS idx_canchas_precio_num ON canchas(precio_num);
+CREATE INDEX IF NOT EXISTS idx_canchas_lat_lng ON canchas(lat, lng);
+CREATE INDEX IF NOT EXISTS idx_canchas_usuario ON canchas(usuario_id);
+
+-- Búsqueda de texto completo (busqueda.py): FTS5 con el contenido en canchas y triggers
+CREATE VIRTUAL TABLE IF NOT EXISTS canchas_fts USING fts5(
+    nombre, direccion, descripcion,
+    content='canchas', content_rowid='id_cancha',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS canchas_fts_insertar AFTER INSERT ON canchas BEGIN
+    INSERT INTO canchas_fts (rowid, nombre, direccion, descripcion)
+    VALUES (new.id_cancha, new.nombre, new.direccion, new.descripcion);
+END;
+
+CREATE TRIGGER IF NOT EXISTS canchas_fts_eliminar AFTER DELETE ON canchas BEGIN
+    INSERT INTO canchas_fts (canchas_fts, rowid, nombre, direccion, descripcion)
+    VALUES ('delete', old.id_cancha, old.nombre, old.direccion, old.descripcion);
+END;
+
+CREATE TRIGGER IF NOT EXISTS canchas_fts_actualizar AFTER UPDATE OF nombre, direccion, descripcion ON canchas BEGIN
+    INSERT INTO canchas_fts (canchas_fts, rowid, nombre, direccion, descripcion)
+    VALUES ('delete', old.id_cancha, old.nombre, old.direccion, old.descripcion);
+    INSERT INTO canchas_fts (rowid, nombre, direccion, descripcion)
+    VALUES (new.id_cancha, new.nombre, new.direccion, new.descripcion);
+END;
+
 -- --------------------------------------------------------
 -- Table: favoritos
 -- --------------------------------------------------------
@@ -46,10 +80,15 @@ CREATE TABLE IF NOT EXISTS favoritos (
     id_favorito INTEGER PRIMARY KEY AUTOINCREMENT,
     id_usuario INTEGER NOT NULL,
     cancha TEXT NOT NULL,
+    id_cancha INTEGER DEFAULT NULL,
     fecha_agregado DATETIME DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (id_usuario) REFERENCES usuarios(id) ON DELETE CASCADE
+    FOREIGN KEY (id_usuario) REFERENCES usuarios(id) ON DELETE CASCADE,
+    FOREIGN KEY (id_cancha) REFERENCES canchas(id_cancha) ON DELETE CASCADE
 );
 
+CREATE INDEX IF NOT EXISTS idx_favoritos_cancha ON favoritos(id_cancha);
+CREATE INDEX IF NOT EXISTS idx_favoritos_usuario_cancha ON favoritos(id_usuario, id_cancha);
+
 -- --------------------------------------------------------
 -- Table: horarios_canchas
 -- --------------------------------------------------------
@@ -63,6 +102,8 @@ CREATE TABLE IF NOT EXISTS horarios_canchas (
     FOREIGN KEY (id_cancha) REFERENCES canchas(id_cancha)
 );
 
+CREATE INDEX IF NOT EXISTS idx_horarios_canchas_cancha ON horarios_canchas(id_cancha);
+
 -- --------------------------------------------------------
 -- Table: reservas
 -- --------------------------------------------------------
@@ -71,7 +112,9 @@ CREATE TABLE IF NOT EXISTS reservas (
     id_reserva INTEGER PRIMARY KEY AUTOINCREMENT,
     id_usuario INTEGER NOT NULL,
     cancha TEXT NOT NULL,
+    id_cancha INTEGER DEFAULT NULL,
     horario TEXT NOT NULL,
+    slot INTEGER DEFAULT NULL,
     fecha DATE NOT NULL,
     numero TEXT,
     mensaje TEXT,
@@ -79,7 +122,64 @@ CREATE TABLE IF NOT EXISTS reservas (
     goles_equipo2 INTEGER DEFAULT 0,
     tarjetas_amarillas INTEGER DEFAULT 0,
     tarjetas_rojas INTEGER DEFAULT 0,
-    FOREIGN KEY (id_usuario) REFERENCES usuarios(id)
+    estado TEXT DEFAULT 'pendiente',
+    -- Dueño de la cancha (copiado al reservar) para el listado del dueño
+    id_dueno INTEGER DEFAULT NULL,
+    -- Precio de la cancha al reservar (lo que suman y restan las estadísticas)
+    precio NUMERIC DEFAULT NULL,
+    FOREIGN KEY (id_usuario) REFERENCES usuarios(id),
+    FOREIGN KEY (id_cancha) REFERENCES canchas(id_cancha) ON DELETE CASCADE
+);
+
+-- Una sola reserva por cancha, fecha y franja horaria (slot = hora de inicio)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_reservas_slot_unico ON reservas(id_cancha, fecha, slot);
+
+-- Paginación por cursor de los listados: (fecha, horario, id_reserva) al final de cada índice
+CREATE INDEX IF NOT EXISTS idx_reservas_usuario_orden ON reservas(id_usuario, estado, fecha, horario, id_reserva);
+CREATE INDEX IF NOT EXISTS idx_reservas_cancha_orden ON reservas(id_cancha, estado, fecha, horario, id_reserva);
+CREATE INDEX IF NOT EXISTS idx_reservas_dueno_orden ON reservas(id_dueno, estado, fecha, horario, id_reserva);
+CREATE INDEX IF NOT EXISTS idx_reservas_orden ON reservas(fecha, horario, id_reserva);
+
+-- Reservas pendientes para marcar_completadas.py (índice parcial: solo las pendientes)
+CREATE INDEX IF NOT EXISTS idx_reservas_pendientes ON reservas(fecha, slot) WHERE estado = 'pendiente';
+
+-- --------------------------------------------------------
+-- Table: estadisticas_mensuales
+-- Reservas e ingresos por cancha y mes (mantenida por estadisticas.py)
+-- --------------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS estadisticas_mensuales (
+    id_cancha INTEGER NOT NULL,
+    mes TEXT NOT NULL,
+    usuario_id INTEGER NOT NULL,
+    reservas INTEGER NOT NULL DEFAULT 0,
+    completadas INTEGER NOT NULL DEFAULT 0,
+    ingresos NUMERIC NOT NULL DEFAULT 0,
+    PRIMARY KEY (id_cancha, mes),
+    FOREIGN KEY (id_cancha) REFERENCES canchas(id_cancha) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_estadisticas_usuario_mes ON estadisticas_mensuales(usuario_id, mes);
+
+-- --------------------------------------------------------
+-- Table: geocodificaciones
+-- Coordenadas ya resueltas por dirección (ver geocodificacion.py)
+-- --------------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS geocodificaciones (
+    direccion TEXT PRIMARY KEY,
+    lat REAL,
+    lng REAL
+);
+
+-- --------------------------------------------------------
+-- Table: versiones_datos
+-- Contadores de versión de datos cacheados (catálogo de canchas, ver catalogo.py)
+-- --------------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS versiones_datos (
+    nombre TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
 );
 
 -- --------------------------------------------------------
@@ -118,36 +218,5 @@ INSERT INTO canchas (id_cancha, nombre, precio, descripcion, imagen_url, tiempo_
 (22, 'Cancha Indoor Naranja', '100000', 'Esta cancha cubierta se destaca en Soacha por su enfoque en la seguridad, con postes y paredes acolchadas en un vibrante color naranja. Ofrece una superficie sintética de calidad y un amplio techo para jugar cómodamente. ¡Perfecta para partidos en cualquier clima, con la máxima protección!', 'static/imagenes/parquecolor.png', 0, NULL, 111),
 (27, 'Cancha La Bombonera ', '90000', 'Una auténtica cancha de barrio ubicada en el corazón de Soacha. Ideal para armar el partido de la semana con tus amigos. Ofrece una experiencia de juego al aire libre, sintiendo la energía de la comunidad local. ¡Reserva tu horario y juega como en casa!', 'static/canchas_uploads/Cancha_La_Bombonera__115.png', 0, NULL, 115);
 
--- --------------------------------------------------------
--- Trigger: registrar_admin
--- SQLite trigger to auto-create admin and cancha when a new admin user is registered
--- --------------------------------------------------------
-
-CREATE TRIGGER IF NOT EXISTS registrar_admin 
-AFTER INSERT ON usuarios
-FOR EACH ROW
-WHEN NEW.rol = 'administrador'
-BEGIN
-    -- Insert into administradores table
-    INSERT INTO administradores (usuario_id) VALUES (NEW.id);
-    
-    -- Insert into canchas table with default image based on name
-    INSERT INTO canchas (nombre, imagen_url, usuario_id)
-    VALUES (
-        'Cancha de ' || NEW.nombre,
-        CASE
-            WHEN NEW.nombre LIKE '%Mendoza%'   THEN 'static/imagenes/La_mendoza.png'
-            WHEN NEW.nombre LIKE '%Bombonera%' THEN 'static/imagenes/labomonera.png'
-            WHEN NEW.nombre LIKE '%Cúpula%'    THEN 'static/imagenes/lacupula.png'
-            WHEN NEW.nombre LIKE '%Arenosa%'   THEN 'static/imagenes/larenosa.png'
-            WHEN NEW.nombre LIKE '%Judá%'      THEN 'static/imagenes/leondejuda.png'
-            WHEN NEW.nombre LIKE '%Last Time%' THEN 'static/imagenes/cancha1.png'
-            WHEN NEW.nombre LIKE '%Surxoacha%' THEN 'static/imagenes/cancha2.png'
-            WHEN NEW.nombre LIKE '%Punto30%'   THEN 'static/imagenes/punto30.png'
-            WHEN NEW.nombre LIKE '%Primos%'    THEN 'static/imagenes/donbalon.png'
-            WHEN NEW.nombre LIKE '%Parque%'    THEN 'static/imagenes/parquecolor.png'
-            ELSE 'static/imagenes/default.png'
-        END,
-        NEW.id
-    );
-END;
+-- Precio numérico de los datos iniciales (los precios se guardan sin símbolos)
+UPDATE canchas SET precio_num = CAST(precio AS NUMERIC) WHERE precio_num IS NULL AND precio IS NOT NULL;